@@ -0,0 +1,57 @@
+"""
+Entity extraction micro-benchmark
+Compares extracting entities text by text (what build_enhanced_tweet_row and
+build_profile_row fall back to) with one batch pass, and reports the batch
+cost as a share of mapping the same tweets to rows
+
+Usage: python -m benchmarks.bench_entities [tweet_count]
+"""
+
+import sys
+import time
+from utils.entity_util import classify_crypto_batch, extract_tweet_entities_batch, rank_cashtags
+from utils.row_builder import build_enhanced_tweet_rows, build_profile_rows
+from benchmarks.synthetic import make_tweets
+
+
+def per_text_path(bodies, cashtags_list, bios):
+    entities = [extract_tweet_entities_batch([body], [cashtags])[0] for body, cashtags in zip(bodies, cashtags_list)]
+    return entities, [classify_crypto_batch([bio])[0] for bio in bios]
+
+
+def batch_path(bodies, cashtags_list, bios):
+    return extract_tweet_entities_batch(bodies, cashtags_list), classify_crypto_batch(bios)
+
+
+def measure(func, *args, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    tweets = make_tweets(count)
+    args = ([tweet.rawContent for tweet in tweets],
+            [tweet.cashtags for tweet in tweets],
+            [tweet.user.rawDescription for tweet in tweets])
+
+    assert per_text_path(*args) == batch_path(*args)
+    assert rank_cashtags(["ETH", "BTC"], ["ETH", "btc", "BTC"])[0] == "BTC"
+    assert classify_crypto_batch(["method actor", "ETH maxi", "NFTs and tokens"]) == [0, 1, 1]
+
+    for name, func in (("per-text", per_text_path), ("batch", batch_path)):
+        elapsed = measure(func, *args)
+        print(f"{name:>9}: {elapsed * 1000:8.1f} ms for {count} tweets "
+              f"({count / elapsed:,.0f} tweets/s, {elapsed / count * 1e6:.2f} us/tweet)")
+
+    extraction = measure(batch_path, *args)
+    mapping = measure(lambda: (build_enhanced_tweet_rows(tweets), build_profile_rows([tweet.user for tweet in tweets])))
+    print(f"batch extraction is {extraction / mapping:.0%} of full row mapping ({mapping * 1000:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Mapping micro-benchmark
+Compares the baseline dict-then-tuple path (the original
+map_tweet_to_enhanced_tweets and map_tweet_user_to_profile followed by the
+insert helpers' conversion, vendored in benchmarks/baseline_mapping.py)
+with the direct row builders
+
+Usage: python -m benchmarks.bench_mapping [tweet_count]
+"""
+
+import sys
+import time
+from datetime import datetime
+from utils.row_builder import build_enhanced_tweet_rows, build_profile_rows
+from benchmarks.baseline_mapping import (
+    enhanced_tweet_values,
+    map_tweet_to_enhanced_tweets,
+    map_tweet_user_to_profile,
+    profile_values
+)
+from benchmarks.synthetic import make_tweets
+
+
+def dict_path(tweets):
+    """The baseline mappers: per-row timestamps, a column dictionary per row, then a tuple copy"""
+    tweet_rows = enhanced_tweet_values([map_tweet_to_enhanced_tweets(tweet) for tweet in tweets])
+    profile_rows = profile_values([map_tweet_user_to_profile(tweet.user) for tweet in tweets])
+    return tweet_rows, profile_rows
+
+
+def row_path(tweets):
+    """One timestamp per batch, tuples built directly"""
+    now = datetime.now()
+    return build_enhanced_tweet_rows(tweets, now=now), build_profile_rows([tweet.user for tweet in tweets], now=now)
+
+
+def measure(func, tweets, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(tweets)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    tweets = make_tweets(count)
+
+    assert dict_path(tweets[:100])[0][0][:5] == row_path(tweets[:100])[0][0][:5]
+
+    for name, func in (("dict-then-tuple", dict_path), ("row builder", row_path)):
+        elapsed = measure(func, tweets)
+        print(f"{name:>16}: {elapsed * 1000:8.1f} ms for {count} tweets "
+              f"({count / elapsed:,.0f} tweets/s, {elapsed / count * 1e6:.2f} us/tweet)")
+
+
+if __name__ == "__main__":
+    main()
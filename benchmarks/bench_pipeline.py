@@ -0,0 +1,293 @@
+"""
+End-to-end pipeline benchmark
+Drives scrape_tweets, scrape_window and scrape_targets against the fake twscrape API and
+the fake MySQL server, times the mapping and insert helpers on their own
+and appends one JSON line per run to the results file, so regressions show
+up as numbers over time (see benchmarks.report)
+
+Scraper settings come from the environment as usual (SPOOL_ENABLED,
+SCRAPE_LIMIT, SCRAPE_BATCH_SIZE, BULK_LOAD_THRESHOLD, RATE_LIMIT_SEARCH, MAP_WORKERS,
+WINDOW_MIN_SECONDS, ...);
+the options below only shape the fake API and database
+
+Usage: python -m benchmarks.bench_pipeline [--handles 200] [--tweets-per-handle 100] [--label name]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import shutil
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+# The scraper modules read their settings at import time: never touch a real
+# profile cache or spool, and keep rate limit windows short enough to wait out
+SPOOL_DIR = tempfile.mkdtemp(prefix="bench-spool-")
+os.environ.setdefault('DB_PORT', '3306')
+os.environ.setdefault('SPOOL_PATH', os.path.join(SPOOL_DIR, 'spool.db'))
+os.environ.setdefault('RATE_LIMIT_WINDOW', '10')
+os.environ['PROFILE_CACHE_PATH'] = ''
+
+from db_configs import db  # noqa: E402
+from scraper import SCRAPE_CONCURRENCY, SCRAPE_LIMIT, scrape_targets, scrape_tweets, scrape_window  # noqa: E402
+from utils.db_writer import AsyncDBWriter  # noqa: E402
+from utils.log_util import configure_logging  # noqa: E402
+from utils.map_pool import map_pool  # noqa: E402
+from utils.metrics import (  # noqa: E402
+    API_REQUEST_SECONDS,
+    DB_BATCH_SECONDS,
+    MAPPING_SECONDS,
+    RATE_LIMIT_WAIT_SECONDS,
+    SPOOL_APPEND_SECONDS,
+    SPOOL_DRAIN_SECONDS
+)
+from utils.pipeline_util import SCRAPE_BATCH_SIZE  # noqa: E402
+from utils.rate_limit_util import RATE_LIMIT_WINDOW, RateLimitScheduler  # noqa: E402
+from utils.row_builder import build_enhanced_tweet_rows, build_profile_rows  # noqa: E402
+from utils.spool_util import SPOOL_ENABLED, spool  # noqa: E402
+from utils.twitter_util import (  # noqa: E402
+    insert_enhanced_tweets_to_db,
+    insert_twitter_profiles_to_db,
+    map_tweet_to_enhanced_tweets,
+    map_tweet_user_to_profile
+)
+from utils.window_planner import WindowPlanner  # noqa: E402
+from benchmarks.fake_db import FakeServer, install_fake_db  # noqa: E402
+from benchmarks.fake_twitter import FAKE_TWEET_ID_BASE, FakeAPI, tweet_time  # noqa: E402
+from benchmarks.report import DEFAULT_OUTPUT  # noqa: E402
+from benchmarks.synthetic import make_tweets  # noqa: E402
+
+# Seconds spent per stage, summed over concurrent searches and batches
+STAGE_HISTOGRAMS = {
+    "api": API_REQUEST_SECONDS,
+    "rate_limit_wait": RATE_LIMIT_WAIT_SECONDS,
+    "mapping": MAPPING_SECONDS,
+    "db_batch": DB_BATCH_SECONDS,
+    "spool_append": SPOOL_APPEND_SECONDS,
+    "spool_drain": SPOOL_DRAIN_SECONDS,
+}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--handles", type=int, default=200, help="target handles in the end-to-end run")
+    parser.add_argument("--tweets-per-handle", type=int, default=100, help="tweets the fake API has per handle")
+    parser.add_argument("--accounts", type=int, default=5, help="scraper accounts in the pool")
+    parser.add_argument("--page-latency", type=float, default=0.05, help="seconds per search page")
+    parser.add_argument("--latency-jitter", type=float, default=0.02, help="extra random seconds per page")
+    parser.add_argument("--api-rate-limit", type=int, default=0,
+                        help="fake 429 after this many requests per account per RATE_LIMIT_WINDOW, 0 = never")
+    parser.add_argument("--api-error-rate", type=float, default=0.0, help="share of requests failing with a 503")
+    parser.add_argument("--db-statement-latency", type=float, default=0.002, help="seconds per SQL statement")
+    parser.add_argument("--db-row-latency", type=float, default=0.00002, help="seconds per written row")
+    parser.add_argument("--window-tweets", type=int, default=2000,
+                        help="tweets in the busy window scraped by the window stage, 0 skips it")
+    parser.add_argument("--stage-tweets", type=int, default=20000, help="tweets for the mapping and insert stages")
+    parser.add_argument("--trace-memory", action="store_true", help="record the tracemalloc peak (slower)")
+    parser.add_argument("--label", default="", help="free-form name stored with the results")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="JSON lines file results are appended to")
+    parser.add_argument("--log-level", default="WARNING")
+    return parser.parse_args(argv)
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def stage_seconds():
+    return {name: sum(total for _, total, _ in histogram.snapshot().values())
+            for name, histogram in STAGE_HISTOGRAMS.items()}
+
+
+def stage_delta(before, after):
+    return {name: round(after[name] - before[name], 4) for name in after}
+
+
+def max_rss_mb():
+    # ru_maxrss is in kilobytes on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def bench_mapping(tweets):
+    """Per-tweet dictionary mappers against the batch row builders"""
+    started = time.perf_counter()
+    for tweet in tweets:
+        map_tweet_to_enhanced_tweets(tweet)
+        map_tweet_user_to_profile(tweet.user)
+    per_tweet = time.perf_counter() - started
+
+    started = time.perf_counter()
+    now = datetime.now()
+    tweet_rows = build_enhanced_tweet_rows(tweets, now=now)
+    profile_rows = build_profile_rows([tweet.user for tweet in tweets], now=now)
+    batch = time.perf_counter() - started
+    return {
+        "map_per_tweet_tweets_per_second": round(len(tweets) / per_tweet),
+        "map_batch_tweets_per_second": round(len(tweets) / batch),
+    }, tweet_rows, profile_rows
+
+
+async def bench_map_pool(tweets):
+    """SCRAPE_BATCH_SIZE batches mapped concurrently in the process pool, after one warm-up batch"""
+    now = datetime.now()
+    await map_pool.map(tweets[:1], [tweets[0].user], now)
+    batches = [tweets[start:start + SCRAPE_BATCH_SIZE] for start in range(0, len(tweets), SCRAPE_BATCH_SIZE)]
+    started = time.perf_counter()
+    await asyncio.gather(*(map_pool.map(batch, list({tweet.user.id: tweet.user for tweet in batch}.values()), now)
+                           for batch in batches))
+    return {"map_pool_tweets_per_second": round(len(tweets) / (time.perf_counter() - started))}
+
+
+def bench_inserts(tweet_rows, profile_rows):
+    """
+    Insert helpers in SCRAPE_BATCH_SIZE batches, then drain the spool
+    With the spool enabled the helpers only append locally, the drain is the MySQL side
+    """
+    started = time.perf_counter()
+    for start in range(0, len(tweet_rows), SCRAPE_BATCH_SIZE):
+        insert_enhanced_tweets_to_db(tweet_rows[start:start + SCRAPE_BATCH_SIZE])
+        insert_twitter_profiles_to_db(profile_rows[start:start + SCRAPE_BATCH_SIZE])
+    inserted = time.perf_counter() - started
+    rows = len(tweet_rows) + len(profile_rows)
+    results = {"insert_rows_per_second": round(rows / inserted)}
+
+    if SPOOL_ENABLED:
+        started = time.perf_counter()
+        spool.drain()
+        results["spool_drain_rows_per_second"] = round(rows / (time.perf_counter() - started))
+    return results
+
+
+async def bench_window(args, usernames, writer):
+    """scrape_window over one handle's busy window, split across the accounts until it is complete"""
+    api = FakeAPI(tweets_per_handle=args.window_tweets, page_latency=args.page_latency,
+                  latency_jitter=args.latency_jitter)
+    for username in usernames:
+        await api.pool.add_account(username=username, password="", email="", email_password="", cookies="")
+    # The first handle's tweets are one second apart, newest first
+    newest = FAKE_TWEET_ID_BASE + 1_000_000
+    until_time = tweet_time(newest) + 1
+    since_time = until_time - args.window_tweets
+    window_planner = WindowPlanner()
+    started = time.perf_counter()
+    tweets = await scrape_window(api, ["bench_window_handle"], since_time, until_time, writer=writer,
+                                 limit=SCRAPE_LIMIT, scheduler=RateLimitScheduler(usernames),
+                                 concurrency=SCRAPE_CONCURRENCY * len(usernames), window_planner=window_planner)
+    elapsed = time.perf_counter() - started
+    return {
+        "window_tweets": tweets,
+        "window_searches": window_planner.searches,
+        "window_seconds": round(elapsed, 4),
+        "window_tweets_per_second": round(tweets / elapsed, 1) if elapsed else 0.0,
+    }
+
+
+async def bench_scrape(args):
+    """scrape_tweets for one handle, then scrape_targets over every handle through the writer and spool"""
+    api = FakeAPI(tweets_per_handle=args.tweets_per_handle, page_latency=args.page_latency,
+                  latency_jitter=args.latency_jitter, rate_limit=args.api_rate_limit,
+                  rate_limit_window=RATE_LIMIT_WINDOW, error_rate=args.api_error_rate)
+    usernames = [f"bench_account_{n}" for n in range(args.accounts)]
+    for username in usernames:
+        await api.pool.add_account(username=username, password="", email="", email_password="", cookies="")
+    scheduler = RateLimitScheduler(usernames)
+    handles = [f"bench_handle_{n}" for n in range(args.handles)]
+
+    if SPOOL_ENABLED:
+        spool.start()
+    async with AsyncDBWriter() as writer:
+        started = time.perf_counter()
+        await scrape_tweets(api, "bench_solo_handle", writer=writer)
+        results = {"scrape_tweets_seconds": round(time.perf_counter() - started, 4)}
+        if args.window_tweets:
+            results.update(await bench_window(args, usernames, writer))
+
+    before = stage_seconds()
+    started = time.perf_counter()
+    async with AsyncDBWriter() as writer:
+        try:
+            counts = await scrape_targets(api, handles, concurrency=SCRAPE_CONCURRENCY * len(usernames),
+                                          writer=writer, limit=SCRAPE_LIMIT, scheduler=scheduler)
+        except Exception as e:
+            # Every search failed, e.g. a fake rate limit far below RATE_LIMIT_SEARCH
+            counts = {}
+            results["e2e_error"] = str(e)
+    scraped = time.perf_counter() - started
+    if SPOOL_ENABLED:
+        await asyncio.to_thread(spool.close)
+    elapsed = time.perf_counter() - started
+
+    tweets = sum(counts.values())
+    results.update({
+        "e2e_tweets": tweets,
+        "e2e_seconds": round(elapsed, 4),
+        "e2e_scrape_seconds": round(scraped, 4),
+        "e2e_tweets_per_second": round(tweets / elapsed, 1) if elapsed else 0.0,
+        "stage_seconds": stage_delta(before, stage_seconds()),
+        "api": api.stats(),
+    })
+    return results
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    configure_logging(level=args.log_level.upper())
+    server = install_fake_db(db, FakeServer(args.db_statement_latency, args.db_row_latency))
+
+    try:
+        tweets = make_tweets(args.stage_tweets)
+        results, tweet_rows, profile_rows = bench_mapping(tweets)
+        if map_pool.enabled:
+            results.update(asyncio.run(bench_map_pool(tweets)))
+            # The semaphore belongs to that event loop, bench_scrape restarts the pool in its own
+            map_pool.close()
+        results.update(bench_inserts(tweet_rows, profile_rows))
+        del tweets, tweet_rows, profile_rows
+
+        if args.trace_memory:
+            tracemalloc.start()
+        results.update(asyncio.run(bench_scrape(args)))
+        if args.trace_memory:
+            results["e2e_tracemalloc_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 1)
+            tracemalloc.stop()
+        results["max_rss_mb"] = max_rss_mb()
+        results["db"] = server.stats()
+    finally:
+        map_pool.close()
+        shutil.rmtree(SPOOL_DIR, ignore_errors=True)
+
+    params = {key: value for key, value in vars(args).items() if key not in ("label", "output", "log_level")}
+    params.update({
+        "spool_enabled": SPOOL_ENABLED,
+        "scrape_limit": SCRAPE_LIMIT,
+        "scrape_batch_size": SCRAPE_BATCH_SIZE,
+        "scrape_concurrency": SCRAPE_CONCURRENCY,
+        "map_workers": map_pool.workers,
+        "bulk_load_threshold": db.bulk_load_threshold,
+        "rate_limit_window": RATE_LIMIT_WINDOW,
+    })
+    record = {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "label": args.label,
+        "params": params,
+        "results": results,
+    }
+    with open(args.output, "a", encoding="utf-8") as output:
+        output.write(json.dumps(record, sort_keys=True) + "\n")
+
+    print(json.dumps(results, indent=2, sort_keys=True))
+    print(f"Appended results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
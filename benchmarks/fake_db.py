@@ -0,0 +1,116 @@
+"""
+Local stand-in for the MySQL server behind db_configs.db
+install_fake_db() swaps the pool's connections for fake ones, so the real
+Database code (pool, transactions, executemany, LOAD DATA staging) runs
+against a latency model instead of a server: every statement costs
+`statement_latency` seconds plus `row_latency` per row
+"""
+
+import re
+import threading
+import time
+from collections import Counter
+from db_configs import ConnectionPool
+
+TABLE_PATTERN = re.compile(
+    r'^\s*(?:INSERT\s+(?:IGNORE\s+)?INTO|UPDATE|DELETE\s+FROM|SELECT\b.*?\bFROM|LOAD\s+DATA\s+LOCAL\s+INFILE\s+%s\s+INTO\s+TABLE)'
+    r'\s+([\w.]+)', re.IGNORECASE | re.DOTALL
+)
+
+WRITE_PATTERN = re.compile(r'^\s*(?:INSERT|UPDATE|DELETE|LOAD)\b', re.IGNORECASE)
+
+
+class FakeServer:
+    """Latency model and statement/row counters shared by every fake connection"""
+
+    def __init__(self, statement_latency=0.002, row_latency=0.00002, accounts=()):
+        self.statement_latency = statement_latency
+        self.row_latency = row_latency
+        self.accounts = list(accounts)  # (username, cookie) rows returned to account claims
+        self.statements = Counter()  # table -> statements
+        self.rows = Counter()  # table -> rows written, INSERT ... SELECT counts as one
+        self.commits = 0
+        self._lock = threading.Lock()
+
+    def run(self, query, rows):
+        """Sleep for one statement touching `rows` rows, returns the table it targets"""
+        table = TABLE_PATTERN.match(query)
+        table = table.group(1) if table else query.split()[0].upper()
+        delay = self.statement_latency + self.row_latency * rows
+        if delay > 0:
+            time.sleep(delay)
+        with self._lock:
+            self.statements[table] += 1
+            if rows and WRITE_PATTERN.match(query):
+                self.rows[table] += rows
+        return table
+
+    def stats(self):
+        with self._lock:
+            return {
+                'statements': sum(self.statements.values()),
+                'rows': sum(self.rows.values()),
+                'commits': self.commits,
+                'rows_by_table': dict(self.rows),
+            }
+
+
+class FakeCursor:
+    def __init__(self, server):
+        self.server = server
+        self.rowcount = 0
+        self._results = []
+
+    def execute(self, query, values=None):
+        self._results = []
+        rows = 1
+        if query.lstrip().upper().startswith("LOAD DATA"):
+            with open(values[0], encoding='utf-8') as tsv:
+                rows = sum(1 for _ in tsv)
+        table = self.server.run(query, rows)
+        if table == "configs.twitter_scrapers" and "SKIP LOCKED" in query:
+            self._results = self.server.accounts[:values[-1]]
+        self.rowcount = len(self._results) or rows
+        return self.rowcount
+
+    def executemany(self, query, values):
+        values = list(values)
+        self.server.run(query, len(values))
+        self.rowcount = len(values)
+        return self.rowcount
+
+    def fetchall(self):
+        return self._results
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, server):
+        self.server = server
+        self.open = True
+
+    def cursor(self):
+        return FakeCursor(self.server)
+
+    def commit(self):
+        with self.server._lock:
+            self.server.commits += 1
+
+    def rollback(self):
+        pass
+
+    def ping(self, reconnect=True):
+        pass
+
+    def close(self):
+        self.open = False
+
+
+def install_fake_db(db, server):
+    """Point db's connection pool at the fake server, keeping the pool settings"""
+    pool = db.pool
+    db.pool = ConnectionPool(lambda: FakeConnection(server), max_size=pool.max_size,
+                             max_idle=pool.max_idle, timeout=pool.timeout)
+    return server
@@ -0,0 +1,221 @@
+"""
+Local stand-in for twscrape.API
+Serves synthetic tweets for `search` queries built by the scraper, with a
+configurable page latency, per-account rate limit and transient error rate,
+so the scrape pipeline can be driven end to end without Twitter
+"""
+
+import asyncio
+import random
+import re
+import time
+from types import SimpleNamespace
+from benchmarks.synthetic import BASE_DATE, make_tweet, make_user
+
+SEARCH_PAGE_SIZE = 20
+# Ids are far above the ones make_tweets() uses, so both can share the caches
+FAKE_TWEET_ID_BASE = 1_900_000_000_000_000_000
+FAKE_USER_ID_BASE = 10_000_000
+# Replies of conversation c get ids FAKE_REPLY_ID_BASE + (c % 10**9) * 1000 + n
+FAKE_REPLY_ID_BASE = 2_000_000_000_000_000_000
+
+FROM_PATTERN = re.compile(r'from:(\w+)')
+SINCE_ID_PATTERN = re.compile(r'since_id:(\d+)')
+SINCE_TIME_PATTERN = re.compile(r'since_time:(\d+)')
+UNTIL_TIME_PATTERN = re.compile(r'until_time:(\d+)')
+CONVERSATION_PATTERN = re.compile(r'conversation_id:(\d+)')
+
+
+def tweet_time(tweet_id):
+    """Unix seconds of the date make_tweet gives a tweet id"""
+    return int(BASE_DATE.timestamp()) + tweet_id % 10000000
+
+
+class FakeAPIError(Exception):
+    """Carries an HTTP status code the way twscrape errors do, for classify_error"""
+
+    def __init__(self, status_code, message):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class FakePool:
+    def __init__(self):
+        self.usernames = []
+
+    async def add_account(self, username, password, email, email_password, cookies=None):
+        if username not in self.usernames:
+            self.usernames.append(username)
+
+    async def delete_accounts(self, usernames):
+        usernames = [usernames] if isinstance(usernames, str) else usernames
+        self.usernames = [username for username in self.usernames if username not in usernames]
+
+    async def get_all(self):
+        return [SimpleNamespace(username=username, active=True, locks={}, error_msg=None)
+                for username in self.usernames]
+
+
+class FakeAPI:
+    """
+    Every handle has `tweets_per_handle` tweets, newest first; search pages
+    of SEARCH_PAGE_SIZE tweets take `page_latency` seconds (plus up to
+    `latency_jitter`) and are charged to the pool's accounts round robin. With `rate_limit` set, an account's request beyond
+    `rate_limit` per `rate_limit_window` seconds fails with a 429
+    `conversation_id:` searches return `replies_per_conversation` direct
+    replies per conversation and tweet_details serves any id
+    A handle's tweets are one second apart (make_tweet dates them by id), and
+    since_time/until_time searches return the ones inside the window
+    Lookups by user id return every id except multiples of 50, which stand
+    in for suspended accounts
+    """
+
+    def __init__(self, tweets_per_handle=100, page_latency=0.05, latency_jitter=0.0, rate_limit=0,
+                 rate_limit_window=900, error_rate=0.0, seed=42, replies_per_conversation=30):
+        self.pool = FakePool()
+        self.tweets_per_handle = tweets_per_handle
+        self.replies_per_conversation = replies_per_conversation
+        self.page_latency = page_latency
+        self.latency_jitter = latency_jitter
+        self.rate_limit = rate_limit
+        self.rate_limit_window = rate_limit_window
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.users = {}  # lower-cased handle -> synthetic user
+        self.handle_indexes = {}  # lower-cased handle -> position, keeps id ranges apart
+        self.requests = 0
+        self.rate_limited = 0
+        self.errors = 0
+        self._windows = {}  # username -> (window start, requests)
+        self._next_account = 0
+
+    def _user(self, handle):
+        key = handle.lower()
+        user = self.users.get(key)
+        if user is None:
+            self.handle_indexes[key] = len(self.users)
+            user = make_user(FAKE_USER_ID_BASE + len(self.users), self.rng)
+            user.username = handle
+            self.users[key] = user
+        return user
+
+    def _charge(self):
+        """Pick the next account and fail the request if it is over its limit"""
+        self.requests += 1
+        if self.error_rate and self.rng.random() < self.error_rate:
+            self.errors += 1
+            raise FakeAPIError(503, "Service unavailable")
+        if not self.rate_limit or not self.pool.usernames:
+            return
+        username = self.pool.usernames[self._next_account % len(self.pool.usernames)]
+        self._next_account += 1
+        now = time.monotonic()
+        started, requests = self._windows.get(username, (now, 0))
+        if now - started >= self.rate_limit_window:
+            started, requests = now, 0
+        if requests >= self.rate_limit:
+            self.rate_limited += 1
+            raise FakeAPIError(429, f"Rate limit exceeded for {username}")
+        self._windows[username] = (started, requests + 1)
+
+    async def _page(self):
+        delay = self.page_latency + self.rng.uniform(0, self.latency_jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        self._charge()
+
+    def _timeline(self, handle, since_id, since_time=None, until_time=None):
+        """Tweet ids of one handle, newest first, above since_id and within since_time/until_time"""
+        self._user(handle)
+        newest = FAKE_TWEET_ID_BASE + (self.handle_indexes[handle.lower()] + 1) * 1_000_000
+        for offset in range(self.tweets_per_handle):
+            tweet_id = newest - offset
+            if since_id is not None and tweet_id <= since_id:
+                return
+            created = tweet_time(tweet_id)
+            if since_time is not None and created < since_time:
+                return
+            if until_time is not None and created >= until_time:
+                continue
+            yield tweet_id
+
+    def _reply(self, conversation_id, n):
+        reply_id = FAKE_REPLY_ID_BASE + (conversation_id % 10 ** 9) * 1000 + n
+        tweet = make_tweet(reply_id, self._user(f"replier_{reply_id % 1000}"), self.rng)
+        tweet.conversationId = conversation_id
+        tweet.inReplyToTweetId = conversation_id
+        tweet.replyCount = 0
+        return tweet
+
+    async def _conversations(self, conversation_ids, limit):
+        replies = [(conversation_id, n) for n in range(self.replies_per_conversation)
+                   for conversation_id in conversation_ids]
+        if limit is not None and limit >= 0:
+            replies = replies[:limit]
+        for start in range(0, len(replies), SEARCH_PAGE_SIZE):
+            await self._page()
+            for conversation_id, n in replies[start:start + SEARCH_PAGE_SIZE]:
+                yield self._reply(conversation_id, n)
+
+    async def search(self, query, limit=-1, kv=None):
+        conversation_ids = [int(match) for match in CONVERSATION_PATTERN.findall(query)]
+        if conversation_ids:
+            async for tweet in self._conversations(conversation_ids, limit):
+                yield tweet
+            return
+
+        handles = FROM_PATTERN.findall(query) or [query.split()[0]]
+        match = SINCE_ID_PATTERN.search(query)
+        since_id = int(match.group(1)) if match else None
+        match = SINCE_TIME_PATTERN.search(query)
+        since_time = int(match.group(1)) if match else None
+        match = UNTIL_TIME_PATTERN.search(query)
+        until_time = int(match.group(1)) if match else None
+
+        # Interleave the handles' timelines by id, like one search over several authors
+        timelines = [(handle, tweet_id) for handle in handles
+                     for tweet_id in self._timeline(handle, since_id, since_time, until_time)]
+        timelines.sort(key=lambda item: item[1], reverse=True)
+        if limit is not None and limit >= 0:
+            timelines = timelines[:limit]
+
+        for start in range(0, len(timelines), SEARCH_PAGE_SIZE):
+            await self._page()
+            for handle, tweet_id in timelines[start:start + SEARCH_PAGE_SIZE]:
+                yield make_tweet(tweet_id, self._user(handle), self.rng)
+
+    async def user_by_login(self, handle):
+        await self._page()
+        return self._user(handle)
+
+    async def tweet_details(self, tweet_id, kv=None):
+        await self._page()
+        return make_tweet(int(tweet_id), self._user(f"thread_author_{int(tweet_id) % 1000}"), self.rng)
+
+    def _user_by_id(self, user_id):
+        user_id = int(user_id)
+        return None if user_id % 50 == 0 else make_user(user_id, self.rng)
+
+    async def user_by_id(self, user_id, kv=None):
+        await self._page()
+        return self._user_by_id(user_id)
+
+    async def user_by_id_raw(self, user_id, kv=None):
+        """Response shaped like twscrape's UserByRestId reply, ids user_by_id misses are suspended"""
+        await self._page()
+        result = {"__typename": "User", "rest_id": str(user_id), "legacy": {"protected": False}}
+        if self._user_by_id(user_id) is None:
+            result = {"__typename": "UserUnavailable", "reason": "Suspended"}
+        return SimpleNamespace(json=lambda: {"data": {"user": {"result": result}}})
+
+    async def users_by_ids(self, user_ids, kv=None):
+        await self._page()
+        return [user for user in map(self._user_by_id, user_ids) if user is not None]
+
+    def stats(self):
+        return {
+            'requests': self.requests,
+            'rate_limited': self.rate_limited,
+            'errors': self.errors,
+            'handles': len(self.users),
+        }
@@ -0,0 +1,96 @@
+"""
+Benchmark history report
+Reads the JSON lines written by benchmarks.bench_pipeline, groups runs with
+identical parameters and prints the tracked numbers of each run with the
+change against the previous run. Exits with status 1 when the latest run of
+any group is worse than its predecessor by more than --threshold percent
+
+Usage: python -m benchmarks.report [results.jsonl] [--threshold 10] [--last 10]
+"""
+
+import argparse
+import json
+import os
+import sys
+from collections import OrderedDict
+
+DEFAULT_OUTPUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results.jsonl")
+
+# Tracked result -> True when higher is better
+TRACKED_RESULTS = OrderedDict([
+    ("e2e_tweets_per_second", True),
+    ("window_tweets_per_second", True),
+    ("scrape_tweets_seconds", False),
+    ("map_batch_tweets_per_second", True),
+    ("map_pool_tweets_per_second", True),
+    ("insert_rows_per_second", True),
+    ("spool_drain_rows_per_second", True),
+    ("max_rss_mb", False),
+])
+
+
+def load_runs(path):
+    with open(path, encoding="utf-8") as results:
+        return [json.loads(line) for line in results if line.strip()]
+
+
+def group_runs(runs):
+    """Runs keyed by their parameters, oldest first"""
+    groups = OrderedDict()
+    for run in runs:
+        groups.setdefault(json.dumps(run["params"], sort_keys=True), []).append(run)
+    return groups
+
+
+def change(previous, current, higher_is_better):
+    """Percent change, positive when the run got better"""
+    if not previous or current is None:
+        return None
+    delta = (current - previous) / previous * 100
+    return delta if higher_is_better else -delta
+
+
+def report_group(runs, last, threshold):
+    """Print one parameter group, returns the regressions of its latest run"""
+    names = [name for name in TRACKED_RESULTS if any(name in run["results"] for run in runs)]
+    header = ["timestamp", "commit", "label"] + names
+    rows = []
+    regressions = []
+    for index, run in enumerate(runs):
+        previous = runs[index - 1]["results"] if index else {}
+        cells = [run["timestamp"], run.get("commit") or "-", run.get("label") or "-"]
+        for name in names:
+            value = run["results"].get(name)
+            delta = change(previous.get(name), value, TRACKED_RESULTS[name])
+            cells.append("-" if value is None else f"{value:g}" + ("" if delta is None else f" ({delta:+.1f}%)"))
+            if index == len(runs) - 1 and delta is not None and delta < -threshold:
+                regressions.append(f"{name} {delta:+.1f}%")
+        rows.append(cells)
+
+    rows = rows[-last:]
+    widths = [max(len(str(cell)) for cell in column) for column in zip(header, *rows)]
+    for cells in [header] + rows:
+        print("  ".join(str(cell).ljust(width) for cell, width in zip(cells, widths)).rstrip())
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark history report")
+    parser.add_argument("path", nargs="?", default=DEFAULT_OUTPUT)
+    parser.add_argument("--threshold", type=float, default=10.0,
+                        help="percent a tracked number may get worse before the report fails")
+    parser.add_argument("--last", type=int, default=10, help="runs shown per parameter group")
+    args = parser.parse_args(argv)
+
+    failed = False
+    for params, runs in group_runs(load_runs(args.path)).items():
+        print(f"\nParameters: {params}")
+        regressions = report_group(runs, args.last, args.threshold)
+        if regressions:
+            failed = True
+            print(f"❌ Latest run regressed: {', '.join(regressions)}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Synthetic twscrape-like Tweet and User objects for offline benchmarks
+Objects carry every attribute the mappers read, with realistic shapes
+"""
+
+import random
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+WORDS = ["gm", "wagmi", "launch", "airdrop", "chart", "pump", "ser", "alpha", "thread", "update",
+         "bullish", "bearish", "liquidity", "staking", "bridge", "mainnet", "testnet", "yield"]
+CASHTAGS = ["BTC", "ETH", "SOL", "PEPE", "ARB", "OP", "LINK", "DOGE"]
+BIOS = ["crypto trader and web3 builder", "building on ethereum", "coffee, books and running",
+        "nft collector", "defi researcher", "photographer and method actor"]
+BASE58 = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+BASE_DATE = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+class Model(SimpleNamespace):
+    """Attribute bag with twscrape's dict(), picklable so it can cross process boundaries"""
+
+    def dict(self):
+        return as_dict(self)
+
+
+def as_dict(value):
+    if isinstance(value, SimpleNamespace):
+        return {field: as_dict(item) for field, item in vars(value).items()}
+    if isinstance(value, list):
+        return [as_dict(item) for item in value]
+    return value
+
+
+def make_user(user_id, rng=random):
+    username = f"user_{user_id}"
+    return Model(
+        id=user_id,
+        id_str=str(user_id),
+        username=username,
+        displayname=username.replace("_", " ").title(),
+        rawDescription=rng.choice(BIOS),
+        descriptionLinks=[SimpleNamespace(url=f"https://example.com/{username}")] if user_id % 3 == 0 else [],
+        profileImageUrl=f"https://pbs.twimg.com/profile_images/{user_id}.jpg",
+        profileBannerUrl=None,
+        followersCount=rng.randint(0, 100000),
+        friendsCount=rng.randint(0, 5000),
+        verified=user_id % 10 == 0,
+        created=BASE_DATE - timedelta(days=user_id % 3000),
+        statusesCount=rng.randint(0, 50000),
+    )
+
+
+def make_tweet(tweet_id, user, rng=random):
+    cashtags = rng.sample(CASHTAGS, rng.randint(0, 3))
+    words = rng.choices(WORDS, k=rng.randint(5, 40))
+    body = " ".join(words + [f"${tag}" for tag in cashtags])
+    if tweet_id % 7 == 0:
+        body += " 0x" + "".join(rng.choices("0123456789abcdef", k=40))
+    if tweet_id % 11 == 0:
+        body += " CA: " + "".join(rng.choices(BASE58, k=44))
+    photos = [SimpleNamespace(url=f"https://pbs.twimg.com/media/{tweet_id}_{n}.jpg")
+              for n in range(rng.randint(0, 2))]
+    return Model(
+        id=tweet_id,
+        id_str=str(tweet_id),
+        url=f"https://x.com/{user.username}/status/{tweet_id}",
+        date=BASE_DATE + timedelta(seconds=tweet_id % 10000000),
+        user=user,
+        rawContent=body,
+        retweetCount=rng.randint(0, 500),
+        likeCount=rng.randint(0, 5000),
+        replyCount=rng.randint(0, 200),
+        quoteCount=rng.randint(0, 50),
+        viewCount=rng.randint(0, 100000),
+        conversationId=tweet_id,
+        hashtags=["crypto"] if tweet_id % 5 == 0 else [],
+        cashtags=cashtags,
+        mentionedUsers=[],
+        links=[],
+        media=SimpleNamespace(photos=photos, videos=[], animated=[]),
+        retweetedTweet=None,
+        quotedTweet=None,
+        inReplyToTweetId=tweet_id - 1 if tweet_id % 4 == 0 else None,
+        source=None,
+    )
+
+
+def make_tweets(count, users=500, seed=42, start_id=1_800_000_000_000_000_000):
+    """Build `count` tweets spread over `users` authors"""
+    rng = random.Random(seed)
+    authors = [make_user(1000 + n, rng) for n in range(users)]
+    return [make_tweet(start_id + n, authors[n % users], rng) for n in range(count)]
@@ -1,3 +1,13 @@
+# Column order of INSERT_INTO_ENHANCED_TWEETS_QUERY, mapped rows are tuples in this order
+ENHANCED_TWEETS_COLUMNS = (
+    "tweet_id", "author_id", "body", "author_handle", "tweet_create_time", "create_time", "retweet_count",
+    "like_count", "reply_count", "quote_count", "view_count", "update_time", "profile_image_url",
+    "is_hidden", "impressions", "matching_values", "is_mapped", "sentiment", "source", "scraped_by",
+    "number_of_cashtags", "tweet_category", "first_cashtag", "main_cashtag", "number_of_hashtags",
+    "number_of_mentions", "number_of_contracts", "number_of_links", "is_full_body", "sentiment_new",
+    "is_reply", "reply_to", "is_quote", "quoted_to", "images",
+)
+
 INSERT_INTO_ENHANCED_TWEETS_QUERY = """
 INSERT INTO twitter.enhanced_tweets 
 (tweet_id, author_id, body, author_handle, tweet_create_time, create_time, retweet_count, 
@@ -14,6 +24,15 @@ reply_count=VALUES(reply_count), quote_count=VALUES(quote_count), view_count=VAL
 update_time=VALUES(update_time), impressions=VALUES(impressions)
 """
 
+# Column order of INSERT_INTO_TWITTER_PROFILES_QUERY
+TWITTER_PROFILES_COLUMNS = (
+    "author_id", "name", "handle", "bio", "url_in_bio", "profile_image_url", "profile_banner_url",
+    "followers_count", "followings_count", "is_verified", "account_created_at", "tag", "is_active",
+    "inserted_at", "updated_at", "ai_tag", "is_processed_by_ai", "scraped_by", "professional_category",
+    "lifetime_tweets", "lifetime_views", "processed_by", "is_crypto_user", "smart_followers_count",
+    "confidence_score",
+)
+
 INSERT_INTO_TWITTER_PROFILES_QUERY = """
 INSERT INTO twitter.twitter_profiles 
 (author_id, name, handle, bio, url_in_bio, profile_image_url, profile_banner_url, 
@@ -31,16 +50,139 @@ updated_at=VALUES(updated_at), lifetime_tweets=VALUES(lifetime_tweets),
 lifetime_views=VALUES(lifetime_views), scraped_by=VALUES(scraped_by)
 """
 
+# Bulk ingest queries
+# Large batches are written to a TSV, loaded with LOAD DATA LOCAL INFILE into a
+# session-scoped staging table and upserted set-based; columns follow the
+# *_COLUMNS tuples and the upserts mirror the row-by-row queries above
+ENHANCED_TWEETS_BULK_QUERIES = {
+    'drop_staging': "DROP TEMPORARY TABLE IF EXISTS enhanced_tweets_staging",
+    'create_staging': f"""
+CREATE TEMPORARY TABLE enhanced_tweets_staging
+SELECT {", ".join(ENHANCED_TWEETS_COLUMNS)} FROM twitter.enhanced_tweets LIMIT 0
+""",
+    'load': f"""
+LOAD DATA LOCAL INFILE %s INTO TABLE enhanced_tweets_staging
+CHARACTER SET utf8mb4
+FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\'
+LINES TERMINATED BY '\\n'
+({", ".join(ENHANCED_TWEETS_COLUMNS)})
+""",
+    'upsert': f"""
+INSERT INTO twitter.enhanced_tweets
+({", ".join(ENHANCED_TWEETS_COLUMNS)})
+SELECT {", ".join(ENHANCED_TWEETS_COLUMNS)} FROM enhanced_tweets_staging
+ON DUPLICATE KEY UPDATE
+body=VALUES(body), retweet_count=VALUES(retweet_count), like_count=VALUES(like_count),
+reply_count=VALUES(reply_count), quote_count=VALUES(quote_count), view_count=VALUES(view_count),
+update_time=VALUES(update_time), impressions=VALUES(impressions)
+""",
+}
+
+TWITTER_PROFILES_BULK_QUERIES = {
+    'drop_staging': "DROP TEMPORARY TABLE IF EXISTS twitter_profiles_staging",
+    'create_staging': f"""
+CREATE TEMPORARY TABLE twitter_profiles_staging
+SELECT {", ".join(TWITTER_PROFILES_COLUMNS)} FROM twitter.twitter_profiles LIMIT 0
+""",
+    'load': f"""
+LOAD DATA LOCAL INFILE %s INTO TABLE twitter_profiles_staging
+CHARACTER SET utf8mb4
+FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\'
+LINES TERMINATED BY '\\n'
+({", ".join(TWITTER_PROFILES_COLUMNS)})
+""",
+    'upsert': f"""
+INSERT INTO twitter.twitter_profiles
+({", ".join(TWITTER_PROFILES_COLUMNS)})
+SELECT {", ".join(TWITTER_PROFILES_COLUMNS)} FROM twitter_profiles_staging
+ON DUPLICATE KEY UPDATE
+name=VALUES(name), bio=VALUES(bio), url_in_bio=VALUES(url_in_bio),
+profile_image_url=VALUES(profile_image_url), profile_banner_url=VALUES(profile_banner_url),
+followers_count=VALUES(followers_count), followings_count=VALUES(followings_count),
+is_verified=VALUES(is_verified), account_created_at=VALUES(account_created_at),
+updated_at=VALUES(updated_at), lifetime_tweets=VALUES(lifetime_tweets),
+lifetime_views=VALUES(lifetime_views), scraped_by=VALUES(scraped_by)
+""",
+}
+
+
+# Archive Replay Queries
+# Archived tweets carry the engagement counters of their capture time, so
+# replays insert missing rows in full but only refresh the columns the
+# mappers derive from the raw tweet on rows that already exist
+ENHANCED_TWEETS_REMAP_COLUMNS = (
+    "author_handle", "source", "number_of_cashtags", "tweet_category", "first_cashtag", "main_cashtag",
+    "number_of_hashtags", "number_of_mentions", "number_of_contracts", "number_of_links", "is_full_body",
+    "is_reply", "reply_to", "is_quote", "quoted_to", "images",
+)
+TWITTER_PROFILES_REMAP_COLUMNS = ("url_in_bio", "is_crypto_user")
+
+ENHANCED_TWEETS_REMAP_UPDATE = ", ".join(f"{column}=VALUES({column})" for column in ENHANCED_TWEETS_REMAP_COLUMNS)
+TWITTER_PROFILES_REMAP_UPDATE = ", ".join(f"{column}=VALUES({column})" for column in TWITTER_PROFILES_REMAP_COLUMNS)
+
+REMAP_ENHANCED_TWEETS_QUERY = f"""
+INSERT INTO twitter.enhanced_tweets
+({", ".join(ENHANCED_TWEETS_COLUMNS)})
+VALUES ({", ".join(["%s"] * len(ENHANCED_TWEETS_COLUMNS))})
+ON DUPLICATE KEY UPDATE
+{ENHANCED_TWEETS_REMAP_UPDATE}
+"""
+
+REMAP_TWITTER_PROFILES_QUERY = f"""
+INSERT INTO twitter.twitter_profiles
+({", ".join(TWITTER_PROFILES_COLUMNS)})
+VALUES ({", ".join(["%s"] * len(TWITTER_PROFILES_COLUMNS))})
+ON DUPLICATE KEY UPDATE
+{TWITTER_PROFILES_REMAP_UPDATE}
+"""
+
+ENHANCED_TWEETS_REMAP_BULK_QUERIES = dict(ENHANCED_TWEETS_BULK_QUERIES, upsert=f"""
+INSERT INTO twitter.enhanced_tweets
+({", ".join(ENHANCED_TWEETS_COLUMNS)})
+SELECT {", ".join(ENHANCED_TWEETS_COLUMNS)} FROM enhanced_tweets_staging
+ON DUPLICATE KEY UPDATE
+{ENHANCED_TWEETS_REMAP_UPDATE}
+""")
+
+TWITTER_PROFILES_REMAP_BULK_QUERIES = dict(TWITTER_PROFILES_BULK_QUERIES, upsert=f"""
+INSERT INTO twitter.twitter_profiles
+({", ".join(TWITTER_PROFILES_COLUMNS)})
+SELECT {", ".join(TWITTER_PROFILES_COLUMNS)} FROM twitter_profiles_staging
+ON DUPLICATE KEY UPDATE
+{TWITTER_PROFILES_REMAP_UPDATE}
+""")
+
 # Scraper Account Management Queries
-GET_RANDOM_TWITTER_SCRAPER_ACCOUNT_QUERY = """
-SELECT username, cookie, status, is_occupied, lock_time
+CLAIM_TWITTER_SCRAPER_ACCOUNTS_QUERY = """
+SELECT username, cookie
 FROM configs.twitter_scrapers 
 WHERE status = 'active' 
-AND is_occupied = 0 
 AND used_in = 'scraper_credbuzz'
-AND (lock_time IS NULL OR lock_time < NOW() - INTERVAL 1 HOUR)
-ORDER BY RAND() 
-LIMIT 1
+AND cookie IS NOT NULL
+AND (is_occupied = 0 OR lock_time IS NULL OR lock_time < NOW() - INTERVAL %s SECOND)
+ORDER BY last_used ASC
+LIMIT %s
+FOR UPDATE SKIP LOCKED
+"""
+
+# Bulk account queries, format {placeholders} with one %s per username
+MARK_ACCOUNTS_AS_OCCUPIED_QUERY = """
+UPDATE configs.twitter_scrapers 
+SET is_occupied = 1, lock_time = NOW(), last_used = NOW()
+WHERE username IN ({placeholders})
+"""
+
+RENEW_ACCOUNTS_LOCK_QUERY = """
+UPDATE configs.twitter_scrapers 
+SET lock_time = NOW()
+WHERE username IN ({placeholders})
+AND is_occupied = 1
+"""
+
+MARK_ACCOUNTS_AS_AVAILABLE_QUERY = """
+UPDATE configs.twitter_scrapers 
+SET is_occupied = 0, lock_time = NULL
+WHERE username IN ({placeholders})
 """
 
 MARK_ACCOUNT_AS_OCCUPIED_QUERY = """
@@ -59,4 +201,194 @@ MARK_ACCOUNT_AS_ERROR_QUERY = """
 UPDATE configs.twitter_scrapers 
 SET status = 'error', error_message = %s, is_occupied = 0, lock_time = NULL, updated_at = NOW()
 WHERE username = %s
-"""
\ No newline at end of file
+"""
+
+MARK_ACCOUNT_AS_COOLDOWN_QUERY = """
+UPDATE configs.twitter_scrapers 
+SET status = 'cooldown', cooldown_until = NOW() + INTERVAL %s SECOND, error_message = %s,
+    is_occupied = 0, lock_time = NULL, updated_at = NOW()
+WHERE username = %s
+"""
+
+MARK_ACCOUNT_AS_ACTIVE_QUERY = """
+UPDATE configs.twitter_scrapers 
+SET status = 'active', cooldown_until = NULL, error_message = NULL,
+    is_occupied = 0, lock_time = NULL, updated_at = NOW()
+WHERE username = %s
+"""
+
+# Unlock an account whose probe failed without a verdict, keeping its status;
+# updated_at restarts the ERROR_REVALIDATE_AFTER wait of error accounts
+MARK_ACCOUNT_AS_PROBED_QUERY = """
+UPDATE configs.twitter_scrapers 
+SET is_occupied = 0, lock_time = NULL, updated_at = NOW()
+WHERE username = %s
+"""
+
+# Cooldown accounts past their expiry and error accounts not retried recently
+CLAIM_ACCOUNTS_FOR_REVALIDATION_QUERY = """
+SELECT username, cookie, status
+FROM configs.twitter_scrapers 
+WHERE used_in = 'scraper_credbuzz'
+AND cookie IS NOT NULL
+AND is_occupied = 0
+AND (
+    (status = 'cooldown' AND (cooldown_until IS NULL OR cooldown_until <= NOW()))
+    OR (status = 'error' AND updated_at < NOW() - INTERVAL %s SECOND)
+)
+LIMIT %s
+FOR UPDATE SKIP LOCKED
+"""
+
+# Scrape Target Queries
+GET_ACTIVE_SCRAPE_TARGETS_QUERY = """
+SELECT handle
+FROM configs.twitter_scrape_targets
+WHERE is_active = 1
+AND used_in = 'scraper_credbuzz'
+"""
+
+
+# Scrape Job Queue Queries
+# configs.scrape_jobs is shared by every worker node; recurring jobs have a
+# repeat_interval and return to 'pending' when done, one-off window jobs end as 'done'
+ENQUEUE_SCRAPE_JOB_QUERY = """
+INSERT IGNORE INTO configs.scrape_jobs
+(job_key, handle, since_time, until_time, priority, repeat_interval, max_attempts, status, attempts,
+ available_at, created_at, updated_at)
+VALUES (%s, %s, %s, %s, %s, %s, %s, 'pending', 0, NOW(), NOW(), NOW())
+"""
+
+# Leased jobs whose lease ran out after their last attempt are dead-lettered before claiming
+DEAD_LETTER_EXPIRED_SCRAPE_JOBS_QUERY = """
+UPDATE configs.scrape_jobs
+SET status = 'dead', last_error = 'Lease expired on the last attempt', lease_owner = NULL,
+    lease_expires_at = NULL, updated_at = NOW()
+WHERE status = 'leased'
+AND lease_expires_at < NOW()
+AND attempts >= max_attempts
+"""
+
+CLAIM_SCRAPE_JOBS_QUERY = """
+SELECT id, handle, since_time, until_time, attempts
+FROM configs.scrape_jobs
+WHERE ((status = 'pending' AND available_at <= NOW())
+       OR (status = 'leased' AND lease_expires_at < NOW()))
+AND attempts < max_attempts
+ORDER BY priority DESC, available_at
+LIMIT %s
+FOR UPDATE SKIP LOCKED
+"""
+
+# Bulk job queries, format {placeholders} with one %s per job id
+MARK_SCRAPE_JOBS_LEASED_QUERY = """
+UPDATE configs.scrape_jobs
+SET status = 'leased', lease_owner = %s, lease_expires_at = NOW() + INTERVAL %s SECOND,
+    attempts = attempts + 1, updated_at = NOW()
+WHERE id IN ({placeholders})
+"""
+
+RENEW_SCRAPE_JOB_LEASES_QUERY = """
+UPDATE configs.scrape_jobs
+SET lease_expires_at = NOW() + INTERVAL %s SECOND, updated_at = NOW()
+WHERE status = 'leased'
+AND lease_owner = %s
+AND id IN ({placeholders})
+"""
+
+# Unfinished jobs handed back on shutdown don't count as an attempt
+RELEASE_SCRAPE_JOBS_QUERY = """
+UPDATE configs.scrape_jobs
+SET status = 'pending', attempts = GREATEST(attempts - 1, 0), lease_owner = NULL,
+    lease_expires_at = NULL, updated_at = NOW()
+WHERE status = 'leased'
+AND lease_owner = %s
+AND id IN ({placeholders})
+"""
+
+# available_at is assigned before status, MySQL applies SET clauses left to right
+COMPLETE_SCRAPE_JOB_QUERY = """
+UPDATE configs.scrape_jobs
+SET available_at = IF(repeat_interval IS NULL, available_at, NOW() + INTERVAL repeat_interval SECOND),
+    status = IF(repeat_interval IS NULL, 'done', 'pending'),
+    attempts = 0, last_error = NULL, lease_owner = NULL, lease_expires_at = NULL,
+    completed_at = NOW(), updated_at = NOW()
+WHERE id = %s
+AND lease_owner = %s
+"""
+
+# Takes (retry delay seconds, error message, job id, lease owner)
+FAIL_SCRAPE_JOB_QUERY = """
+UPDATE configs.scrape_jobs
+SET available_at = NOW() + INTERVAL %s SECOND,
+    status = IF(attempts >= max_attempts, 'dead', 'pending'),
+    last_error = %s, lease_owner = NULL, lease_expires_at = NULL, updated_at = NOW()
+WHERE id = %s
+AND lease_owner = %s
+"""
+
+# Scrape Checkpoint Queries
+GET_SCRAPE_CHECKPOINTS_QUERY = """
+SELECT checkpoint_key, last_tweet_id, last_tweet_time
+FROM twitter.scrape_checkpoints
+WHERE checkpoint_key IN ({placeholders})
+"""
+
+# Only ever moves a checkpoint forward; last_tweet_time is assigned before last_tweet_id
+UPSERT_SCRAPE_CHECKPOINT_QUERY = """
+INSERT INTO twitter.scrape_checkpoints
+(checkpoint_key, last_tweet_id, last_tweet_time, updated_at)
+VALUES (%s, %s, %s, NOW())
+ON DUPLICATE KEY UPDATE
+last_tweet_time=IF(VALUES(last_tweet_id) > last_tweet_id, VALUES(last_tweet_time), last_tweet_time),
+last_tweet_id=GREATEST(last_tweet_id, VALUES(last_tweet_id)),
+updated_at=NOW()
+"""
+
+
+# Engagement Delta Queries
+# Stored counters and body of tweets the engagement cache doesn't know yet
+GET_ENHANCED_TWEETS_ENGAGEMENT_QUERY = """
+SELECT tweet_id, retweet_count, like_count, reply_count, quote_count, view_count, body
+FROM twitter.enhanced_tweets
+WHERE tweet_id IN ({placeholders})
+"""
+
+UPDATE_ENHANCED_TWEETS_ENGAGEMENT_QUERY = """
+UPDATE twitter.enhanced_tweets
+SET retweet_count = %s, like_count = %s, reply_count = %s, quote_count = %s, view_count = %s,
+    impressions = %s, update_time = %s
+WHERE tweet_id = %s
+"""
+
+INSERT_INTO_ENGAGEMENT_HISTORY_QUERY = """
+INSERT IGNORE INTO twitter.enhanced_tweets_engagement_history
+(tweet_id, captured_at, retweet_count, like_count, reply_count, quote_count, view_count)
+VALUES (%s, %s, %s, %s, %s, %s, %s)
+"""
+
+# Conversation Expansion Queries
+GET_EXISTING_TWEET_IDS_QUERY = """
+SELECT tweet_id
+FROM twitter.enhanced_tweets
+WHERE tweet_id IN ({placeholders})
+"""
+
+# Profile Refresh Queries
+# Stalest profiles first, weighted by reach: a day-old profile with 1M followers
+# goes before a week-old one with 10 followers
+GET_STALE_PROFILES_QUERY = """
+SELECT author_id
+FROM twitter.twitter_profiles
+WHERE is_active = 1
+AND updated_at < NOW() - INTERVAL %s SECOND
+ORDER BY TIMESTAMPDIFF(SECOND, updated_at, NOW()) * LOG10(GREATEST(followers_count, 0) + 10) DESC
+LIMIT %s
+"""
+
+# Profiles a per-id lookup reports as not found or suspended
+DEACTIVATE_TWITTER_PROFILE_QUERY = """
+UPDATE twitter.twitter_profiles
+SET is_active = 0, updated_at = %s
+WHERE author_id = %s
+"""
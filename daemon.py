@@ -0,0 +1,186 @@
+"""
+Long-running scraper daemon
+Keeps the twscrape API, the leased accounts and the database pool warm and
+re-polls every target on its own adaptive schedule instead of scraping once
+per cron tick
+"""
+
+import asyncio
+import logging
+import os
+import signal
+from scraper import (
+    DEFAULT_TARGETS,
+    DEFAULT_USERNAME,
+    SCRAPE_CONCURRENCY,
+    SCRAPE_LIMIT,
+    SCRAPER_ACCOUNT_COUNT,
+    TARGETS_FILE,
+    add_fallback_account,
+    scrape_targets
+)
+from utils.account_health_util import run_revalidation_loop
+from utils.db_writer import AsyncDBWriter
+from utils.log_util import configure_logging
+from utils.map_pool import map_pool
+from utils.metrics import MetricsReporter
+from utils.parquet_sink import parquet_sink
+from utils.poll_schedule import PollSchedule
+from utils.profile_cache import profile_cache
+from utils.query_planner import QueryPlanner
+from utils.rate_limit_util import RateLimitScheduler
+from utils.raw_archive import raw_archive
+from utils.scraper_account_util import ScraperAccountLease, create_api
+from utils.spool_util import SPOOL_ENABLED, spool
+from utils.target_util import load_targets
+from utils.thread_util import THREAD_EXPANSION_ENABLED, expand_threads
+
+logger = logging.getLogger(__name__)
+
+# Seconds between reloads of the target list
+TARGETS_REFRESH_INTERVAL = int(os.getenv('TARGETS_REFRESH_INTERVAL', '600'))
+# Most handles polled in one round, the rest stay due for the next round
+DAEMON_MAX_HANDLES_PER_ROUND = int(os.getenv('DAEMON_MAX_HANDLES_PER_ROUND', '500'))
+# Seconds the current round may keep running after a shutdown signal before it is cancelled
+DAEMON_SHUTDOWN_GRACE = float(os.getenv('DAEMON_SHUTDOWN_GRACE', '30'))
+# Longest idle wait, so target reloads and shutdown are noticed promptly
+DAEMON_MAX_SLEEP = 60
+
+
+async def wait_for_stop(stop, timeout):
+    """Sleep up to timeout seconds, returning early once stop is set"""
+    try:
+        await asyncio.wait_for(stop.wait(), timeout=max(0.0, timeout))
+    except asyncio.TimeoutError:
+        pass
+
+
+async def run_until_stopped(coro, stop, grace=DAEMON_SHUTDOWN_GRACE):
+    """
+    Run one round to completion, unless stop is set while it runs
+    The round then gets `grace` seconds to finish before it is cancelled, so
+    a search waiting out a rate limit window doesn't hold up shutdown
+    """
+    task = asyncio.create_task(coro)
+    stopped = asyncio.create_task(stop.wait())
+    await asyncio.wait({task, stopped}, return_when=asyncio.FIRST_COMPLETED)
+    stopped.cancel()
+    if not task.done():
+        await asyncio.wait({task}, timeout=grace)
+        if not task.done():
+            logger.warning("⚠️ Shutdown grace period over, cancelling the current round")
+            task.cancel()
+    try:
+        return await task
+    except asyncio.CancelledError:
+        return None
+
+
+async def refill_accounts(api, lease, scheduler):
+    """
+    Drop the accounts twscrape deactivated or locked from the lease and the
+    scheduler, and lease new ones once every leased account is gone
+    """
+    for username in await lease.sync_pool_status():
+        scheduler.remove_account(username)
+    if lease.usernames:
+        return
+    await asyncio.to_thread(lease.claim)
+    for username in await lease.load_into_pool(api):
+        scheduler.add_account(username)
+
+
+async def poll_round(api, handles, schedule, concurrency, writer, planner, scheduler):
+    """Scrape one batch of due handles and schedule each handle's next poll"""
+    try:
+        counts = await scrape_targets(api, handles, concurrency=concurrency, writer=writer, limit=SCRAPE_LIMIT,
+                                      planner=planner, scheduler=scheduler)
+    except Exception as e:
+        logger.error(f"❌ Error polling {len(handles)} handles: {e}")
+        counts = {}
+
+    for handle in handles:
+        count = counts.get(handle.lower())
+        if count is None:
+            schedule.retry(handle)
+        else:
+            schedule.observe(handle, count, saturated=count >= SCRAPE_LIMIT)
+
+    if THREAD_EXPANSION_ENABLED:
+        await expand_threads(api, writer=writer, scheduler=scheduler)
+
+
+async def run_daemon(stop):
+    api = create_api()
+    schedule = PollSchedule()
+    planner = QueryPlanner()
+
+    async with ScraperAccountLease(SCRAPER_ACCOUNT_COUNT) as lease:
+        loaded = await lease.load_into_pool(api)
+        if not loaded and not await add_fallback_account(api):
+            logger.error("❌ No scraper accounts available, aborting")
+            return
+
+        concurrency = SCRAPE_CONCURRENCY * max(1, len(loaded))
+        scheduler = RateLimitScheduler(loaded or [DEFAULT_USERNAME])
+        revalidation = asyncio.create_task(run_revalidation_loop())
+        loop = asyncio.get_running_loop()
+        targets_loaded_at = None
+
+        try:
+            async with AsyncDBWriter() as writer:
+                while not stop.is_set():
+                    if targets_loaded_at is None or loop.time() - targets_loaded_at >= TARGETS_REFRESH_INTERVAL:
+                        targets = await asyncio.to_thread(load_targets, TARGETS_FILE, DEFAULT_TARGETS)
+                        schedule.sync(targets)
+                        targets_loaded_at = loop.time()
+                        logger.info(f"✅ Scheduling {len(schedule)} targets: {schedule.stats()}")
+
+                    due = schedule.pop_due(limit=DAEMON_MAX_HANDLES_PER_ROUND)
+                    if not due:
+                        next_due_at = schedule.next_due_at()
+                        delay = DAEMON_MAX_SLEEP if next_due_at is None else next_due_at - schedule.clock()
+                        await wait_for_stop(stop, min(DAEMON_MAX_SLEEP, delay))
+                        continue
+
+                    if loaded:
+                        await refill_accounts(api, lease, scheduler)
+                    logger.info(f"🔄 Polling {len(due)} due handles")
+                    await run_until_stopped(
+                        poll_round(api, due, schedule, concurrency, writer, planner, scheduler), stop
+                    )
+        finally:
+            revalidation.cancel()
+            try:
+                await revalidation
+            except asyncio.CancelledError:
+                pass
+            await asyncio.to_thread(profile_cache.save)
+    logger.info("✅ Daemon stopped, account locks released")
+
+
+async def main():
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    # The current round finishes (or is cancelled after DAEMON_SHUTDOWN_GRACE seconds),
+    # then the writer, account lease and spool shut down in order
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+
+    async with MetricsReporter():
+        if SPOOL_ENABLED:
+            spool.start()
+        try:
+            await run_daemon(stop)
+        finally:
+            await asyncio.to_thread(map_pool.close)
+            await asyncio.to_thread(parquet_sink.close)
+            await asyncio.to_thread(raw_archive.close)
+            if SPOOL_ENABLED:
+                await asyncio.to_thread(spool.close)
+                logger.info(f"✅ Spool metrics: {spool.metrics()}")
+
+
+if __name__ == "__main__":
+    configure_logging()
+    asyncio.run(main())
@@ -2,9 +2,19 @@
 Database configuration and utilities for Twitter scraper
 """
 
+import logging
 import pymysql
 import os
+import tempfile
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import date, datetime
 from dotenv import load_dotenv
+from utils.metrics import DB_POOL
+
+logger = logging.getLogger(__name__)
 
 # Load environment variables from .env file
 load_dotenv()
@@ -18,15 +28,156 @@ DB_CONFIG = {
     'port': int(os.getenv('DB_PORT')),
 }
 
+# Connection pool configuration
+DB_POOL_CONFIG = {
+    'max_size': int(os.getenv('DB_POOL_SIZE', '10')),
+    'max_idle': int(os.getenv('DB_POOL_MAX_IDLE', '300')),
+    'timeout': int(os.getenv('DB_POOL_TIMEOUT', '30')),
+}
+
+# Batches of at least this many rows are bulk loaded with LOAD DATA LOCAL INFILE
+# when a bulk query set is given; smaller batches use executemany
+BULK_LOAD_THRESHOLD = int(os.getenv('BULK_LOAD_THRESHOLD', '1000'))
+# Set DB_LOCAL_INFILE=0 when the server has local_infile disabled
+DB_LOCAL_INFILE = os.getenv('DB_LOCAL_INFILE', '1') == '1'
+# Server/client errors meaning LOAD DATA LOCAL INFILE is not allowed
+LOCAL_INFILE_DISABLED_ERRORS = (1148, 2068, 3948)
+
+# LOAD DATA escapes, with the default ESCAPED BY '\\'
+TSV_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r', '\0': '\\0'})
+
+
+def tsv_field(value):
+    """ Format a value like pymysql would quote it, escaped for LOAD DATA """
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, datetime):
+        # Timezone info is dropped, as pymysql does when escaping datetimes
+        return value.strftime('%Y-%m-%d %H:%M:%S.%f')
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value).translate(TSV_ESCAPES)
+
+
+def write_tsv(rows):
+    """ Write rows to a temporary TSV file and return its path """
+    with tempfile.NamedTemporaryFile('w', suffix='.tsv', encoding='utf-8', newline='', delete=False) as tsv:
+        for row in rows:
+            tsv.write('\t'.join(map(tsv_field, row)))
+            tsv.write('\n')
+        return tsv.name
+
+
+class ConnectionPool:
+    """ Bounded, thread-safe pool of reusable connections """
+
+    def __init__(self, connect, max_size=10, max_idle=300, timeout=30):
+        self._connect = connect
+        self.max_size = max_size
+        self.max_idle = max_idle
+        self.timeout = timeout
+        self._idle = deque()  # (connection, last_used) pairs, most recent on the right
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._in_use = 0
+        self._created = 0
+        self._reused = 0
+        self._discarded = 0
+
+    def _pop_idle(self):
+        """ Return a healthy idle connection or None, closing stale ones """
+        while True:
+            with self._lock:
+                if not self._idle:
+                    return None
+                conn, last_used = self._idle.pop()
+
+            if time.monotonic() - last_used > self.max_idle:
+                self._discard(conn)
+                continue
+
+            try:
+                conn.ping(reconnect=True)
+                return conn
+            except Exception:
+                self._discard(conn)
+
+    def _discard(self, conn):
+        with self._lock:
+            self._discarded += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def acquire(self):
+        """ Borrow a connection, blocking up to `timeout` seconds when the pool is exhausted """
+        if not self._slots.acquire(timeout=self.timeout):
+            raise TimeoutError(f"No database connection available after {self.timeout}s")
+
+        try:
+            conn = self._pop_idle()
+            with self._lock:
+                if conn is None:
+                    self._created += 1
+                else:
+                    self._reused += 1
+            if conn is None:
+                conn = self._connect()
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self._in_use += 1
+        return conn
+
+    def release(self, conn, discard=False):
+        """ Return a borrowed connection to the pool, or close it if it is broken """
+        with self._lock:
+            self._in_use -= 1
+        if discard:
+            self._discard(conn)
+        else:
+            with self._lock:
+                self._idle.append((conn, time.monotonic()))
+        self._slots.release()
+
+    def close(self):
+        """ Close every idle connection """
+        with self._lock:
+            idle = list(self._idle)
+            self._idle.clear()
+        for conn, _ in idle:
+            self._discard(conn)
+
+    def metrics(self):
+        """ Return a snapshot of the pool size and usage counters """
+        with self._lock:
+            return {
+                'max_size': self.max_size,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'created': self._created,
+                'reused': self._reused,
+                'discarded': self._discarded,
+            }
+
 
 class Database:
-    def __init__(self, user, password, host, port, database):
-        """ Initialize the connection and create the cursor object """
+    def __init__(self, user, password, host, port, database, pool_config=None,
+                 bulk_load_threshold=BULK_LOAD_THRESHOLD, local_infile=DB_LOCAL_INFILE):
+        """ Initialize the connection settings and the connection pool """
         self.user = user
         self.password = password
         self.host = host
         self.port = port
         self.database = database
+        self.bulk_load_threshold = bulk_load_threshold
+        self.local_infile = local_infile
+        self.pool = ConnectionPool(self.conn, **(pool_config or {}))
 
     def conn(self):
         return pymysql.connect(
@@ -35,45 +186,108 @@ class Database:
             host=self.host, 
             port=self.port,
             database=self.database,
-            charset='utf8mb4'
+            charset='utf8mb4',
+            local_infile=self.local_infile
         )
 
     def cursor(self, conn):
         """ Return the cursor object """
         return conn.cursor()
 
+    @contextmanager
+    def connection(self):
+        """ Borrow a pooled connection, rolling back and discarding it if it breaks """
+        conn = self.pool.acquire()
+        discard = False
+        try:
+            yield conn
+        except Exception as e:
+            discard = isinstance(e, (pymysql.err.OperationalError, pymysql.err.InterfaceError))
+            if not discard:
+                try:
+                    conn.rollback()
+                except Exception:
+                    discard = True
+            raise
+        finally:
+            self.pool.release(conn, discard=discard)
+
     def execute_query(self, query, values=None):
         """ Execute the query """
-        conn = self.conn()
-        try:
+        with self.connection() as conn:
             cursor = self.cursor(conn=conn)
             cursor.execute(query, values)
             conn.commit()
             return cursor
-        finally:
-            conn.close()
 
     def executemany_query(self, query, values=None):
         """ Execute the query """
-        conn = self.conn()
-        try:
+        with self.connection() as conn:
             cursor = self.cursor(conn=conn)
             cursor.executemany(query, values)
             conn.commit()
             return cursor
+
+    @contextmanager
+    def transaction(self):
+        """ Yield a cursor whose statements commit together or roll back on error """
+        with self.connection() as conn:
+            cursor = self.cursor(conn=conn)
+            yield cursor
+            conn.commit()
+
+    def load_data(self, cursor, bulk_queries, rows):
+        """ Stage rows through a temporary TSV and LOAD DATA LOCAL INFILE, then upsert them in one statement """
+        path = write_tsv(rows)
+        try:
+            cursor.execute(bulk_queries['drop_staging'])
+            cursor.execute(bulk_queries['create_staging'])
+            cursor.execute(bulk_queries['load'], (path,))
+            cursor.execute(bulk_queries['upsert'])
+            cursor.execute(bulk_queries['drop_staging'])
         finally:
-            conn.close()
+            os.remove(path)
+
+    def write_rows(self, cursor, query, rows, bulk_queries=None):
+        """
+        Write rows on an open cursor, bulk loading large batches when a bulk query set is given
+        Falls back to executemany for good if the server refuses LOAD DATA LOCAL INFILE
+        Returns the method used, "load_data" or "executemany"
+        """
+        if bulk_queries and self.local_infile and len(rows) >= self.bulk_load_threshold:
+            try:
+                self.load_data(cursor, bulk_queries, rows)
+                return "load_data"
+            except pymysql.err.MySQLError as e:
+                if not e.args or e.args[0] not in LOCAL_INFILE_DISABLED_ERRORS:
+                    raise
+                logger.error(f"❌ LOAD DATA LOCAL INFILE is not allowed, using executemany from now on: {e}")
+                self.local_infile = False
+        cursor.executemany(query, rows)
+        return "executemany"
+
+    def upsert_rows(self, query, rows, bulk_queries=None):
+        """ Write rows in one transaction, see write_rows """
+        with self.transaction() as cursor:
+            return self.write_rows(cursor, query, rows, bulk_queries)
 
     def fetch_query(self, query, values=None):
         """ Execute a SELECT query and return results """
-        conn = self.conn()
-        try:
+        with self.connection() as conn:
             cursor = self.cursor(conn=conn)
             cursor.execute(query, values)
             results = cursor.fetchall()
+            # End the read transaction so the pooled connection doesn't keep a stale snapshot
+            conn.commit()
             return results
-        finally:
-            conn.close()
+
+    def pool_metrics(self):
+        """ Return connection pool metrics """
+        return self.pool.metrics()
+
+    def close(self):
+        """ Close pooled connections """
+        self.pool.close()
 
 
 # Initialize database connection
@@ -82,5 +296,9 @@ db = Database(
     password=DB_CONFIG['password'],
     host=DB_CONFIG['host'],
     port=DB_CONFIG['port'],
-    database=DB_CONFIG['database']
-)
\ No newline at end of file
+    database=DB_CONFIG['database'],
+    pool_config=DB_POOL_CONFIG
+)
+DB_POOL.set_function(lambda: {
+    (state,): value for state, value in db.pool_metrics().items() if state in ('in_use', 'idle')
+})
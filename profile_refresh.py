@@ -0,0 +1,54 @@
+"""
+Bulk profile refresh job
+Meant to run PROFILE_REFRESH_RUNS_PER_DAY times a day (hourly by default);
+each run spends its share of PROFILE_REFRESH_DAILY_REQUESTS on the most
+overdue profiles in twitter.twitter_profiles
+"""
+
+import asyncio
+import logging
+from scraper import DEFAULT_USERNAME, SCRAPER_ACCOUNT_COUNT, add_fallback_account
+from utils.db_writer import AsyncDBWriter
+from utils.log_util import configure_logging
+from utils.metrics import MetricsReporter
+from utils.parquet_sink import parquet_sink
+from utils.profile_cache import profile_cache
+from utils.profile_refresh_util import PROFILE_REFRESH_CONCURRENCY, refresh_stale_profiles
+from utils.rate_limit_util import RateLimitScheduler
+from utils.raw_archive import raw_archive
+from utils.scraper_account_util import ScraperAccountLease, create_api
+from utils.spool_util import SPOOL_ENABLED, spool
+
+logger = logging.getLogger(__name__)
+
+
+async def main():
+    api = create_api()
+    async with MetricsReporter():
+        if SPOOL_ENABLED:
+            spool.start()
+
+        try:
+            async with ScraperAccountLease(SCRAPER_ACCOUNT_COUNT) as lease:
+                loaded = await lease.load_into_pool(api)
+                if not loaded and not await add_fallback_account(api):
+                    logger.error("❌ No scraper accounts available, aborting")
+                    return
+
+                # Lookups are spread over every leased account by the scheduler
+                concurrency = PROFILE_REFRESH_CONCURRENCY * max(1, len(loaded))
+                scheduler = RateLimitScheduler(loaded or [DEFAULT_USERNAME])
+                async with AsyncDBWriter() as writer:
+                    await refresh_stale_profiles(api, writer=writer, scheduler=scheduler, concurrency=concurrency)
+                await asyncio.to_thread(profile_cache.save)
+        finally:
+            await asyncio.to_thread(parquet_sink.close)
+            await asyncio.to_thread(raw_archive.close)
+            if SPOOL_ENABLED:
+                await asyncio.to_thread(spool.close)
+                logger.info(f"✅ Spool metrics: {spool.metrics()}")
+
+
+if __name__ == "__main__":
+    configure_logging()
+    asyncio.run(main())
@@ -0,0 +1,140 @@
+"""
+Raw archive replay
+Re-runs the current mappers over archived tweets and users and writes the
+results back, one process per segment, so mapping changes are backfilled
+from disk without spending API quota
+Rows missing from MySQL are inserted in full; existing rows only get the
+mapper-derived columns (ENHANCED_TWEETS_REMAP_COLUMNS / TWITTER_PROFILES_REMAP_COLUMNS),
+archived engagement counters never overwrite newer ones
+
+Usage: python replay_archive.py [--workers 8] [--since 20250101] [--until 20250131] [--dry-run]
+       python replay_archive.py --show TWEET_ID
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# Replays can simply be run again, every process writes straight to MySQL instead of a shared spool
+os.environ['SPOOL_ENABLED'] = '0'
+
+from utils.log_util import configure_logging  # noqa: E402
+from utils.raw_archive import RAW_ARCHIVE_PATH, RawArchive, list_segments, read_segment, restore  # noqa: E402
+from utils.row_builder import build_enhanced_tweet_rows, build_profile_rows  # noqa: E402
+from utils.spool_util import write_rows  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+# Records mapped and written per batch within a segment
+REPLAY_BATCH_SIZE = int(os.getenv('REPLAY_BATCH_SIZE', '5000'))
+REPLAY_SCRIPT_TYPE = "archive_replay"
+
+
+def write_replay_batch(tweets, users, dry_run):
+    """Map one batch of restored tweets and users, returns (tweet rows, profile rows)"""
+    # Authors archived inside tweets are remapped too, the latest capture of each wins
+    users = {user.id: user for user in [tweet.user for tweet in tweets.values()] + list(users.values())}
+    tweet_rows = build_enhanced_tweet_rows(list(tweets.values()), script_type=REPLAY_SCRIPT_TYPE)
+    profile_rows = build_profile_rows(list(users.values()), script_type=REPLAY_SCRIPT_TYPE)
+    if not dry_run:
+        if tweet_rows:
+            write_rows("remapped_tweets", tweet_rows)
+        if profile_rows:
+            write_rows("remapped_profiles", profile_rows)
+    return len(tweet_rows), len(profile_rows)
+
+
+def replay_segment(segment_path, batch_size=REPLAY_BATCH_SIZE, dry_run=False):
+    """Replay one segment, returns its counts; runs in a worker process"""
+    counts = {"records": 0, "tweets": 0, "profiles": 0, "errors": 0}
+    tweets, users = {}, {}
+
+    def flush():
+        try:
+            tweet_count, profile_count = write_replay_batch(tweets, users, dry_run)
+            counts["tweets"] += tweet_count
+            counts["profiles"] += profile_count
+        except Exception as e:
+            counts["errors"] += len(tweets) + len(users)
+            logger.error(f"❌ Error replaying a batch of {os.path.basename(segment_path)}: {e}")
+        tweets.clear()
+        users.clear()
+
+    for record in read_segment(segment_path):
+        counts["records"] += 1
+        try:
+            obj = restore(record["data"])
+        except Exception as e:
+            counts["errors"] += 1
+            logger.warning(f"⚠️ Skipping unreadable {record.get('kind')} {record.get('id')}: {e}")
+            continue
+        (tweets if record["kind"] == "tweet" else users)[obj.id] = obj
+        if len(tweets) + len(users) >= batch_size:
+            flush()
+    if tweets or users:
+        flush()
+    return counts
+
+
+def init_worker(log_level):
+    configure_logging(level=log_level)
+
+
+def replay(segments, workers, batch_size, dry_run, log_level):
+    """Replay segments across worker processes, returns the summed counts"""
+    totals = {"records": 0, "tweets": 0, "profiles": 0, "errors": 0, "segments": 0}
+    started = time.perf_counter()
+    # spawn: workers open their own MySQL connections instead of inheriting the parent's state
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=init_worker,
+                             initargs=(log_level,)) as executor:
+        futures = {executor.submit(replay_segment, segment, batch_size, dry_run): segment for segment in segments}
+        for future in as_completed(futures):
+            segment = os.path.basename(futures[future])
+            try:
+                counts = future.result()
+            except Exception as e:
+                logger.error(f"❌ Error replaying segment {segment}: {e}")
+                continue
+            for key, value in counts.items():
+                totals[key] += value
+            totals["segments"] += 1
+            elapsed = time.perf_counter() - started
+            logger.info(f"✅ Replayed {segment}: {counts} "
+                        f"({totals['segments']}/{len(segments)} segments, {totals['records'] / elapsed:.0f} records/s)")
+    return totals
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay the raw archive through the current mappers")
+    parser.add_argument("--path", default=RAW_ARCHIVE_PATH, help="archive directory")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="worker processes")
+    parser.add_argument("--since", help="first segment day to replay, YYYYMMDD")
+    parser.add_argument("--until", help="last segment day to replay, YYYYMMDD")
+    parser.add_argument("--batch-size", type=int, default=REPLAY_BATCH_SIZE, help="records per mapped batch")
+    parser.add_argument("--dry-run", action="store_true", help="map everything but write nothing")
+    parser.add_argument("--show", type=int, metavar="TWEET_ID", help="print the latest archived capture of a tweet")
+    parser.add_argument("--log-level", default=os.getenv('LOG_LEVEL', 'INFO'))
+    args = parser.parse_args(argv)
+    configure_logging(level=args.log_level.upper())
+
+    if args.show is not None:
+        record = RawArchive(path=args.path, enabled=True).get(args.show)
+        print(json.dumps(record, indent=2, ensure_ascii=False) if record else f"Tweet {args.show} is not archived")
+        return
+
+    segments = list_segments(args.path, since=args.since, until=args.until)
+    if not segments:
+        logger.info(f"✅ No archive segments to replay under {args.path}")
+        return
+    logger.info(f"🔄 Replaying {len(segments)} segments with {args.workers} workers")
+    totals = replay(segments, max(1, args.workers), args.batch_size, args.dry_run, args.log_level.upper())
+    logger.info(f"✅ Replay done: {totals}")
+
+
+if __name__ == "__main__":
+    main()
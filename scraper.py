@@ -1,27 +1,54 @@
 import asyncio
+import logging
 import os
 import time
+from contextlib import aclosing
 from datetime import datetime, timedelta
-from twscrape import API, gather  # pyright: ignore[reportMissingImports]
-from utils.twitter_util import (
-    map_tweet_to_enhanced_tweets,
-    insert_enhanced_tweets_to_db,
-    map_tweet_user_to_profile,
-    insert_twitter_profiles_to_db
+from utils.pipeline_util import TweetBatcher, write_batch
+from utils.checkpoint_util import (
+    CheckpointTracker,
+    checkpoint_key_for_handle,
+    get_checkpoint,
+    get_checkpoints,
+    save_checkpoints
 )
-from utils.scraper_account_util import (
-    get_random_twitter_scraper_account,
-    mark_account_as_occupied,
-    mark_account_as_available,
-    mark_account_as_error
+from utils.query_planner import QueryGroup, QueryPlanner, SEARCH_PAGE_SIZE
+from utils.rate_limit_util import RateLimitScheduler, RATE_LIMIT_WINDOW
+from utils.error_util import (
+    ERROR_FATAL,
+    ERROR_RATE_LIMIT,
+    RETRY_MAX_ATTEMPTS,
+    backoff_delay,
+    classify_error
 )
+from utils.account_health_util import revalidate_accounts
+from utils.profile_cache import profile_cache
+from utils.scraper_account_util import ScraperAccountLease, create_api
+from utils.target_util import load_targets
+from utils.db_writer import AsyncDBWriter
+from utils.log_util import configure_logging
+from utils.map_pool import map_pool
+from utils.metrics import TWEETS_SCRAPED, MetricsReporter, observe_api_request
+from utils.parquet_sink import parquet_sink
+from utils.raw_archive import raw_archive
+from utils.spool_util import SPOOL_ENABLED, spool
+from utils.thread_util import THREAD_EXPANSION_ENABLED, expand_threads, thread_seeds
+from utils.window_planner import WINDOW_GAP_FILL_ENABLED, WindowPlanner, checkpoint_gap, window_filters
 
 from dotenv import load_dotenv
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 
 DEFAULT_USERNAME = os.getenv('DEFAULT_USERNAME')
 COOKIE_STRING = os.getenv('COOKIE_STRING')
+TARGETS_FILE = os.getenv('TARGETS_FILE')
+SCRAPE_LIMIT = int(os.getenv('SCRAPE_LIMIT', '100'))
+SCRAPER_ACCOUNT_COUNT = int(os.getenv('SCRAPER_ACCOUNT_COUNT', '5'))
+# Concurrent searches per leased account
+SCRAPE_CONCURRENCY = int(os.getenv('SCRAPE_CONCURRENCY', '4'))
+DEFAULT_TARGETS = ["ostrich_hq"]
 
 
 def get_time_range(start_date, end_date):
@@ -31,9 +58,23 @@ def get_time_range(start_date, end_date):
     return since, until
 
 
-def build_search_query(account_handle, start_date, end_date, min_faves=None, min_replies=None, min_retweets=None):
-    since, until = get_time_range(start_date, end_date)
-    query = f"{account_handle} since:{since} until:{until}"
+def build_search_query(account_handle, start_date, end_date, min_faves=None, min_replies=None, min_retweets=None,
+                       since_id=None, since_time=None, until_time=None):
+    """
+    Build a search query for a handle
+    since_id or since_time/until_time (unix seconds) replace the day window
+    """
+    if since_id:
+        query = f"{account_handle} since_id:{since_id}"
+    elif since_time or until_time:
+        query = account_handle
+        if since_time:
+            query = f"{query} since_time:{int(since_time)}"
+        if until_time:
+            query = f"{query} until_time:{int(until_time)}"
+    else:
+        since, until = get_time_range(start_date, end_date)
+        query = f"{account_handle} since:{since} until:{until}"
     if min_faves:
         query = f"{query} min_faves:{min_faves}"
     if min_replies:
@@ -43,135 +84,355 @@ def build_search_query(account_handle, start_date, end_date, min_faves=None, min
     return query
 
 
-async def scrape_profile(api, account_handle):
-    user = await api.user_by_login(account_handle)
-    print(f"Found: {user.displayname} (@{user.username})")
-    print(f"User profile: {user.dict()}")
-    print("=" * 80)
+async def scrape_profile(api, account_handle, scheduler=None):
+    if scheduler is not None:
+        await scheduler.acquire("user_by_login")
+    requested_at = time.perf_counter()
+    try:
+        user = await api.user_by_login(account_handle)
+    except Exception:
+        observe_api_request("user_by_login", time.perf_counter() - requested_at, "error")
+        raise
+    observe_api_request("user_by_login", time.perf_counter() - requested_at)
+    logger.info(f"Found: {user.displayname} (@{user.username})")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"User profile: {user.dict()}")
     return user
 
 
-async def scrape_tweets(api, account_handle):
-    query = build_search_query(account_handle=account_handle, start_date=2, end_date=1)
-    print(f"Query: {query}")
-    tweets = await gather(api.search(query, limit=100))
-    print(f"Scraped {len(tweets)} tweets")
-    
-    # Map tweets to database format
-    enhanced_tweets_data = []
-    unique_users = {}  # Track unique users to avoid duplicates
-    
-    for tweet in tweets:
-        print(f"Tweet: {tweet.dict()}")
-        print("=" * 80)
-        
-        enhanced_tweet_data = map_tweet_to_enhanced_tweets(tweet)
-        enhanced_tweets_data.append(enhanced_tweet_data)
-        
-        # Collect unique users for profile insertion
-        user_id = tweet.user.id_str
-        if user_id not in unique_users:
-            unique_users[user_id] = tweet.user
-    
-    # Insert tweets to database
-    if enhanced_tweets_data:
-        insert_enhanced_tweets_to_db(enhanced_tweets_data)
-    
-    # Insert/update Twitter profiles after tweets are inserted
-    if unique_users:
-        profiles_data = []
-        for user_data in unique_users.values():
-            profile_data = map_tweet_user_to_profile(user_data)
-            profiles_data.append(profile_data)
-        
-        insert_twitter_profiles_to_db(profiles_data)
-    
-    return tweets
-
-def build_scraper_account(username=None, cookie_string=None, max_retries=5):
+async def scrape_query_group(api, group, writer=None, limit=SCRAPE_LIMIT, planner=None, scheduler=None,
+                             since_time=None, until_time=None, filters=None):
+    """
+    Stream search results for a query group, mapping each tweet as it arrives
+    and flushing micro-batches to the database
+    Tweets are routed back to their handle's checkpoint, pagination stops at
+    the group's oldest checkpoint, and checkpoints move forward once every
+    batch has been written
+    With a scheduler, every search page waits for quota before it is requested
+    A since_time/until_time window searches that range instead and leaves
+    checkpoints untouched, so backfills never move the high-water mark
+    A search that hits the limit before reaching a checkpoint keeps its
+    checkpoint rows in group.pending_checkpoints for settle_checkpoints
+    filters are min_faves/min_replies/min_retweets arguments for the query
+    Returns the number of tweets scraped
+    """
+    windowed = since_time is not None or until_time is not None
+    since_id = None if windowed else group.since_id
+    query = build_search_query(account_handle=group.search_term, start_date=2, end_date=1, since_id=since_id,
+                               since_time=since_time, until_time=until_time, **(filters or {}))
+    logger.debug(f"Query: {query}")
+    batcher = TweetBatcher(writer=writer)
+    tracker = CheckpointTracker()
+    fetched = 0
+    oldest_time = None
+    caught_up = False
+    # Time spent waiting on the search generator since the last page boundary
+    page_wait = 0.0
+    log_tweets = logger.isEnabledFor(logging.DEBUG)
+
+    if scheduler is not None:
+        await scheduler.acquire("search")
+
+    try:
+        async with aclosing(api.search(query, limit=limit)) as tweets:
+            while True:
+                requested_at = time.perf_counter()
+                try:
+                    tweet = await anext(tweets)
+                except StopAsyncIteration:
+                    break
+                finally:
+                    page_wait += time.perf_counter() - requested_at
+
+                # Results are newest first, everything from here on is already stored
+                if since_id and int(tweet.id) <= since_id:
+                    caught_up = True
+                    break
+                fetched += 1
+                TWEETS_SCRAPED.inc()
+                if tweet.date is not None and (oldest_time is None or tweet.date < oldest_time):
+                    oldest_time = tweet.date
+
+                # The next item pulled after a full page triggers another search request
+                if fetched % SEARCH_PAGE_SIZE == 0:
+                    observe_api_request("search", page_wait)
+                    page_wait = 0.0
+                    if scheduler is not None:
+                        await scheduler.acquire("search")
+
+                checkpoint_key = group.route(tweet)
+                if checkpoint_key is None:
+                    continue
+
+                if log_tweets:
+                    logger.debug(f"Tweet {tweet.id} by @{tweet.user.username}")
+
+                batcher.add(tweet)
+                tracker.update(checkpoint_key, tweet)
+                if THREAD_EXPANSION_ENABLED:
+                    thread_seeds.add(tweet)
+                if batcher.is_due():
+                    await batcher.flush()
+    except Exception as e:
+        observe_api_request("search", page_wait, "error")
+        # Keep what was fetched so far, the checkpoint stays put so the rest is retried
+        await batcher.flush()
+        raise
+
+    if page_wait:
+        observe_api_request("search", page_wait)
+    await batcher.flush()
+    group.fetched = fetched
+    group.oldest_time = oldest_time
+    group.saturated = limit > 0 and fetched >= limit and not caught_up
+    if tracker.newest and not windowed:
+        if group.saturated and group.oldest_checkpoint:
+            # Advancing now would skip the tweets between the checkpoint and the oldest one fetched
+            group.pending_checkpoints = tracker.rows()
+        else:
+            await write_batch(writer, save_checkpoints, tracker.rows())
+    if planner is not None:
+        planner.observe(group, fetched)
+    logger.info(f"Scraped {batcher.total_tweets} tweets")
+    return batcher.total_tweets
+
+
+async def scrape_tweets(api, account_handle, writer=None, limit=SCRAPE_LIMIT):
+    """Scrape tweets for a single handle, starting after its checkpoint"""
+    checkpoint_key = checkpoint_key_for_handle(account_handle)
+    checkpoint = await asyncio.to_thread(get_checkpoint, checkpoint_key)
+    since_id = checkpoint["last_tweet_id"] if checkpoint else None
+    group = QueryGroup([account_handle], {checkpoint_key: since_id})
+    total = await scrape_query_group(api, group, writer=writer, limit=limit)
+    await settle_checkpoints(api, [group], writer, limit, None, asyncio.Semaphore(SCRAPE_CONCURRENCY))
+    return total
+
+
+async def scrape_targets(api, account_handles, concurrency=SCRAPE_CONCURRENCY, writer=None,
+                         limit=SCRAPE_LIMIT, planner=None, scheduler=None):
+    """
+    Scrape tweets for many handles concurrently through one shared API pool
+    Handles are packed into OR-queries by the planner, and at most
+    `concurrency` searches are in flight at the same time
+    Failed searches are retried by search_with_retry
+    Searches that hit the limit before their checkpoint are settled by settle_checkpoints
+    Raises the first error only when every query failed
+    Returns lower-cased handle -> tweets scraped, for handles whose search succeeded
+    """
+    planner = planner or QueryPlanner()
+    checkpoints = await asyncio.to_thread(
+        get_checkpoints, [checkpoint_key_for_handle(handle) for handle in account_handles]
+    )
+    since_ids = {key: checkpoint["last_tweet_id"] for key, checkpoint in checkpoints.items()}
+    groups = planner.plan(account_handles, since_ids, limit)
+    logger.info(f"✅ Planned {len(groups)} searches for {len(account_handles)} targets")
+    if scheduler is not None:
+        logger.info(f"✅ Search capacity: {scheduler.capacity('search')} requests now, "
+                    f"{scheduler.capacity('search', RATE_LIMIT_WINDOW)} within the next window")
+
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def scrape_group(group):
+        async with semaphore:
+            return await search_with_retry(api, group, writer=writer, limit=limit, planner=planner,
+                                           scheduler=scheduler)
+
+    errors = await asyncio.gather(*(scrape_group(group) for group in groups))
+    failed = [error for error in errors if error is not None]
+    logger.info(f"✅ Completed {len(groups) - len(failed)}/{len(groups)} searches "
+                f"({planner.requests_per_1000_handles():.0f} search requests per 1000 handles)")
+
+    await settle_checkpoints(api, [group for group, error in zip(groups, errors) if error is None],
+                             writer, limit, scheduler, semaphore)
+
+    if groups and len(failed) == len(groups):
+        raise failed[0]
+    return {key: count for group, error in zip(groups, errors) if error is None
+            for key, count in group.counts.items()}
+
+
+async def search_with_retry(api, group, writer=None, limit=SCRAPE_LIMIT, planner=None, scheduler=None,
+                            since_time=None, until_time=None, filters=None):
     """
-    Build scraper account from database or use fallback values
-    Retries fetching account from database up to max_retries times
+    Run scrape_query_group until it succeeds or RETRY_MAX_ATTEMPTS are spent
+    Transient errors and rate limits are retried after a jittered backoff,
+    rate limits with the pool throttled; auth errors are not retried
+    Returns None on success, the last error otherwise
     """
-    if username and cookie_string:
-        return {
-            "username": username,
-            "cookie_string": cookie_string
-        }
-    
-    # Try to get account from database with retry logic
-    for attempt in range(max_retries):
+    error = None
+    for attempt in range(RETRY_MAX_ATTEMPTS):
         try:
-            account_data = get_random_twitter_scraper_account()
-            if account_data:
-                print(f"✅ Successfully fetched account from database (attempt {attempt + 1})")
-                return {
-                    "username": account_data["username"],
-                    "cookie_string": account_data["cookie_string"]
-                }
+            await scrape_query_group(api, group, writer=writer, limit=limit, planner=planner, scheduler=scheduler,
+                                     since_time=since_time, until_time=until_time, filters=filters)
+            return None
         except Exception as e:
-            print(f"❌ Error fetching account from database (attempt {attempt + 1}/{max_retries}): {e}")
-            
-            # If this is not the last attempt, wait before retrying
-            if attempt < max_retries - 1:
-                # Exponential backoff: 1s, 2s, 4s, 8s
-                delay = 2 ** attempt
-                print(f"⏳ Waiting {delay} seconds before retry...")
-                time.sleep(delay)
-            else:
-                print(f"❌ Failed to fetch account after {max_retries} attempts")
-    
-    # Fallback to default values if database fetch fails after all retries
-    print("⚠️ Using fallback account credentials")
-    return {
-        "username": DEFAULT_USERNAME,
-        "cookie_string": COOKIE_STRING
-    }
+            error = e
+            kind = classify_error(e)
+            logger.warning(f"❌ Error scraping tweets for {', '.join(group.handles)} ({kind}): {e}")
 
-async def main():
-    api = API()
-    account = build_scraper_account()
-    
-    # Check if account came from database (not fallback)
-    account_from_db = account["username"] != DEFAULT_USERNAME
-    error_occurred = False
-    
-    # Mark account as occupied if it came from database
-    if account_from_db:
-        mark_account_as_occupied(account["username"])
-    
+            if kind == ERROR_FATAL:
+                # twscrape deactivates accounts that fail auth, the lease picks that up from its pool on release
+                return e
+            if kind == ERROR_RATE_LIMIT and scheduler is not None:
+                # twscrape has locked the account that hit it, the pool is paced below its estimate from now on
+                scheduler.throttle("search")
+            # Rate limits back off too, twscrape's locks outlast an immediate retry
+            await asyncio.sleep(backoff_delay(attempt))
+    return error
+
+
+async def scrape_window(api, account_handles, since_time, until_time, writer=None, limit=SCRAPE_LIMIT,
+                        scheduler=None, concurrency=SCRAPE_CONCURRENCY, filters=None,
+                        window_planner=None, semaphore=None):
+    """
+    Scrape a since_time/until_time window (unix seconds) in full for one or more handles
+    A search that hits `limit` only covered the newest part of its window;
+    the window planner splits the rest in two at an hour or minute boundary
+    and both halves are searched concurrently, recursively, so disjoint
+    pieces spread over every account in the twscrape pool
+    filters default to the WINDOW_MIN_* settings. Checkpoints are left untouched
+    Returns the number of tweets scraped, raises the first error once every piece has run
+    """
+    window_planner = window_planner or WindowPlanner()
+    filters = window_filters() if filters is None else filters
+    # Held only while a piece is searched, never while its halves run
+    semaphore = semaphore or asyncio.Semaphore(max(1, concurrency))
+    errors = []
+    total = 0
+
+    async def search(window_since, window_until):
+        nonlocal total
+        if not window_planner.reserve(window_since, window_until):
+            return
+        group = QueryGroup(account_handles, {handle.lower(): None for handle in account_handles})
+        async with semaphore:
+            error = await search_with_retry(api, group, writer=writer, limit=limit, scheduler=scheduler,
+                                            since_time=window_since, until_time=window_until, filters=filters)
+        if error is not None:
+            errors.append(error)
+            return
+        total += sum(group.counts.values())
+        pieces = window_planner.split(window_since, window_until, group)
+        await asyncio.gather(*(search(*piece) for piece in pieces))
+
+    await search(since_time, until_time)
+    if window_planner.truncated:
+        logger.warning(f"⚠️ {len(window_planner.truncated)} pieces of {', '.join(account_handles)} "
+                       f"{since_time}-{until_time} left incomplete after {window_planner.searches} searches")
+    logger.info(f"✅ Window {since_time}-{until_time} for {', '.join(account_handles)}: {total} tweets in "
+                f"{window_planner.searches} searches ({window_planner.splits} splits)")
+    if errors:
+        raise errors[0]
+    return total
+
+
+async def settle_checkpoints(api, groups, writer, limit, scheduler, semaphore):
+    """
+    Save the checkpoints searches held back after hitting the limit before their checkpoint
+    With WINDOW_GAP_FILL_ENABLED the gap down to the checkpoint is filled
+    first; without it, or when the fill fails, the checkpoints stay put and
+    the next run searches from the old one again
+    """
+    held = [group for group in groups if group.pending_checkpoints]
+    if not held:
+        return
+    if not WINDOW_GAP_FILL_ENABLED:
+        logger.warning(f"⚠️ {len(held)} searches hit the limit before their checkpoint, keeping those checkpoints "
+                       f"(set WINDOW_GAP_FILL_ENABLED=1 or raise SCRAPE_LIMIT)")
+        return
+    logger.info(f"🔄 Filling {len(held)} checkpoint gaps left by searches that hit the limit")
+    await asyncio.gather(*(fill_gap(api, group, writer, limit, scheduler, semaphore) for group in held))
+
+
+async def fill_gap(api, group, writer, limit, scheduler, semaphore):
+    """
+    Search the window between a group's checkpoint and the oldest tweet its
+    saturated search returned, then save the checkpoints it held back
+    """
+    if group.oldest_time is None:
+        logger.warning(f"⚠️ No tweet dates to size the checkpoint gap of {', '.join(group.handles)}, keeping its checkpoints")
+        return
+    gap = checkpoint_gap(group.oldest_checkpoint, group.oldest_time)
+    if gap is not None:
+        window_planner = WindowPlanner()
+        try:
+            await scrape_window(api, group.handles, *gap, writer=writer, limit=limit, scheduler=scheduler,
+                                window_planner=window_planner, semaphore=semaphore)
+        except Exception as e:
+            logger.error(f"❌ Error filling the checkpoint gap of {', '.join(group.handles)}: {e}")
+            return
+        if window_planner.truncated:
+            logger.warning(f"⚠️ Checkpoint gap of {', '.join(group.handles)} only partly filled, keeping its checkpoints")
+            return
+    await write_batch(writer, save_checkpoints, group.pending_checkpoints)
+
+
+async def add_fallback_account(api):
+    """Add the default account from the environment when no account could be leased"""
+    if not (DEFAULT_USERNAME and COOKIE_STRING):
+        return False
+    logger.warning("⚠️ Using fallback account credentials")
     try:
         await api.pool.add_account(
-            username=account["username"],
+            username=DEFAULT_USERNAME,
             password="",  # Required but not used when cookies are provided
             email="",  # Required but not used when cookies are provided
             email_password="",  # Required but not used when cookies are provided
-            cookies=account["cookie_string"]
+            cookies=COOKIE_STRING
         )
-        print(f"Account added successfully with cookies!\n")
+        logger.info("Account added successfully with cookies!")
+        return True
     except Exception as e:
-        print(f"Error adding account: {e}")
-        # Mark account as error if there was an error
-        if account_from_db:
-            mark_account_as_error(account["username"], str(e))
-        error_occurred = True
-        return
-    
-    try:
-        # user = await scrape_profile(api, "Decrypting_xyz")
-        await scrape_tweets(api, "ostrich_hq")
+        logger.error(f"Error adding account: {e}")
+        return False
 
-    except Exception as e:
-        print(f"Error scraping tweets: {e}")
-        # Mark account as error if there was an error during scraping
-        if account_from_db:
-            mark_account_as_error(account["username"], str(e))
-        error_occurred = True
-    finally:
-        # Mark account as available after scraping is complete (only if no errors occurred)
-        if account_from_db and not error_occurred:
-            mark_account_as_available(account["username"])
+
+async def main():
+    api = create_api()
+    async with MetricsReporter():
+        # Rows go to the local spool first and are drained into MySQL in the background
+        if SPOOL_ENABLED:
+            spool.start()
+
+        try:
+            async with ScraperAccountLease(SCRAPER_ACCOUNT_COUNT) as lease:
+                loaded = await lease.load_into_pool(api)
+                if not loaded and not await add_fallback_account(api):
+                    logger.error("❌ No scraper accounts available, aborting")
+                    return
+
+                # Throughput scales with the number of healthy accounts in the pool
+                concurrency = SCRAPE_CONCURRENCY * max(1, len(loaded))
+                scheduler = RateLimitScheduler(loaded or [DEFAULT_USERNAME])
+
+                # Probe error/cooldown accounts in the background while this run scrapes
+                revalidation = asyncio.create_task(revalidate_accounts())
+
+                try:
+                    # user = await scrape_profile(api, "Decrypting_xyz")
+                    targets = load_targets(TARGETS_FILE, fallback=DEFAULT_TARGETS)
+                    async with AsyncDBWriter() as writer:
+                        await scrape_targets(api, targets, concurrency=concurrency, writer=writer,
+                                             scheduler=scheduler)
+                        if THREAD_EXPANSION_ENABLED:
+                            await expand_threads(api, writer=writer, scheduler=scheduler)
+
+                except Exception as e:
+                    # Accounts twscrape deactivated or locked are marked as error or
+                    # cooldown from its pool when the lease is released
+                    logger.error(f"Error scraping tweets: {e}")
+
+                await revalidation
+                await asyncio.to_thread(profile_cache.save)
+        finally:
+            await asyncio.to_thread(map_pool.close)
+            await asyncio.to_thread(parquet_sink.close)
+            await asyncio.to_thread(raw_archive.close)
+            if SPOOL_ENABLED:
+                await asyncio.to_thread(spool.close)
+                logger.info(f"✅ Spool metrics: {spool.metrics()}")
 
 
 if __name__ == "__main__":
+    configure_logging()
     asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# db_configs reads DB_PORT at import time, the pure modules under test never connect
+os.environ.setdefault('DB_PORT', '3306')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,41 @@
+from utils.entity_util import (
+    classify_crypto_batch,
+    count_contracts_batch,
+    extract_tweet_entities_batch,
+    main_cashtags_batch
+)
+
+EVM_ADDRESS = "0x" + "aB" * 20
+SOLANA_ADDRESS = "7xKXtg2CW87d97TXJSDpbD5jBkheTqA83TZRuJosgAsU"
+
+
+def test_counts_distinct_contract_addresses():
+    bodies = [
+        f"buy {EVM_ADDRESS} now, again {EVM_ADDRESS.lower()}",
+        f"sol {SOLANA_ADDRESS} and evm {EVM_ADDRESS}",
+        "no address here",
+        None,
+    ]
+    assert count_contracts_batch(bodies) == [1, 2, 0, 0]
+
+
+def test_long_words_are_not_contract_addresses():
+    bodies = ["a" * 40, "ThisIsAVeryLongHashtagWithoutAnyDigitsAtAll", "0x" + "g" * 40]
+    assert count_contracts_batch(bodies) == [0, 0, 0]
+
+
+def test_main_cashtag_is_the_most_mentioned():
+    bodies = ["$BTC up", "$eth and $btc, $ETH again", "no tags", "$SOL $BTC"]
+    cashtags = [["BTC"], ["BTC", "ETH"], [], ["SOL", "BTC"]]
+    # Ties keep the order twscrape parsed the cashtags in
+    assert main_cashtags_batch(bodies, cashtags) == ["BTC", "ETH", None, "SOL"]
+
+
+def test_crypto_keywords_match_whole_words_only():
+    texts = ["Bitcoin maxi", "a new method", "NFTs and web3", "cryptocurrency fan", "", None]
+    assert classify_crypto_batch(texts) == [1, 0, 1, 1, 0, 0]
+
+
+def test_extracts_contracts_and_main_cashtag_per_body():
+    bodies = [f"$PEPE {EVM_ADDRESS}", "gm"]
+    assert extract_tweet_entities_batch(bodies, [["PEPE"], []]) == [(1, "PEPE"), (0, None)]
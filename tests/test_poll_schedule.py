@@ -0,0 +1,68 @@
+from utils.poll_schedule import TIER_COLD, TIER_HOT, PollSchedule
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def make_schedule(**options):
+    clock = Clock()
+    options = {"min_interval": 300, "max_interval": 86400, "initial_interval": 3600,
+               "target_tweets": 10, "smoothing": 1.0, **options}
+    schedule = PollSchedule(clock=clock, **options)
+    schedule.sync(["Busy"])
+    return schedule, clock
+
+
+def test_new_handles_are_due_immediately():
+    schedule, _ = make_schedule()
+    assert schedule.pop_due() == ["Busy"]
+    assert schedule.pop_due() == []
+
+
+def test_busy_handles_are_clamped_to_the_min_interval():
+    schedule, clock = make_schedule()
+    schedule.observe("busy", 10_000)
+    state = schedule.handles["busy"]
+    assert state.interval == 300
+    assert state.due_at == clock.now + 300
+    assert state.tier == TIER_HOT
+
+
+def test_quiet_handles_back_off_up_to_the_max_interval():
+    schedule, clock = make_schedule()
+    state = schedule.handles["busy"]
+    for _ in range(10):
+        clock.now += state.interval
+        schedule.observe("busy", 0)
+    assert state.interval == 86400
+    assert state.tier == TIER_COLD
+
+
+def test_interval_targets_the_tweets_per_poll():
+    schedule, _ = make_schedule()
+    # No previous poll, the elapsed time is the initial interval: 10 tweets per hour
+    schedule.observe("busy", 10)
+    assert schedule.handles["busy"].interval == 3600
+
+
+def test_saturated_polls_halve_the_interval_down_to_the_min():
+    schedule, clock = make_schedule()
+    state = schedule.handles["busy"]
+    for _ in range(6):
+        clock.now += state.interval
+        schedule.observe("busy", 0, saturated=True)
+    assert state.interval == 300
+
+
+def test_retry_keeps_the_interval():
+    schedule, clock = make_schedule(retry_delay=120)
+    schedule.pop_due()
+    schedule.retry("busy")
+    state = schedule.handles["busy"]
+    assert state.interval == 3600
+    assert schedule.next_due_at() == clock.now + 120
@@ -0,0 +1,63 @@
+from types import SimpleNamespace
+
+from utils.query_planner import QUERY_SUFFIX_RESERVE, QueryGroup, QueryPlanner
+
+
+def handles_of(groups):
+    return [group.handles for group in groups]
+
+
+def test_busy_handles_get_their_own_group():
+    planner = QueryPlanner(solo_min_tweets=20, default_handle_tweets=2)
+    planner.volumes = {"busy": 50}
+    groups = planner.plan(["quiet", "Busy"], {}, limit=100)
+    assert handles_of(groups) == [["Busy"], ["quiet"]]
+    assert groups[0].is_solo and groups[0].search_term == "from:Busy"
+
+
+def test_handles_with_checkpoints_are_grouped_by_checkpoint():
+    planner = QueryPlanner(max_group_handles=2)
+    checkpoints = {"a": 30, "b": 10, "c": None, "d": 20}
+    groups = planner.plan(["a", "b", "c", "d"], checkpoints, limit=100)
+    # Close checkpoints share a group, handles without one are packed apart
+    assert handles_of(groups) == [["b", "d"], ["a"], ["c"]]
+    assert groups[0].since_id == 10
+    assert groups[2].since_id is None
+
+
+def test_groups_stay_within_the_expected_volume():
+    planner = QueryPlanner(default_handle_tweets=4)
+    groups = planner.plan([f"h{n}" for n in range(10)], {}, limit=10)
+    assert handles_of(groups) == [["h0", "h1"], ["h2", "h3"], ["h4", "h5"], ["h6", "h7"], ["h8", "h9"]]
+
+
+def test_groups_stay_within_the_query_length():
+    max_query_length = QUERY_SUFFIX_RESERVE + 40
+    planner = QueryPlanner(max_query_length=max_query_length)
+    groups = planner.plan([f"handle{n:02}" for n in range(6)], {}, limit=1000)
+    assert [len(group.handles) for group in groups] == [2, 2, 2]
+    for group in groups:
+        assert len(group.search_term) <= max_query_length - QUERY_SUFFIX_RESERVE
+    assert groups[0].search_term == "(from:handle00 OR from:handle01)"
+
+
+def test_route_skips_tweets_at_or_below_the_handle_checkpoint():
+    group = QueryGroup(["Alice", "bob"], {"alice": 100, "bob": None})
+    tweet = lambda tweet_id, username: SimpleNamespace(id=tweet_id, user=SimpleNamespace(username=username))
+    assert group.route(tweet(100, "alice")) is None
+    assert group.route(tweet(101, "ALICE")) == "alice"
+    assert group.route(tweet(5, "bob")) == "bob"
+    assert group.route(tweet(200, "carol")) is None
+    assert group.counts == {"alice": 1, "bob": 1}
+
+
+def test_observe_smooths_volumes_and_counts_pages():
+    planner = QueryPlanner(smoothing=0.5)
+    group = QueryGroup(["a", "b"], {})
+    group.counts = {"a": 10, "b": 0}
+    planner.observe(group, 10)
+    group.counts = {"a": 30, "b": 0}
+    planner.observe(group, 30)
+    assert planner.volumes == {"a": 20, "b": 0}
+    assert planner.search_requests == 3
+    assert planner.requests_per_1000_handles() == 750
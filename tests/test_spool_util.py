@@ -0,0 +1,84 @@
+import pickle
+from contextlib import contextmanager
+
+import utils.spool_util as spool_util
+from constants import ENHANCED_TWEETS_COLUMNS, TWITTER_PROFILES_COLUMNS
+from utils.spool_util import SPOOL_QUERIES, WriteSpool, dedupe_rows
+
+
+def tweet_row(tweet_id, like_count=0):
+    row = [None] * len(ENHANCED_TWEETS_COLUMNS)
+    row[ENHANCED_TWEETS_COLUMNS.index("tweet_id")] = tweet_id
+    row[ENHANCED_TWEETS_COLUMNS.index("like_count")] = like_count
+    return tuple(row)
+
+
+def profile_row(author_id, handle):
+    row = [None] * len(TWITTER_PROFILES_COLUMNS)
+    row[TWITTER_PROFILES_COLUMNS.index("author_id")] = author_id
+    row[TWITTER_PROFILES_COLUMNS.index("handle")] = handle
+    return tuple(row)
+
+
+class RecordingDB:
+    """Stands in for db_configs.db and records the statement batches of a replay"""
+
+    def __init__(self):
+        self.batches = []
+
+    @contextmanager
+    def transaction(self):
+        yield None
+
+    def write_rows(self, cursor, query, rows, bulk_queries=None):
+        self.batches.append((query, list(rows)))
+        return "executemany"
+
+
+def replay(monkeypatch, entries):
+    db = RecordingDB()
+    monkeypatch.setattr(spool_util, "db", db)
+    spool = WriteSpool(path=":memory:")
+    spool._replay([(entry_id, kind, len(rows), pickle.dumps(rows), 0.0)
+                   for entry_id, (kind, rows) in enumerate(entries)])
+    return db.batches
+
+
+def test_dedupe_keeps_the_last_row_per_key_in_first_seen_order():
+    rows = [tweet_row("1", 1), tweet_row("2", 1), tweet_row("1", 5)]
+    assert dedupe_rows("enhanced_tweets", rows) == [tweet_row("1", 5), tweet_row("2", 1)]
+
+
+def test_dedupe_leaves_unique_and_keyless_rows_alone():
+    rows = [tweet_row("1"), tweet_row("2")]
+    assert dedupe_rows("enhanced_tweets", rows) is rows
+    checkpoints = [("alice", 10), ("alice", 20)]
+    assert dedupe_rows("scrape_checkpoints", checkpoints) == checkpoints
+
+
+def test_replay_merges_entries_of_a_kind_into_one_run(monkeypatch):
+    batches = replay(monkeypatch, [
+        ("enhanced_tweets", [tweet_row("1")]),
+        ("twitter_profiles", [profile_row("9", "old")]),
+        ("enhanced_tweets", [tweet_row("2")]),
+        ("twitter_profiles", [profile_row("9", "new")]),
+    ])
+    assert batches == [
+        (SPOOL_QUERIES["enhanced_tweets"], [tweet_row("1"), tweet_row("2")]),
+        (SPOOL_QUERIES["twitter_profiles"], [profile_row("9", "new")]),
+    ]
+
+
+def test_replay_keeps_ordered_kinds_in_append_order(monkeypatch):
+    engagement = [(7, 0, 0, 0, 0, None, "1")]
+    batches = replay(monkeypatch, [
+        ("enhanced_tweets", [tweet_row("1", 1)]),
+        ("tweet_engagement", engagement),
+        ("enhanced_tweets", [tweet_row("1", 2)]),
+    ])
+    # The later upsert may not jump ahead of the engagement update it follows
+    assert batches == [
+        (SPOOL_QUERIES["enhanced_tweets"], [tweet_row("1", 1)]),
+        (SPOOL_QUERIES["tweet_engagement"], engagement),
+        (SPOOL_QUERIES["enhanced_tweets"], [tweet_row("1", 2)]),
+    ]
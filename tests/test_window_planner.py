@@ -0,0 +1,69 @@
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from utils.window_planner import TWITTER_EPOCH_MS, WindowPlanner, checkpoint_gap, split_point, tweet_id_time
+
+HOUR = 3600
+
+
+def make_group(saturated=True, oldest_time=None):
+    oldest = datetime.fromtimestamp(oldest_time, tz=timezone.utc) if oldest_time is not None else None
+    return SimpleNamespace(saturated=saturated, oldest_time=oldest, search_term="from:someone", fetched=100)
+
+
+def test_split_point_rounds_long_windows_down_to_the_hour():
+    assert split_point(0, 4 * HOUR) == 2 * HOUR
+    assert split_point(0, 3 * HOUR - 100) == HOUR
+
+
+def test_split_point_rounds_short_windows_down_to_the_minute():
+    assert split_point(0, 3000) == 1500
+    assert split_point(0, 3130) == 1560
+
+
+def test_split_point_falls_back_to_the_middle_when_rounding_leaves_the_window():
+    assert split_point(10, 100) == 55
+    assert split_point(2 * HOUR + 10, 4 * HOUR + 100) == 3 * HOUR
+
+
+def test_split_keeps_nothing_for_complete_searches():
+    planner = WindowPlanner(min_seconds=60)
+    assert planner.split(0, 4 * HOUR, make_group(saturated=False)) == []
+    assert planner.splits == 0
+
+
+def test_split_halves_the_part_older_than_the_oldest_tweet():
+    planner = WindowPlanner(min_seconds=60)
+    pieces = planner.split(0, 8 * HOUR, make_group(oldest_time=4 * HOUR))
+    # The oldest second is searched again, it may have been cut off
+    assert pieces == [(0, 2 * HOUR), (2 * HOUR, 4 * HOUR + 1)]
+    assert planner.splits == 1
+
+
+def test_split_returns_minimum_width_remainder_whole():
+    planner = WindowPlanner(min_seconds=60)
+    assert planner.split(0, HOUR, make_group(oldest_time=30)) == [(0, 31)]
+    assert planner.splits == 0
+
+
+def test_split_truncates_saturated_minimum_width_windows():
+    planner = WindowPlanner(min_seconds=60)
+    assert planner.split(0, 60, make_group(oldest_time=59)) == []
+    assert planner.truncated == [(0, 60)]
+
+
+def test_reserve_stops_at_the_search_budget():
+    planner = WindowPlanner(max_searches=2)
+    assert planner.reserve(0, 10) and planner.reserve(10, 20)
+    assert not planner.reserve(20, 30)
+    assert planner.searches == 2
+    assert planner.truncated == [(20, 30)]
+
+
+def test_checkpoint_gap_spans_checkpoint_to_oldest_tweet():
+    since_time = 1_700_000_000
+    since_id = (since_time * 1000 - TWITTER_EPOCH_MS) << 22
+    assert tweet_id_time(since_id) == since_time
+    oldest = datetime.fromtimestamp(since_time + HOUR, tz=timezone.utc)
+    assert checkpoint_gap(since_id, oldest) == (since_time, since_time + HOUR + 1)
+    assert checkpoint_gap(since_id, datetime.fromtimestamp(since_time - 10, tz=timezone.utc)) is None
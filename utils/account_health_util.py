@@ -0,0 +1,111 @@
+"""
+Scraper account health utilities
+Probes accounts in error or cooldown state and returns working ones to active
+"""
+
+import asyncio
+import logging
+import os
+import tempfile
+from twscrape import API  # pyright: ignore[reportMissingImports]
+from db_configs import db
+from constants import (
+    CLAIM_ACCOUNTS_FOR_REVALIDATION_QUERY,
+    MARK_ACCOUNTS_AS_OCCUPIED_QUERY,
+    MARK_ACCOUNT_AS_PROBED_QUERY
+)
+from utils.error_util import ERROR_TRANSIENT
+from utils.scraper_account_util import handle_account_error, mark_account_as_active
+
+logger = logging.getLogger(__name__)
+
+ACCOUNT_PROBE_HANDLE = os.getenv('ACCOUNT_PROBE_HANDLE', 'X')
+ACCOUNT_PROBE_TIMEOUT = int(os.getenv('ACCOUNT_PROBE_TIMEOUT', '30'))
+# Error accounts are probed again only after this many seconds
+ERROR_REVALIDATE_AFTER = int(os.getenv('ERROR_REVALIDATE_AFTER', '21600'))
+REVALIDATION_BATCH_SIZE = int(os.getenv('REVALIDATION_BATCH_SIZE', '10'))
+REVALIDATION_INTERVAL = int(os.getenv('REVALIDATION_INTERVAL', '1800'))
+
+
+def claim_accounts_for_revalidation(limit=REVALIDATION_BATCH_SIZE):
+    """
+    Claim error/cooldown accounts that are due for a probe
+    Claimed accounts are marked occupied so no other worker probes them
+    """
+    with db.transaction() as cursor:
+        cursor.execute(CLAIM_ACCOUNTS_FOR_REVALIDATION_QUERY, (ERROR_REVALIDATE_AFTER, limit))
+        rows = cursor.fetchall()
+        usernames = [row[0] for row in rows]
+        if usernames:
+            query = MARK_ACCOUNTS_AS_OCCUPIED_QUERY.format(placeholders=", ".join(["%s"] * len(usernames)))
+            cursor.execute(query, usernames)
+    return [{"username": username, "cookie_string": cookie, "status": status} for username, cookie, status in rows]
+
+
+def mark_account_as_probed(username):
+    """
+    Unlock an account after an inconclusive probe, keeping its status
+    Bumps updated_at, so an error account waits ERROR_REVALIDATE_AFTER before its next probe
+    """
+    try:
+        db.execute_query(MARK_ACCOUNT_AS_PROBED_QUERY, (username,))
+    except Exception as e:
+        logger.error(f"❌ Error unlocking probed account {username}: {e}")
+
+
+async def probe_account(username, cookie_string):
+    """
+    Check an account with one profile lookup through a throwaway twscrape pool
+    Raises the probe error if the account does not work
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        api = API(os.path.join(tmp_dir, "probe.db"), raise_when_no_account=True)
+        await api.pool.add_account(
+            username=username,
+            password="",  # Required but not used when cookies are provided
+            email="",  # Required but not used when cookies are provided
+            email_password="",  # Required but not used when cookies are provided
+            cookies=cookie_string
+        )
+        user = await asyncio.wait_for(api.user_by_login(ACCOUNT_PROBE_HANDLE), ACCOUNT_PROBE_TIMEOUT)
+        if user is None:
+            raise RuntimeError(f"Probe lookup of {ACCOUNT_PROBE_HANDLE} returned no user")
+
+
+async def revalidate_accounts(limit=REVALIDATION_BATCH_SIZE):
+    """
+    Probe a batch of error/cooldown accounts
+    Working accounts return to active, failing ones are re-classified
+    Returns the number of accounts reactivated
+    """
+    try:
+        accounts = await asyncio.to_thread(claim_accounts_for_revalidation, limit)
+    except Exception as e:
+        logger.error(f"❌ Error claiming accounts for revalidation: {e}")
+        return 0
+
+    reactivated = 0
+    for account in accounts:
+        username = account["username"]
+        try:
+            await probe_account(username, account["cookie_string"])
+        except Exception as e:
+            logger.error(f"❌ Account {username} failed revalidation: {e}")
+            if await asyncio.to_thread(handle_account_error, username, e) == ERROR_TRANSIENT:
+                # The probe itself failed, keep the status and try again after the usual wait
+                await asyncio.to_thread(mark_account_as_probed, username)
+            continue
+
+        await asyncio.to_thread(mark_account_as_active, username)
+        reactivated += 1
+
+    if accounts:
+        logger.info(f"✅ Revalidated {len(accounts)} accounts, {reactivated} returned to active")
+    return reactivated
+
+
+async def run_revalidation_loop(interval=REVALIDATION_INTERVAL):
+    """Revalidate accounts every `interval` seconds until cancelled"""
+    while True:
+        await revalidate_accounts()
+        await asyncio.sleep(interval)
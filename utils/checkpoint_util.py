@@ -0,0 +1,73 @@
+"""
+Scrape checkpoint utilities
+Stores the newest tweet seen per handle so later runs only fetch newer tweets
+"""
+
+import logging
+from db_configs import db
+from constants import GET_SCRAPE_CHECKPOINTS_QUERY
+from utils.spool_util import write_rows
+
+logger = logging.getLogger(__name__)
+
+
+def checkpoint_key_for_handle(account_handle):
+    """Checkpoints are keyed by lower-cased handle"""
+    return account_handle.lower()
+
+
+def get_checkpoints(checkpoint_keys):
+    """
+    Fetch checkpoints from twitter.scrape_checkpoints table
+    Returns a dictionary of checkpoint_key -> {"last_tweet_id", "last_tweet_time"}
+    """
+    checkpoint_keys = list(checkpoint_keys)
+    if not checkpoint_keys:
+        return {}
+
+    try:
+        query = GET_SCRAPE_CHECKPOINTS_QUERY.format(placeholders=", ".join(["%s"] * len(checkpoint_keys)))
+        results = db.fetch_query(query, checkpoint_keys)
+        return {
+            checkpoint_key: {"last_tweet_id": int(last_tweet_id), "last_tweet_time": last_tweet_time}
+            for checkpoint_key, last_tweet_id, last_tweet_time in results
+        }
+    except Exception as e:
+        logger.error(f"❌ Error fetching scrape checkpoints: {e}")
+        return {}
+
+
+def get_checkpoint(checkpoint_key):
+    """Fetch a single checkpoint, returns None if there is none yet"""
+    return get_checkpoints([checkpoint_key]).get(checkpoint_key)
+
+
+def save_checkpoints(checkpoints):
+    """
+    Save (checkpoint_key, last_tweet_id, last_tweet_time) tuples
+    Checkpoints only move forward, older tweet ids are ignored
+    """
+    if not checkpoints:
+        return
+
+    try:
+        write_rows("scrape_checkpoints", checkpoints)
+        logger.info(f"✅ Saved {len(checkpoints)} scrape checkpoints")
+    except Exception as e:
+        logger.error(f"❌ Error saving scrape checkpoints: {e}")
+
+
+class CheckpointTracker:
+    """Tracks the newest tweet seen per checkpoint key during a scrape"""
+
+    def __init__(self):
+        self.newest = {}  # checkpoint_key -> (tweet_id, tweet_time)
+
+    def update(self, checkpoint_key, tweet):
+        tweet_id = int(tweet.id)
+        current = self.newest.get(checkpoint_key)
+        if current is None or tweet_id > current[0]:
+            self.newest[checkpoint_key] = (tweet_id, tweet.date)
+
+    def rows(self):
+        return [(key, tweet_id, tweet_time) for key, (tweet_id, tweet_time) in self.newest.items()]
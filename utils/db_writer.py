@@ -0,0 +1,83 @@
+"""
+Async database write path
+Hands blocking pymysql writes to a dedicated writer thread so scraping
+coroutines can keep fetching while earlier batches commit
+"""
+
+import asyncio
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from utils.metrics import WRITER_PENDING
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of batches waiting to be written before submit() blocks
+DB_WRITER_MAX_PENDING = int(os.getenv('DB_WRITER_MAX_PENDING', '100'))
+
+
+class AsyncDBWriter:
+    """
+    Queue of pending write jobs drained by a single writer thread
+    Jobs run in submission order, so a batch of tweets is always written
+    before anything submitted after it
+    """
+
+    def __init__(self, max_pending=DB_WRITER_MAX_PENDING):
+        self.max_pending = max_pending
+        self._queue = None
+        self._task = None
+        self._executor = None
+
+    async def start(self):
+        if self._task is not None:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_pending)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-writer")
+        self._task = asyncio.create_task(self._run())
+        WRITER_PENDING.set_function(lambda: self.pending)
+
+    async def submit(self, func, *args):
+        """
+        Queue func(*args) to run on the writer thread
+        Waits only when max_pending jobs are already queued
+        """
+        await self._queue.put((func, args))
+
+    async def flush(self):
+        """Wait until every submitted job has been written"""
+        await self._queue.join()
+
+    async def close(self):
+        """Write the remaining jobs and stop the writer thread"""
+        if self._task is None:
+            return
+        await self._queue.put(None)
+        await self._task
+        self._executor.shutdown(wait=True)
+        self._task = None
+
+    @property
+    def pending(self):
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self._queue.get()
+            try:
+                if job is None:
+                    return
+                func, args = job
+                await loop.run_in_executor(self._executor, func, *args)
+            except Exception as e:
+                logger.error(f"❌ Error in database writer: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
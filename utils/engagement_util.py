@@ -0,0 +1,171 @@
+"""
+Engagement change detection for enhanced_tweets refreshes
+Remembers the last counters written per tweet so re-scraped tweets are
+skipped when nothing moved and sent through a narrow counters-only UPDATE
+when only engagement changed. Tweets the cache doesn't know are looked up
+in twitter.enhanced_tweets first, so one-shot runs don't start cold
+"""
+
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from db_configs import db
+from constants import GET_ENHANCED_TWEETS_ENGAGEMENT_QUERY
+from utils.spool_util import write_rows
+from utils.twitter_util import insert_enhanced_tweets_to_db
+from utils.row_builder import TWEET_COLUMN_INDEX, enhanced_tweet_values
+from utils.metrics import ROWS
+
+logger = logging.getLogger(__name__)
+
+ENGAGEMENT_CACHE_SIZE = int(os.getenv('ENGAGEMENT_CACHE_SIZE', '500000'))
+# Append a snapshot row to twitter.enhanced_tweets_engagement_history on every change
+ENGAGEMENT_HISTORY_ENABLED = os.getenv('ENGAGEMENT_HISTORY_ENABLED', '0') == '1'
+# Seed the cache from twitter.enhanced_tweets for tweets it doesn't know before each write
+ENGAGEMENT_DB_SEED_ENABLED = os.getenv('ENGAGEMENT_DB_SEED_ENABLED', '1') == '1'
+
+ENGAGEMENT_FIELDS = ("retweet_count", "like_count", "reply_count", "quote_count", "view_count")
+
+ENGAGEMENT_INDEXES = tuple(TWEET_COLUMN_INDEX[field] for field in ENGAGEMENT_FIELDS)
+TWEET_ID_INDEX = TWEET_COLUMN_INDEX["tweet_id"]
+BODY_INDEX = TWEET_COLUMN_INDEX["body"]
+IMPRESSIONS_INDEX = TWEET_COLUMN_INDEX["impressions"]
+UPDATE_TIME_INDEX = TWEET_COLUMN_INDEX["update_time"]
+
+
+def body_hash(body):
+    return hashlib.blake2b((body or "").encode('utf-8'), digest_size=8).digest()
+
+
+def engagement_state(tweet_row):
+    """Counters plus a body hash, the body only changes on edits"""
+    return tuple(tweet_row[index] for index in ENGAGEMENT_INDEXES), body_hash(tweet_row[BODY_INDEX])
+
+
+def engagement_update_values(tweet_row):
+    """Values for UPDATE_ENHANCED_TWEETS_ENGAGEMENT_QUERY"""
+    return (
+        *(tweet_row[index] for index in ENGAGEMENT_INDEXES),
+        tweet_row[IMPRESSIONS_INDEX],
+        tweet_row[UPDATE_TIME_INDEX],
+        tweet_row[TWEET_ID_INDEX],
+    )
+
+
+def engagement_history_values(tweet_row):
+    """Values for INSERT_INTO_ENGAGEMENT_HISTORY_QUERY"""
+    return (
+        tweet_row[TWEET_ID_INDEX],
+        tweet_row[UPDATE_TIME_INDEX],
+        *(tweet_row[index] for index in ENGAGEMENT_INDEXES),
+    )
+
+
+class EngagementTracker:
+    """
+    LRU of tweet_id -> last written engagement state
+    Tweets not in the cache get the full upsert, tweets whose counters moved
+    get the counters-only UPDATE and unchanged tweets are not written at all
+    With db_seed, tweets not in the cache are first looked up in enhanced_tweets
+    """
+
+    def __init__(self, max_size=ENGAGEMENT_CACHE_SIZE, history_enabled=ENGAGEMENT_HISTORY_ENABLED,
+                 db_seed=ENGAGEMENT_DB_SEED_ENABLED):
+        self.max_size = max_size
+        self.history_enabled = history_enabled
+        self.db_seed = db_seed
+        self._states = OrderedDict()
+        self._lock = threading.Lock()
+        self.inserted = 0
+        self.updated = 0
+        self.skipped = 0
+
+    def partition(self, tweets_data):
+        """
+        Split tweet rows into (new_or_edited, counters_changed, unchanged_count)
+        Accepts rows or column dictionaries
+        """
+        full_rows, changed_rows = [], []
+        with self._lock:
+            for tweet_row in map(enhanced_tweet_values, tweets_data):
+                previous = self._states.get(tweet_row[TWEET_ID_INDEX])
+                if previous is None:
+                    full_rows.append(tweet_row)
+                    continue
+                counters, body_hash = engagement_state(tweet_row)
+                if body_hash != previous[1]:
+                    full_rows.append(tweet_row)
+                elif counters != previous[0]:
+                    changed_rows.append(tweet_row)
+        return full_rows, changed_rows, len(tweets_data) - len(full_rows) - len(changed_rows)
+
+    def _remember(self, states):
+        with self._lock:
+            for tweet_id, state in states:
+                self._states[tweet_id] = state
+                self._states.move_to_end(tweet_id)
+            while len(self._states) > self.max_size:
+                self._states.popitem(last=False)
+
+    def mark_written(self, tweets_data):
+        self._remember((tweet_row[TWEET_ID_INDEX], engagement_state(tweet_row)) for tweet_row in tweets_data)
+
+    def seed(self, tweet_ids):
+        """Load the stored state of the tweets the cache doesn't know from twitter.enhanced_tweets"""
+        with self._lock:
+            unknown = [tweet_id for tweet_id in dict.fromkeys(tweet_ids) if tweet_id not in self._states]
+        if not unknown:
+            return
+        try:
+            query = GET_ENHANCED_TWEETS_ENGAGEMENT_QUERY.format(placeholders=", ".join(["%s"] * len(unknown)))
+            results = db.fetch_query(query, unknown)
+        except Exception as e:
+            logger.error(f"❌ Error loading stored tweet engagement: {e}")
+            return
+        self._remember((str(tweet_id), (tuple(counters), body_hash(body)))
+                       for tweet_id, *counters, body in results)
+
+    def write(self, tweets_data):
+        """Write a batch of mapped tweets, only sending what changed"""
+        tweets_data = [enhanced_tweet_values(tweet_data) for tweet_data in tweets_data]
+        if self.db_seed:
+            self.seed([tweet_row[TWEET_ID_INDEX] for tweet_row in tweets_data])
+        full_rows, changed_rows, unchanged = self.partition(tweets_data)
+        self.skipped += unchanged
+        ROWS.inc(unchanged, kind="enhanced_tweets", outcome="skipped")
+        written = []
+
+        if full_rows and insert_enhanced_tweets_to_db(full_rows):
+            self.mark_written(full_rows)
+            self.inserted += len(full_rows)
+            written.extend(full_rows)
+
+        if changed_rows:
+            try:
+                write_rows(
+                    "tweet_engagement",
+                    [engagement_update_values(tweet_row) for tweet_row in changed_rows]
+                )
+                self.mark_written(changed_rows)
+                self.updated += len(changed_rows)
+                written.extend(changed_rows)
+                logger.info(f"✅ Updated engagement for {len(changed_rows)} tweets")
+            except Exception as e:
+                logger.error(f"❌ Error updating tweet engagement: {e}")
+
+        if self.history_enabled and written:
+            try:
+                write_rows(
+                    "engagement_history",
+                    [engagement_history_values(tweet_row) for tweet_row in written]
+                )
+            except Exception as e:
+                logger.error(f"❌ Error inserting engagement history: {e}")
+
+        if unchanged:
+            logger.debug(f"✅ Skipped {unchanged} tweets with unchanged engagement")
+
+
+engagement_tracker = EngagementTracker()
@@ -0,0 +1,128 @@
+"""
+Crypto entity extraction
+Detects EVM and Solana contract addresses, ranks cashtags and classifies
+crypto bios with precompiled patterns that run over whole batches of texts
+"""
+
+import re
+from bisect import bisect_right
+
+# 0x-prefixed 20 byte hex addresses, and 32-44 character base58 strings (Solana)
+CONTRACT_PATTERN = re.compile(
+    r'(?<![0-9A-Za-z])(?:0x[0-9a-fA-F]{40}|[1-9A-HJ-NP-Za-km-z]{32,44})(?![0-9A-Za-z])'
+)
+# Contract addresses are never shorter than 32 ASCII letters and digits; a batch is
+# screened for such runs with a byte translation before the pattern runs
+CONTRACT_MIN_LENGTH = 32
+ALNUM_RUN_TABLE = bytes(
+    ord("a") if chr(byte).isascii() and chr(byte).isalnum() else ord(" ") for byte in range(256)
+)
+
+# Starts with the literal "$" so the regex engine can skip ahead to candidates
+CASHTAG_PATTERN = re.compile(r'\$(?<![\w$]\$)([A-Za-z][A-Za-z0-9_]{0,14})\b')
+# Whole words only, so "eth" no longer matches "method"; plurals and crypto* stems still match
+# Run over lowercased texts, which is cheaper than re.IGNORECASE
+CRYPTO_KEYWORD_PATTERN = re.compile(
+    r'\b(?:crypto\w*|bitcoin|btc|ethereum|eth|blockchain|defi|nfts?|web3|trading|tokens?)\b'
+)
+
+# Texts are joined with a separator no pattern can match across
+BATCH_SEPARATOR = "\n"
+
+
+def is_contract_address(candidate):
+    """
+    EVM addresses always qualify; base58 candidates must mix digits, upper and
+    lower case letters, which ordinary words and hashtags never do
+    """
+    if candidate.startswith("0x") and len(candidate) == 42:
+        return True
+    return (any(char.isdigit() for char in candidate)
+            and any(char.isupper() for char in candidate)
+            and any(char.islower() for char in candidate))
+
+
+def _match_rows(pattern, texts):
+    """Run one pattern over a batch of texts, yielding (row index, match)"""
+    starts = []
+    offset = 0
+    for text in texts:
+        starts.append(offset)
+        offset += len(text) + len(BATCH_SEPARATOR)
+    joined = BATCH_SEPARATOR.join(texts)
+    for match in pattern.finditer(joined):
+        yield bisect_right(starts, match.start()) - 1, match
+
+
+def _rows_with_alnum_run(texts, length):
+    """Indexes of the texts holding at least `length` consecutive ASCII letters and digits"""
+    encoded = [text.encode('utf-8') for text in texts]
+    starts = []
+    offset = 0
+    for data in encoded:
+        starts.append(offset)
+        offset += len(data) + 1
+    joined = b"\n".join(encoded).translate(ALNUM_RUN_TABLE)
+
+    rows = []
+    needle = b"a" * length
+    position = joined.find(needle)
+    while position != -1:
+        row = bisect_right(starts, position) - 1
+        rows.append(row)
+        if row + 1 == len(starts):
+            break
+        position = joined.find(needle, starts[row + 1])
+    return rows
+
+
+def count_contracts_batch(bodies):
+    """Number of distinct contract addresses in each body"""
+    bodies = [body or "" for body in bodies]
+    counts = [0] * len(bodies)
+    for row in _rows_with_alnum_run(bodies, CONTRACT_MIN_LENGTH):
+        addresses = {
+            address.lower() if address.startswith("0x") else address
+            for address in CONTRACT_PATTERN.findall(bodies[row]) if is_contract_address(address)
+        }
+        counts[row] = len(addresses)
+    return counts
+
+
+def rank_cashtags(cashtags, mentions):
+    """
+    Cashtags ordered by how often the body mentions them, ties broken by
+    the order twscrape parsed them in
+    """
+    mentions = [tag.upper() for tag in mentions]
+    return sorted(cashtags, key=lambda tag: -mentions.count(tag.upper()))
+
+
+def main_cashtags_batch(bodies, cashtags_list):
+    """
+    Most mentioned cashtag of each body, None when it has none
+    Only bodies with several cashtags need their mentions counted
+    """
+    main_cashtags = []
+    for body, cashtags in zip(bodies, cashtags_list):
+        if not cashtags:
+            main_cashtags.append(None)
+        elif len(cashtags) == 1:
+            main_cashtags.append(cashtags[0])
+        else:
+            main_cashtags.append(rank_cashtags(cashtags, CASHTAG_PATTERN.findall(body or ""))[0])
+    return main_cashtags
+
+
+def classify_crypto_batch(texts):
+    """1 for each text that contains a crypto keyword as a whole word, 0 otherwise"""
+    texts = [text.lower() if text else "" for text in texts]
+    flags = [0] * len(texts)
+    for row, _ in _match_rows(CRYPTO_KEYWORD_PATTERN, texts):
+        flags[row] = 1
+    return flags
+
+
+def extract_tweet_entities_batch(bodies, cashtags_list):
+    """(number_of_contracts, main_cashtag) for each tweet body"""
+    return list(zip(count_contracts_batch(bodies), main_cashtags_batch(bodies, cashtags_list)))
@@ -0,0 +1,49 @@
+"""
+Error classification utilities
+Separates fatal account errors from rate limits and transient failures so
+only broken accounts are taken out of the pool
+"""
+
+import os
+import random
+
+ERROR_FATAL = "fatal"
+ERROR_RATE_LIMIT = "rate_limit"
+ERROR_TRANSIENT = "transient"
+
+ACCOUNT_COOLDOWN_SECONDS = int(os.getenv('ACCOUNT_COOLDOWN_SECONDS', '900'))
+RETRY_MAX_ATTEMPTS = int(os.getenv('RETRY_MAX_ATTEMPTS', '3'))
+RETRY_BASE_DELAY = float(os.getenv('RETRY_BASE_DELAY', '1'))
+RETRY_MAX_DELAY = float(os.getenv('RETRY_MAX_DELAY', '30'))
+
+# Only an HTTP status decides: message text also carries timings, tweet ids and
+# twscrape's NoAccountError, which just means every account is cooling down
+RATE_LIMIT_STATUS_CODES = {429}
+FATAL_STATUS_CODES = {401, 403}
+
+
+def _status_code(error):
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", None) or getattr(error, "status_code", None)
+
+
+def classify_error(error):
+    """
+    Classify an exception as fatal, rate limit or transient
+    Only the HTTP status code of the error (or of the error it wraps) counts;
+    anything without a 401/403/429 is treated as transient, so a network or
+    DB blip never disables an account
+    """
+    status_code = _status_code(error)
+    if status_code is None and error.__cause__ is not None:
+        status_code = _status_code(error.__cause__)
+    if status_code in RATE_LIMIT_STATUS_CODES:
+        return ERROR_RATE_LIMIT
+    if status_code in FATAL_STATUS_CODES:
+        return ERROR_FATAL
+    return ERROR_TRANSIENT
+
+
+def backoff_delay(attempt, base_delay=RETRY_BASE_DELAY, max_delay=RETRY_MAX_DELAY):
+    """Exponential backoff with full jitter for the given zero-based attempt"""
+    return random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
@@ -0,0 +1,48 @@
+"""
+Logging setup
+Modules log through logging.getLogger(__name__); the entry points call
+configure_logging() once, which picks the level and a text or JSON format
+"""
+
+import json
+import logging
+import os
+import sys
+
+# DEBUG also logs every scraped tweet and search query
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+# "text" for humans, "json" for one JSON object per line
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text').lower()
+
+TEXT_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+# LogRecord attributes, everything else on a record was passed through extra=
+RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, with any extra= fields as top-level keys"""
+
+    def format(self, record):
+        entry = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+def configure_logging(level=LOG_LEVEL, fmt=LOG_FORMAT):
+    """Send every log record to stderr, replacing handlers from an earlier call"""
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(JsonFormatter() if fmt == "json" else logging.Formatter(TEXT_FORMAT))
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level)
@@ -0,0 +1,111 @@
+"""
+Process-pool mapping stage
+Maps micro-batches of raw tweets and authors into column-ordered rows in
+worker processes, so entity extraction and bio classification stop holding
+the GIL the event loop needs for network I/O
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import pickle
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from utils.metrics import MAPPING_SECONDS, MAP_POOL_PENDING
+from utils.row_builder import build_enhanced_tweet_rows, build_profile_rows
+
+logger = logging.getLogger(__name__)
+
+# Worker processes, 0 keeps mapping on the event loop and auto uses one per CPU
+MAP_WORKERS = os.getenv('MAP_WORKERS', '0')
+MAP_WORKERS = (os.cpu_count() or 1) if MAP_WORKERS == 'auto' else int(MAP_WORKERS)
+# Batches mapped or queued in the pool at once, flushes wait beyond this (default two per worker)
+MAP_MAX_PENDING = int(os.getenv('MAP_MAX_PENDING', '0'))
+
+
+def is_pool_error(error):
+    """
+    True for errors of the pool itself: a dead worker or a batch that can't be pickled
+    Pickling failures surface as TypeError/AttributeError naming pickle
+    """
+    if isinstance(error, (BrokenProcessPool, pickle.PicklingError)):
+        return True
+    return isinstance(error, (TypeError, AttributeError)) and "pickle" in str(error).lower()
+
+
+def map_batch(tweets, users, now, script_type="test_scraper"):
+    """Map one batch in a worker process, returns (tweet rows, profile rows)"""
+    return (build_enhanced_tweet_rows(tweets, script_type, now=now) if tweets else [],
+            build_profile_rows(users, script_type, now=now) if users else [])
+
+
+class MapPool:
+    """
+    Pool of mapping processes behind an asyncio semaphore
+    A batch waits for a free slot before it is pickled and sent, so when
+    every worker is busy the flushing searches stop pulling pages instead
+    of queueing tweets in memory
+    Falls back to mapping on the event loop if the pool breaks or a batch
+    can't be pickled, errors raised by the mapping itself propagate
+    """
+
+    def __init__(self, workers=MAP_WORKERS, max_pending=MAP_MAX_PENDING):
+        self.workers = workers
+        self.max_pending = max_pending or 2 * max(1, workers)
+        self._executor = None
+        self._semaphore = None
+        self._pending = 0
+
+    @property
+    def enabled(self):
+        return self.workers > 0
+
+    def _start(self):
+        # spawn: workers must not inherit the writer, spool and heartbeat threads of the parent
+        self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                             mp_context=multiprocessing.get_context("spawn"))
+        self._semaphore = asyncio.Semaphore(self.max_pending)
+        MAP_POOL_PENDING.set_function(lambda: self._pending)
+        logger.info(f"✅ Mapping in {self.workers} worker processes, up to {self.max_pending} batches at once")
+
+    async def map(self, tweets, users, now, script_type="test_scraper"):
+        """Map a batch in the pool, returns (tweet rows, profile rows)"""
+        if not self.enabled:
+            return map_batch(tweets, users, now, script_type)
+        if self._executor is None:
+            self._start()
+        self._pending += 1
+        started = time.perf_counter()
+        try:
+            async with self._semaphore:
+                if self._executor is None:
+                    # The pool broke while this batch waited for a slot
+                    return map_batch(tweets, users, now, script_type)
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(self._executor, map_batch, tweets, users, now, script_type)
+        except Exception as e:
+            if not is_pool_error(e):
+                raise
+            logger.error(f"❌ Error mapping in the process pool, mapping on the event loop from now on: {e}")
+            self._fall_back()
+            return map_batch(tweets, users, now, script_type)
+        finally:
+            self._pending -= 1
+            MAPPING_SECONDS.observe(time.perf_counter() - started, kind="pool")
+
+    def _fall_back(self):
+        self.workers = 0
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+            self._semaphore = None
+
+
+map_pool = MapPool()
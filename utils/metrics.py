@@ -0,0 +1,366 @@
+"""
+In-process metrics registry
+Counters, gauges and histograms for the scrape pipeline, exposed in the
+Prometheus text format on METRICS_PORT and/or logged as a periodic summary
+with per-second rates, so the bottleneck under load can be read off directly
+"""
+
+import asyncio
+import bisect
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# Serve /metrics on this port, 0 disables the endpoint
+METRICS_PORT = int(os.getenv('METRICS_PORT', '0'))
+# Log a metrics summary every this many seconds, 0 logs it only on shutdown
+METRICS_DUMP_INTERVAL = float(os.getenv('METRICS_DUMP_INTERVAL', '0'))
+
+# Latency buckets in seconds, from a cached lookup to a rate limit wait
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape_label(value)}"' for name, value in labels) + "}"
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """A named family of values, one per combination of label values"""
+
+    type = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}  # label values tuple -> value
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _labels(self, key, *extra):
+        return tuple(zip(self.labelnames, key)) + extra
+
+    def samples(self):
+        """(sample name, labels, value) triples for the text format"""
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in sorted(items):
+            yield self.name, self._labels(key), value
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """
+    A value that goes up and down
+    set_function() makes the gauge read its value(s) when collected: the
+    function returns a number, or a dict of label values tuple -> number
+    """
+
+    type = "gauge"
+
+    def __init__(self, name, help_text, labelnames=()):
+        super().__init__(name, help_text, labelnames)
+        self._function = None
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def set_function(self, function):
+        self._function = function
+
+    def samples(self):
+        if self._function is None:
+            yield from super().samples()
+            return
+        try:
+            values = self._function()
+        except Exception as e:
+            logger.debug(f"Gauge {self.name} could not be read: {e}")
+            return
+        if not isinstance(values, dict):
+            values = {(): values}
+        for key, value in sorted(values.items()):
+            yield self.name, self._labels(tuple(map(str, key))), value
+
+
+class Histogram(Metric):
+    """Cumulative bucket counts, sum and count per label combination"""
+
+    type = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][bisect.bisect_left(self.buckets, value)] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the with block, also when it raises"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def snapshot(self):
+        """label values tuple -> (bucket counts, sum, count), bucket counts not cumulative"""
+        with self._lock:
+            return {key: (list(counts), total, count) for key, (counts, total, count) in self._values.items()}
+
+    def samples(self):
+        for key, (counts, total, count) in sorted(self.snapshot().items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                yield f"{self.name}_bucket", self._labels(key, ("le", _format_value(bound))), cumulative
+            yield f"{self.name}_sum", self._labels(key), total
+            yield f"{self.name}_count", self._labels(key), count
+
+    def quantile(self, q, counts):
+        """Estimate a quantile from bucket counts, interpolating inside the bucket"""
+        total = sum(counts)
+        if not total:
+            return 0.0
+        rank = q * total
+        cumulative = 0
+        lower = 0.0
+        for bound, bucket_count in zip(self.buckets + (self.buckets[-1],), counts):
+            if bucket_count and cumulative + bucket_count >= rank:
+                return lower + (bound - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+            lower = bound
+        return self.buckets[-1]
+
+
+class MetricsRegistry:
+    """Metric families by name, registering the same name twice returns the first one"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self._last_counters = {}
+        self._last_dump_at = time.monotonic()
+
+    def _register(self, cls, name, help_text, labelnames, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help_text, labelnames, **kwargs)
+            return metric
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._register(Counter, name, help_text, labelnames)
+
+    def gauge(self, name, help_text, labelnames=()):
+        return self._register(Gauge, name, help_text, labelnames)
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram, name, help_text, labelnames, buckets=buckets)
+
+    def render(self):
+        """Every metric in the Prometheus text exposition format"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        """
+        One line per metric with data: counters with their rate since the
+        previous summary, gauges as is, histograms as count, mean, p50 and p95
+        """
+        now = time.monotonic()
+        elapsed = max(now - self._last_dump_at, 1e-9)
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            parts = []
+            if isinstance(metric, Histogram):
+                for key, (counts, total, count) in sorted(metric.snapshot().items()):
+                    parts.append(
+                        f"{_format_labels(metric._labels(key)) or 'all'} n={count} "
+                        f"mean={total / count:.3f}s p50={metric.quantile(0.5, counts):.3f}s "
+                        f"p95={metric.quantile(0.95, counts):.3f}s"
+                    )
+            else:
+                for name, labels, value in metric.samples():
+                    label = _format_labels(labels) or 'all'
+                    if isinstance(metric, Counter):
+                        previous = self._last_counters.get((name, labels), 0)
+                        self._last_counters[(name, labels)] = value
+                        parts.append(f"{label} {value:g} ({(value - previous) / elapsed:.1f}/s)")
+                    else:
+                        parts.append(f"{label} {value:g}")
+            if parts:
+                lines.append(f"{metric.name}: " + ", ".join(parts))
+        self._last_dump_at = now
+        return lines
+
+    def dump(self):
+        """Log the summary"""
+        lines = self.summary()
+        if lines:
+            logger.info("📊 Metrics\n  " + "\n  ".join(lines))
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = None
+
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = self.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(f"Metrics request from {self.client_address[0]}: {format % args}")
+
+
+class MetricsReporter:
+    """
+    Serves /metrics and logs the summary every dump_interval seconds while
+    the context is open, and logs a final summary on exit
+    """
+
+    def __init__(self, registry=None, port=METRICS_PORT, dump_interval=METRICS_DUMP_INTERVAL):
+        self.registry = registry or metrics
+        self.port = port
+        self.dump_interval = dump_interval
+        self._server = None
+        self._task = None
+
+    def start_server(self):
+        handler = type("MetricsHandler", (_MetricsHandler,), {"registry": self.registry})
+        try:
+            self._server = ThreadingHTTPServer(("", self.port), handler)
+        except OSError as e:
+            logger.error(f"❌ Could not serve metrics on port {self.port}: {e}")
+            return
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="metrics-server", daemon=True).start()
+        logger.info(f"✅ Serving metrics on :{self.port}/metrics")
+
+    async def _dump_loop(self):
+        while True:
+            await asyncio.sleep(self.dump_interval)
+            self.registry.dump()
+
+    async def __aenter__(self):
+        if self.port:
+            self.start_server()
+        if self.dump_interval > 0:
+            self._task = asyncio.create_task(self._dump_loop())
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+        self.registry.dump()
+
+
+metrics = MetricsRegistry()
+
+# Scrape pipeline metrics, shared by every entry point
+API_REQUEST_SECONDS = metrics.histogram(
+    "scraper_api_request_seconds", "Time spent waiting for a Twitter API page", ("endpoint",))
+API_REQUESTS = metrics.counter(
+    "scraper_api_requests_total", "Twitter API requests by outcome", ("endpoint", "outcome"))
+RATE_LIMIT_WAIT_SECONDS = metrics.histogram(
+    "scraper_rate_limit_wait_seconds", "Time spent waiting for quota in the rate limit scheduler", ("endpoint",))
+TWEETS_SCRAPED = metrics.counter(
+    "scraper_tweets_total", "Tweets received from search results")
+MAPPING_SECONDS = metrics.histogram(
+    "scraper_mapping_seconds", "Time spent mapping one batch into rows", ("kind",))
+DB_BATCH_SECONDS = metrics.histogram(
+    "scraper_db_batch_seconds", "MySQL write latency per statement batch", ("kind", "method"))
+SPOOL_APPEND_SECONDS = metrics.histogram(
+    "scraper_spool_append_seconds", "Local spool append latency per batch", ("kind",))
+ROWS = metrics.counter(
+    "scraper_rows_total", "Mapped rows by outcome: written, skipped unchanged or failed", ("kind", "outcome"))
+WRITER_PENDING = metrics.gauge(
+    "scraper_db_writer_pending", "Batches queued for the database writer thread")
+SPOOL_BACKLOG = metrics.gauge(
+    "scraper_spool_backlog_rows", "Rows in the local spool waiting to be drained")
+DB_POOL = metrics.gauge(
+    "scraper_db_pool_connections", "MySQL connection pool connections by state", ("state",))
+ACCOUNT_POOL = metrics.gauge(
+    "scraper_accounts", "Scheduler accounts per endpoint by state (throttled: shares held back after a 429)", ("endpoint", "state"))
+ACCOUNT_STATUS_CHANGES = metrics.counter(
+    "scraper_account_status_changes_total", "Scraper account status changes written to the database", ("status",))
+SPOOL_DRAIN_SECONDS = metrics.histogram(
+    "scraper_spool_drain_seconds", "Time to replay one spooled batch into MySQL, commit included")
+LEASED_ACCOUNTS = metrics.gauge(
+    "scraper_leased_accounts", "Scraper accounts currently leased by this process")
+THREAD_TWEETS = metrics.counter(
+    "scraper_thread_tweets_total", "Conversation expansion tweets: fetched, quoted (embedded) or already stored",
+    ("outcome",))
+MAP_POOL_PENDING = metrics.gauge(
+    "scraper_map_pool_pending", "Batches waiting for or being mapped in the mapping process pool")
+WINDOW_SEARCHES = metrics.counter(
+    "scraper_window_searches_total", "Window searches: complete, split (hit the limit), truncated at the minimum "
+    "width or skipped over budget", ("outcome",))
+PROFILES_REFRESHED = metrics.counter(
+    "scraper_profiles_refreshed_total", "Profile refresh results: refreshed, deactivated (not returned) or failed",
+    ("outcome",))
+
+
+def observe_api_request(endpoint, seconds, outcome="ok"):
+    """Record one Twitter API request; twscrape picks the account, so requests are not labelled by one"""
+    API_REQUEST_SECONDS.observe(seconds, endpoint=endpoint)
+    API_REQUESTS.inc(endpoint=endpoint, outcome=outcome)
@@ -0,0 +1,219 @@
+"""
+Columnar export sink
+Writes the same mapped tweet and profile rows that go to MySQL to
+compressed Parquet files, partitioned by date and handle, so analytics jobs
+scan only the columns they need instead of reading back from the primary
+Needs pyarrow (pip install pyarrow), the sink stays off without it
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from constants import ENHANCED_TWEETS_COLUMNS, TWITTER_PROFILES_COLUMNS
+
+try:
+    import pyarrow as pa  # pyright: ignore[reportMissingImports]
+    import pyarrow.parquet as pq  # pyright: ignore[reportMissingImports]
+except ImportError:
+    pa = pq = None
+
+logger = logging.getLogger(__name__)
+
+PARQUET_ENABLED = os.getenv('PARQUET_ENABLED', '0') == '1'
+PARQUET_PATH = os.getenv('PARQUET_PATH', 'parquet')
+PARQUET_COMPRESSION = os.getenv('PARQUET_COMPRESSION', 'zstd')
+# A partition's file is closed and a new one started past either limit
+PARQUET_ROLL_BYTES = int(os.getenv('PARQUET_ROLL_BYTES', str(128 * 2 ** 20)))
+PARQUET_ROLL_SECONDS = int(os.getenv('PARQUET_ROLL_SECONDS', '3600'))
+# Rows buffered per partition before they are written as one row group
+PARQUET_ROW_GROUP_ROWS = int(os.getenv('PARQUET_ROW_GROUP_ROWS', '10000'))
+# Open partition files, the least recently written is closed beyond this
+PARQUET_MAX_OPEN_FILES = int(os.getenv('PARQUET_MAX_OPEN_FILES', '256'))
+
+# Partition value for rows without a date or handle, as Hive names it
+NULL_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+
+INTEGER_COLUMNS = {
+    "retweet_count", "like_count", "reply_count", "quote_count", "view_count", "is_hidden", "impressions",
+    "is_mapped", "number_of_cashtags", "number_of_hashtags", "number_of_mentions", "number_of_contracts",
+    "number_of_links", "is_full_body", "is_reply", "is_quote",
+    "followers_count", "followings_count", "is_verified", "is_active", "ai_tag", "is_processed_by_ai",
+    "lifetime_tweets", "lifetime_views", "is_crypto_user", "smart_followers_count",
+}
+TIMESTAMP_COLUMNS = {
+    "tweet_create_time", "create_time", "update_time", "account_created_at", "inserted_at", "updated_at",
+}
+FLOAT_COLUMNS = {"confidence_score"}
+
+# Kind -> (columns, date column, handle column), kinds match the spool's
+PARQUET_TABLES = {
+    "enhanced_tweets": (ENHANCED_TWEETS_COLUMNS, "tweet_create_time", "author_handle"),
+    "twitter_profiles": (TWITTER_PROFILES_COLUMNS, "updated_at", "handle"),
+}
+
+
+def column_type(column):
+    if column in INTEGER_COLUMNS:
+        return pa.int64()
+    if column in TIMESTAMP_COLUMNS:
+        return pa.timestamp("us")
+    if column in FLOAT_COLUMNS:
+        return pa.float64()
+    return pa.string()
+
+
+def table_schema(columns):
+    return pa.schema([(column, column_type(column)) for column in columns])
+
+
+def partition_values(row, date_index, handle_index):
+    """(date, handle) partition of a row"""
+    date = row[date_index]
+    handle = row[handle_index]
+    return (
+        date.strftime("%Y-%m-%d") if isinstance(date, datetime) else NULL_PARTITION,
+        handle.lower() if handle else NULL_PARTITION,
+    )
+
+
+class PartitionFile:
+    """
+    One open Parquet file of a partition
+    Written under a dot-prefixed name, which Arrow and Spark readers skip,
+    and renamed into place once closed, so readers never see a file
+    without its footer
+    """
+
+    def __init__(self, directory, schema, compression):
+        os.makedirs(directory, exist_ok=True)
+        name = f"part-{time.strftime('%Y%m%d%H%M%S')}-{os.getpid()}-{time.monotonic_ns()}.parquet"
+        self.path = os.path.join(directory, name)
+        self.temp_path = os.path.join(directory, f".{name}.inprogress")
+        self.schema = schema
+        self.writer = pq.ParquetWriter(self.temp_path, schema, compression=compression)
+        self.opened_at = time.monotonic()
+        self.rows = []
+        self.written_rows = 0
+
+    def add(self, rows):
+        self.rows.extend(rows)
+
+    def flush(self):
+        """Write the buffered rows as one row group"""
+        if not self.rows:
+            return
+        columns = list(zip(*self.rows))
+        batch = pa.RecordBatch.from_arrays(
+            [pa.array(values, type=field.type) for values, field in zip(columns, self.schema)], schema=self.schema
+        )
+        self.writer.write_batch(batch)
+        self.written_rows += len(self.rows)
+        self.rows = []
+
+    def size(self):
+        return os.path.getsize(self.temp_path)
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+        os.replace(self.temp_path, self.path)
+
+
+class ParquetSink:
+    """
+    Appends mapped rows to one open file per (kind, date, handle) partition
+    under <path>/<kind>/date=YYYY-MM-DD/handle=<handle>/
+    Files roll over at roll_bytes or after roll_seconds. The sink is an
+    append log: re-scraped tweets are written again, readers keep the row
+    with the latest update_time per tweet_id
+    Thread-safe, rows arrive from the database writer thread
+    """
+
+    def __init__(self, path=PARQUET_PATH, enabled=PARQUET_ENABLED, compression=PARQUET_COMPRESSION,
+                 roll_bytes=PARQUET_ROLL_BYTES, roll_seconds=PARQUET_ROLL_SECONDS,
+                 row_group_rows=PARQUET_ROW_GROUP_ROWS, max_open_files=PARQUET_MAX_OPEN_FILES):
+        if enabled and pa is None:
+            logger.warning("⚠️ PARQUET_ENABLED is set but pyarrow is not installed, Parquet export is off")
+            enabled = False
+        self.path = path
+        self.enabled = enabled
+        self.compression = compression
+        self.roll_bytes = roll_bytes
+        self.roll_seconds = roll_seconds
+        self.row_group_rows = row_group_rows
+        self.max_open_files = max_open_files
+        self._files = OrderedDict()  # (kind, date, handle) -> PartitionFile
+        self._schemas = {}
+        self._lock = threading.Lock()
+        self.written_rows = 0
+        self.closed_files = 0
+
+    def _schema(self, kind):
+        if kind not in self._schemas:
+            self._schemas[kind] = table_schema(PARQUET_TABLES[kind][0])
+        return self._schemas[kind]
+
+    def _close_file(self, key):
+        partition_file = self._files.pop(key)
+        partition_file.close()
+        self.written_rows += partition_file.written_rows
+        self.closed_files += 1
+
+    def _file(self, kind, date, handle):
+        key = (kind, date, handle)
+        partition_file = self._files.get(key)
+        if partition_file is None:
+            while len(self._files) >= self.max_open_files:
+                self._close_file(next(iter(self._files)))
+            directory = os.path.join(self.path, kind, f"date={date}", f"handle={handle}")
+            partition_file = PartitionFile(directory, self._schema(kind), self.compression)
+            self._files[key] = partition_file
+        self._files.move_to_end(key)
+        return partition_file
+
+    def _roll_due(self):
+        """Close files that reached the size or age limit"""
+        now = time.monotonic()
+        for key, partition_file in list(self._files.items()):
+            if now - partition_file.opened_at >= self.roll_seconds or partition_file.size() >= self.roll_bytes:
+                self._close_file(key)
+
+    def write(self, kind, rows):
+        """Append column-ordered rows of a PARQUET_TABLES kind, errors are logged and never raised"""
+        if not self.enabled or not rows:
+            return
+        columns, date_column, handle_column = PARQUET_TABLES[kind]
+        date_index, handle_index = columns.index(date_column), columns.index(handle_column)
+        partitions = {}
+        for row in rows:
+            partitions.setdefault(partition_values(row, date_index, handle_index), []).append(row)
+
+        try:
+            with self._lock:
+                for (date, handle), partition_rows in partitions.items():
+                    partition_file = self._file(kind, date, handle)
+                    partition_file.add(partition_rows)
+                    if len(partition_file.rows) >= self.row_group_rows:
+                        partition_file.flush()
+                self._roll_due()
+        except Exception as e:
+            logger.error(f"❌ Error writing {len(rows)} {kind} rows to Parquet: {e}")
+
+    def close(self):
+        """Flush and close every open file"""
+        if not self.enabled:
+            return
+        with self._lock:
+            for key in list(self._files):
+                try:
+                    self._close_file(key)
+                except Exception as e:
+                    logger.error(f"❌ Error closing Parquet file for {'/'.join(key)}: {e}")
+                    self._files.pop(key, None)
+        logger.info(f"✅ Parquet sink wrote {self.written_rows} rows into {self.closed_files} files under {self.path}")
+
+
+parquet_sink = ParquetSink()
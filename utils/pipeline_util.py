@@ -0,0 +1,108 @@
+"""
+Streaming tweet pipeline utilities
+Buffers tweets as they arrive from the search generator and maps and
+flushes them to the database in micro-batches
+"""
+
+import asyncio
+import os
+import time
+from datetime import datetime
+from utils.twitter_util import insert_enhanced_tweets_to_db, insert_twitter_profiles_to_db
+from utils.row_builder import build_enhanced_tweet_rows, build_profile_rows
+from utils.profile_cache import profile_cache as default_profile_cache
+from utils.engagement_util import engagement_tracker as default_engagement_tracker
+from utils.metrics import MAPPING_SECONDS
+from utils.raw_archive import raw_archive
+from utils.map_pool import map_pool
+
+# A batch is flushed once it holds this many tweets or is this many seconds old
+SCRAPE_BATCH_SIZE = int(os.getenv('SCRAPE_BATCH_SIZE', '200'))
+SCRAPE_BATCH_MAX_AGE = float(os.getenv('SCRAPE_BATCH_MAX_AGE', '5'))
+
+
+async def write_batch(writer, insert_func, rows):
+    """Hand a batch to the async writer, or write it on a worker thread when there is none"""
+    if writer is not None:
+        await writer.submit(insert_func, rows)
+    else:
+        await asyncio.to_thread(insert_func, rows)
+
+
+class TweetBatcher:
+    """
+    Accumulates tweets and their authors for one scrape and maps them per
+    batch, so entity extraction runs once over all bodies of a batch
+    All rows of a batch share one create/update timestamp
+    Each author profile is mapped at most once per batcher, and only profiles
+    the profile cache reports as changed are written
+    Tweets go through the engagement tracker, which skips unchanged tweets
+    and sends counter-only changes through a narrow UPDATE
+    """
+
+    def __init__(self, writer=None, batch_size=SCRAPE_BATCH_SIZE, max_age=SCRAPE_BATCH_MAX_AGE,
+                 profile_cache=default_profile_cache, engagement_tracker=default_engagement_tracker):
+        self.writer = writer
+        self.profile_cache = profile_cache
+        self.engagement_tracker = engagement_tracker
+        self.batch_size = batch_size
+        self.max_age = max_age
+        self.tweets = []
+        self.users = []
+        self.seen_user_ids = set()
+        self.started_at = None
+        self.batch_time = None
+        self.total_tweets = 0
+
+    def add(self, tweet):
+        """Add a tweet (and its author, if new) to the current batch"""
+        if self.started_at is None:
+            self.started_at = time.monotonic()
+            self.batch_time = datetime.now()
+
+        self.tweets.append(tweet)
+        self.total_tweets += 1
+
+        user_id = tweet.user.id_str
+        if user_id not in self.seen_user_ids:
+            self.seen_user_ids.add(user_id)
+            self.users.append(tweet.user)
+
+    def is_due(self):
+        if not self.tweets:
+            return False
+        if len(self.tweets) >= self.batch_size:
+            return True
+        return time.monotonic() - self.started_at >= self.max_age
+
+    async def flush(self):
+        """Map and write the current batch, tweets before profiles, and start a new one"""
+        tweets, users, batch_time = self.tweets, self.users, self.batch_time
+        self.tweets, self.users = [], []
+        self.started_at = None
+
+        # The raw tweets, authors included, are archived before anything is dropped by mapping
+        if tweets and raw_archive.enabled:
+            await write_batch(self.writer, raw_archive.write_tweets, tweets)
+
+        tweets_data, profiles_data = [], []
+        if tweets and map_pool.enabled:
+            # Waits for a free pool slot, which holds this search back while the workers are saturated
+            tweets_data, profiles_data = await map_pool.map(tweets, users, batch_time)
+        elif tweets:
+            with MAPPING_SECONDS.time(kind="tweets"):
+                tweets_data = build_enhanced_tweet_rows(tweets, now=batch_time)
+            if users:
+                with MAPPING_SECONDS.time(kind="profiles"):
+                    profiles_data = build_profile_rows(users, now=batch_time)
+
+        if tweets_data and self.engagement_tracker is not None:
+            await write_batch(self.writer, self.engagement_tracker.write, tweets_data)
+        elif tweets_data:
+            await write_batch(self.writer, insert_enhanced_tweets_to_db, tweets_data)
+        if profiles_data and self.profile_cache is not None:
+            profiles_data = self.profile_cache.filter_changed(profiles_data)
+            if profiles_data:
+                await write_batch(self.writer, self.profile_cache.write, profiles_data)
+        elif profiles_data:
+            await write_batch(self.writer, insert_twitter_profiles_to_db, profiles_data)
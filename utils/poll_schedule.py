@@ -0,0 +1,152 @@
+"""
+Adaptive poll schedule for the scraper daemon
+Keeps every target handle in a priority queue ordered by its next due time
+and derives each handle's poll interval from its observed tweet rate, so
+busy handles are polled every few minutes and quiet ones about once a day
+"""
+
+import heapq
+import itertools
+import os
+import time
+
+# Poll interval bounds in seconds, the hot tier floor and the cold tier ceiling
+POLL_MIN_INTERVAL = float(os.getenv('POLL_MIN_INTERVAL', '300'))
+POLL_MAX_INTERVAL = float(os.getenv('POLL_MAX_INTERVAL', '86400'))
+# Interval for handles without any observations yet
+POLL_INITIAL_INTERVAL = float(os.getenv('POLL_INITIAL_INTERVAL', '3600'))
+# Intervals are chosen so a poll is expected to return about this many tweets
+POLL_TARGET_TWEETS = float(os.getenv('POLL_TARGET_TWEETS', '10'))
+# Handles polled at least this often are in the hot tier and win ties in the queue
+POLL_HOT_INTERVAL = float(os.getenv('POLL_HOT_INTERVAL', '1800'))
+# Seconds before a handle whose search failed is tried again
+POLL_RETRY_DELAY = float(os.getenv('POLL_RETRY_DELAY', '300'))
+
+TIER_HOT = "hot"
+TIER_COLD = "cold"
+
+
+class HandleSchedule:
+    """Poll state of one handle"""
+
+    def __init__(self, handle, interval, due_at):
+        self.handle = handle
+        self.interval = interval
+        self.due_at = due_at
+        self.rate = None  # tweets per second, exponentially weighted
+        self.last_polled_at = None
+
+    @property
+    def tier(self):
+        return TIER_HOT if self.interval <= POLL_HOT_INTERVAL else TIER_COLD
+
+
+class PollSchedule:
+    """
+    Priority queue of handles by next due time
+    Heap entries are (due_at, tier rank, sequence, lower-cased handle); entries
+    left behind by a reschedule or removal are skipped when popped
+    """
+
+    def __init__(self, min_interval=POLL_MIN_INTERVAL, max_interval=POLL_MAX_INTERVAL,
+                 initial_interval=POLL_INITIAL_INTERVAL, target_tweets=POLL_TARGET_TWEETS,
+                 retry_delay=POLL_RETRY_DELAY, smoothing=0.3, clock=time.time):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.initial_interval = initial_interval
+        self.target_tweets = target_tweets
+        self.retry_delay = retry_delay
+        self.smoothing = smoothing
+        self.clock = clock
+        self.handles = {}  # lower-cased handle -> HandleSchedule
+        self._heap = []
+        self._sequence = itertools.count()
+
+    def __len__(self):
+        return len(self.handles)
+
+    def _push(self, state):
+        rank = 0 if state.tier == TIER_HOT else 1
+        heapq.heappush(self._heap, (state.due_at, rank, next(self._sequence), state.handle.lower()))
+
+    def sync(self, handles):
+        """
+        Make the schedule cover exactly `handles`
+        New handles are due immediately, removed ones are dropped
+        """
+        now = self.clock()
+        wanted = {handle.lower(): handle for handle in handles}
+        for key in list(self.handles):
+            if key not in wanted:
+                del self.handles[key]
+        for key, handle in wanted.items():
+            if key not in self.handles:
+                state = HandleSchedule(handle, self.initial_interval, now)
+                self.handles[key] = state
+                self._push(state)
+
+    def _is_current(self, entry):
+        state = self.handles.get(entry[3])
+        return state is not None and state.due_at == entry[0]
+
+    def next_due_at(self):
+        """Due time of the earliest handle, None when the schedule is empty"""
+        while self._heap and not self._is_current(self._heap[0]):
+            heapq.heappop(self._heap)
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, limit=None):
+        """Remove and return the handles that are due, hot tier first among equal times"""
+        now = self.clock()
+        due = []
+        while self._heap and (limit is None or len(due) < limit):
+            entry = self._heap[0]
+            if not self._is_current(entry):
+                heapq.heappop(self._heap)
+                continue
+            if entry[0] > now:
+                break
+            heapq.heappop(self._heap)
+            due.append(self.handles[entry[3]].handle)
+        return due
+
+    def observe(self, handle, tweets, saturated=False):
+        """
+        Record a completed poll and schedule the next one
+        The interval targets POLL_TARGET_TWEETS tweets per poll; a poll that hit
+        the scrape limit halves the interval since the real rate is unknown
+        """
+        state = self.handles.get(handle.lower())
+        if state is None:
+            return
+        now = self.clock()
+        elapsed = now - state.last_polled_at if state.last_polled_at else state.interval
+        sample = tweets / max(elapsed, 1.0)
+        state.rate = sample if state.rate is None else (
+            self.smoothing * sample + (1 - self.smoothing) * state.rate
+        )
+        state.last_polled_at = now
+
+        if saturated:
+            interval = state.interval / 2
+        elif state.rate > 0:
+            interval = self.target_tweets / state.rate
+        else:
+            interval = state.interval * 2
+        state.interval = min(self.max_interval, max(self.min_interval, interval))
+        state.due_at = now + state.interval
+        self._push(state)
+
+    def retry(self, handle):
+        """Schedule a handle whose poll failed, keeping its interval"""
+        state = self.handles.get(handle.lower())
+        if state is None:
+            return
+        state.due_at = self.clock() + min(self.retry_delay, state.interval)
+        self._push(state)
+
+    def stats(self):
+        tiers = {TIER_HOT: 0, TIER_COLD: 0}
+        for state in self.handles.values():
+            tiers[state.tier] += 1
+        return {'handles': len(self.handles), **tiers, 'next_due_in': (self.next_due_at() or self.clock()) - self.clock()}
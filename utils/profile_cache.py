@@ -0,0 +1,140 @@
+"""
+Profile write cache
+Remembers a fingerprint of every profile written to twitter.twitter_profiles
+so unchanged profiles are not upserted again on every run
+"""
+
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import closing
+from utils.twitter_util import insert_twitter_profiles_to_db
+from utils.row_builder import PROFILE_COLUMN_INDEX, profile_values
+from utils.metrics import ROWS
+
+logger = logging.getLogger(__name__)
+
+PROFILE_CACHE_SIZE = int(os.getenv('PROFILE_CACHE_SIZE', '200000'))
+# Optional SQLite file that keeps the cache across runs
+PROFILE_CACHE_PATH = os.getenv('PROFILE_CACHE_PATH')
+# Unchanged profiles are still rewritten this often to refresh follower counts
+PROFILE_REFRESH_INTERVAL = int(os.getenv('PROFILE_REFRESH_INTERVAL', '86400'))
+
+# Counters that change constantly, only refreshed every PROFILE_REFRESH_INTERVAL
+VOLATILE_PROFILE_FIELDS = ("followers_count", "followings_count", "lifetime_tweets")
+# Set at mapping time, never meaningful for change detection
+TIMESTAMP_PROFILE_FIELDS = ("inserted_at", "updated_at")
+
+FINGERPRINT_INDEXES = tuple(
+    index for column, index in PROFILE_COLUMN_INDEX.items()
+    if column not in VOLATILE_PROFILE_FIELDS + TIMESTAMP_PROFILE_FIELDS
+)
+AUTHOR_ID_INDEX = PROFILE_COLUMN_INDEX["author_id"]
+
+
+def profile_fingerprint(profile_row):
+    """Hash of the mapped profile fields that matter for change detection"""
+    stable = tuple(profile_row[index] for index in FINGERPRINT_INDEXES)
+    return hashlib.blake2b(repr(stable).encode('utf-8'), digest_size=16).hexdigest()
+
+
+class ProfileCache:
+    """
+    LRU of author_id -> (fingerprint, written_at)
+    Thread-safe, since profiles are filtered on the event loop and marked as
+    written on the database writer thread
+    """
+
+    def __init__(self, max_size=PROFILE_CACHE_SIZE, path=PROFILE_CACHE_PATH,
+                 refresh_interval=PROFILE_REFRESH_INTERVAL):
+        self.max_size = max_size
+        self.path = path
+        self.refresh_interval = refresh_interval
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.skipped = 0
+        self.written = 0
+        if path:
+            self.load()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def filter_changed(self, profiles_data):
+        """
+        Return the profile rows that are new, changed or due for a follower count refresh
+        Accepts rows or column dictionaries
+        """
+        now = time.time()
+        changed = []
+        with self._lock:
+            for profile_row in map(profile_values, profiles_data):
+                entry = self._entries.get(profile_row[AUTHOR_ID_INDEX])
+                if (entry is None
+                        or entry[0] != profile_fingerprint(profile_row)
+                        or now - entry[1] >= self.refresh_interval):
+                    changed.append(profile_row)
+            self.skipped += len(profiles_data) - len(changed)
+        ROWS.inc(len(profiles_data) - len(changed), kind="twitter_profiles", outcome="skipped")
+        return changed
+
+    def mark_written(self, profiles_data):
+        now = time.time()
+        with self._lock:
+            for profile_row in map(profile_values, profiles_data):
+                author_id = profile_row[AUTHOR_ID_INDEX]
+                self._entries[author_id] = (profile_fingerprint(profile_row), now)
+                self._entries.move_to_end(author_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+            self.written += len(profiles_data)
+
+    def write(self, profiles_data):
+        """Upsert profiles and remember them once the write succeeded"""
+        if insert_twitter_profiles_to_db(profiles_data):
+            self.mark_written(profiles_data)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path)
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS profile_cache "
+            "(author_id TEXT PRIMARY KEY, fingerprint TEXT, written_at REAL)"
+        )
+        return conn
+
+    def load(self):
+        """Load the most recently written entries from the SQLite file"""
+        try:
+            with closing(self._connect()) as conn, conn:
+                rows = conn.execute(
+                    "SELECT author_id, fingerprint, written_at FROM profile_cache "
+                    "ORDER BY written_at DESC LIMIT ?", (self.max_size,)
+                ).fetchall()
+            with self._lock:
+                for author_id, fingerprint, written_at in reversed(rows):
+                    self._entries[author_id] = (fingerprint, written_at)
+            logger.info(f"✅ Loaded {len(rows)} cached profiles from {self.path}")
+        except Exception as e:
+            logger.error(f"❌ Error loading profile cache: {e}")
+
+    def save(self):
+        """Persist the cache to the SQLite file, if one is configured"""
+        if not self.path:
+            return
+        with self._lock:
+            rows = [(author_id, fingerprint, written_at)
+                    for author_id, (fingerprint, written_at) in self._entries.items()]
+        try:
+            with closing(self._connect()) as conn, conn:
+                conn.execute("DELETE FROM profile_cache")
+                conn.executemany("INSERT INTO profile_cache VALUES (?, ?, ?)", rows)
+            logger.info(f"✅ Saved {len(rows)} cached profiles to {self.path}")
+        except Exception as e:
+            logger.error(f"❌ Error saving profile cache: {e}")
+
+
+profile_cache = ProfileCache()
@@ -0,0 +1,296 @@
+"""
+Bulk profile refresh
+Re-fetches tracked profiles from twitter.twitter_profiles, stalest and most
+followed first, through batched id lookups spread over the account pool and
+writes them back with one bulk upsert per batch
+"""
+
+import asyncio
+import logging
+import math
+import os
+import time
+from datetime import datetime
+from db_configs import db
+from constants import GET_STALE_PROFILES_QUERY
+from utils.error_util import (
+    ERROR_FATAL,
+    ERROR_RATE_LIMIT,
+    RETRY_MAX_ATTEMPTS,
+    backoff_delay,
+    classify_error
+)
+from utils.metrics import PROFILES_REFRESHED, observe_api_request
+from utils.pipeline_util import write_batch
+from utils.profile_cache import profile_cache as default_profile_cache
+from utils.raw_archive import raw_archive
+from utils.row_builder import build_profile_rows
+from utils.spool_util import write_rows
+from utils.twitter_util import insert_twitter_profiles_to_db
+
+logger = logging.getLogger(__name__)
+
+# Lookup requests the refresh may spend per day, split evenly over its runs
+PROFILE_REFRESH_DAILY_REQUESTS = int(os.getenv('PROFILE_REFRESH_DAILY_REQUESTS', '1500'))
+PROFILE_REFRESH_RUNS_PER_DAY = int(os.getenv('PROFILE_REFRESH_RUNS_PER_DAY', '24'))
+# Profiles updated more recently than this are never refreshed
+PROFILE_REFRESH_MIN_AGE = int(os.getenv('PROFILE_REFRESH_MIN_AGE', '43200'))
+# Ids per users_by_ids request
+PROFILE_LOOKUP_BATCH = int(os.getenv('PROFILE_LOOKUP_BATCH', '100'))
+# Refreshed profiles per upsert, batches of BULK_LOAD_THRESHOLD rows or more are bulk loaded
+PROFILE_REFRESH_WRITE_BATCH = int(os.getenv('PROFILE_REFRESH_WRITE_BATCH', '1000'))
+# Share of a run's request budget kept back for confirming ids a batched lookup didn't return
+PROFILE_CONFIRM_SHARE = float(os.getenv('PROFILE_CONFIRM_SHARE', '0.1'))
+# Lookups in flight at the same time, per leased account
+PROFILE_REFRESH_CONCURRENCY = int(os.getenv('PROFILE_REFRESH_CONCURRENCY', '2'))
+
+PROFILE_REFRESH_SCRIPT_TYPE = "profile_refresh"
+
+
+def run_request_budget(daily_requests=PROFILE_REFRESH_DAILY_REQUESTS, runs_per_day=PROFILE_REFRESH_RUNS_PER_DAY):
+    """Lookup requests one run may spend"""
+    return max(1, daily_requests // max(1, runs_per_day))
+
+
+def get_stale_profile_ids(limit, min_age=PROFILE_REFRESH_MIN_AGE):
+    """author_ids of active profiles due for a refresh, most overdue first"""
+    try:
+        return [int(author_id) for author_id, in db.fetch_query(GET_STALE_PROFILES_QUERY, (min_age, limit))]
+    except Exception as e:
+        logger.error(f"❌ Error fetching stale profiles: {e}")
+        return []
+
+
+def deactivate_profiles(author_ids):
+    """Mark profiles a lookup confirmed as not found or suspended as inactive"""
+    now = datetime.now()
+    try:
+        write_rows("deactivated_profiles", [(now, str(author_id)) for author_id in author_ids])
+        logger.info(f"✅ Deactivated {len(author_ids)} profiles that no longer resolve")
+    except Exception as e:
+        logger.error(f"❌ Error deactivating profiles: {e}")
+
+
+def has_batched_lookup(api):
+    return hasattr(api, "users_by_ids")
+
+
+async def lookup_users(api, author_ids, scheduler=None):
+    """
+    Fetch users by id with one users_by_ids request, or with one user_by_id
+    request per id on twscrape versions without it
+    Returns the users found, missing ids are simply absent
+    """
+    if has_batched_lookup(api):
+        if scheduler is not None:
+            await scheduler.acquire("users_by_ids")
+        requested_at = time.perf_counter()
+        try:
+            users = api.users_by_ids(author_ids)
+            users = [user async for user in users] if hasattr(users, "__aiter__") else await users
+        except Exception:
+            observe_api_request("users_by_ids", time.perf_counter() - requested_at, "error")
+            raise
+        observe_api_request("users_by_ids", time.perf_counter() - requested_at)
+        return [user for user in users or () if user is not None]
+
+    users = []
+    for author_id in author_ids:
+        if scheduler is not None:
+            await scheduler.acquire("user_by_id")
+        requested_at = time.perf_counter()
+        try:
+            user = await api.user_by_id(author_id)
+        except Exception:
+            observe_api_request("user_by_id", time.perf_counter() - requested_at, "error")
+            raise
+        observe_api_request("user_by_id", time.perf_counter() - requested_at)
+        if user is not None:
+            users.append(user)
+    return users
+
+
+def unavailable_reason(response):
+    """
+    Why a UserByRestId reply holds no user: "not_found" or the UserUnavailable
+    reason ("suspended" and the like), None when it holds one, protected users included
+    """
+    result = ((response.json().get("data") or {}).get("user") or {}).get("result")
+    if not result:
+        return "not_found"
+    if result.get("__typename") == "UserUnavailable":
+        return str(result.get("reason") or "suspended").lower()
+    return None
+
+
+def parse_raw_user(response):
+    """twscrape User from a UserByRestId reply, None when it can't be parsed"""
+    try:
+        # Imported here so the refresher keeps working against stand-in APIs without twscrape
+        from twscrape.models import parse_user  # pyright: ignore[reportMissingImports]
+        return parse_user(response)
+    except Exception as e:
+        logger.debug(f"Could not parse user reply: {e}")
+        return None
+
+
+async def confirm_missing(api, author_id, scheduler=None):
+    """
+    Ask for one id a lookup didn't return, since lookups drop users on partial replies too
+    Returns (user, reason): the user if it is still there, the
+    unavailable_reason if it is gone, (None, None) without an answer
+    """
+    if not hasattr(api, "user_by_id_raw"):
+        return None, None
+    if scheduler is not None:
+        await scheduler.acquire("user_by_id")
+    requested_at = time.perf_counter()
+    try:
+        response = await api.user_by_id_raw(author_id)
+        reason = unavailable_reason(response) if response is not None else None
+    except Exception as e:
+        observe_api_request("user_by_id", time.perf_counter() - requested_at, "error")
+        logger.warning(f"❌ Error confirming profile {author_id} ({classify_error(e)}): {e}")
+        return None, None
+    observe_api_request("user_by_id", time.perf_counter() - requested_at)
+    if response is None or reason is not None:
+        return None, reason
+    return parse_raw_user(response), None
+
+
+class ProfileRefresher:
+    """
+    Looks up profile batches concurrently and writes the results in
+    PROFILE_REFRESH_WRITE_BATCH-row upserts through the writer
+    Ids a successful lookup doesn't return are looked up once more on their
+    own: users still there (protected ones too) are refreshed, and only ids
+    the reply reports as not found or suspended are deactivated. Ids without
+    an answer and ids whose lookup failed keep their updated_at and come up
+    again next run. Every request, retries and confirmations included,
+    counts against request_budget
+    """
+
+    def __init__(self, api, writer=None, scheduler=None, concurrency=PROFILE_REFRESH_CONCURRENCY,
+                 lookup_batch=PROFILE_LOOKUP_BATCH, write_batch_size=PROFILE_REFRESH_WRITE_BATCH,
+                 profile_cache=default_profile_cache, request_budget=None):
+        self.api = api
+        self.request_budget = request_budget
+        self.requests = 0
+        self.writer = writer
+        self.scheduler = scheduler
+        self.semaphore = asyncio.Semaphore(max(1, concurrency))
+        self.lookup_batch = lookup_batch if has_batched_lookup(api) else 1
+        self.write_batch_size = write_batch_size
+        self.profile_cache = profile_cache
+        self.users = []
+        self.refreshed = 0
+        self.deactivated = 0
+        self.failed = 0
+
+    def _spend(self):
+        """Count one request against the budget, False once it is spent"""
+        if self.request_budget is not None and self.requests >= self.request_budget:
+            return False
+        self.requests += 1
+        return True
+
+    async def _lookup(self, author_ids):
+        """
+        Look up one batch, retried like searches in scrape_targets: rate limits
+        throttle the pool and back off like transient errors, auth errors give up
+        """
+        endpoint = "users_by_ids" if self.lookup_batch > 1 else "user_by_id"
+        for attempt in range(RETRY_MAX_ATTEMPTS):
+            # One request per attempt, lookups without users_by_ids come one id at a time
+            if not self._spend():
+                return None
+            try:
+                return await lookup_users(self.api, author_ids, self.scheduler)
+            except Exception as e:
+                kind = classify_error(e)
+                logger.warning(f"❌ Error looking up {len(author_ids)} profiles ({kind}): {e}")
+                if kind == ERROR_FATAL:
+                    return None
+                if kind == ERROR_RATE_LIMIT and self.scheduler is not None:
+                    self.scheduler.throttle(endpoint)
+                await asyncio.sleep(backoff_delay(attempt))
+        return None
+
+    async def _flush(self, force=False):
+        while self.users and (force or len(self.users) >= self.write_batch_size):
+            users, self.users = self.users[:self.write_batch_size], self.users[self.write_batch_size:]
+            if raw_archive.enabled:
+                await write_batch(self.writer, raw_archive.write_users, users)
+            rows = build_profile_rows(users, script_type=PROFILE_REFRESH_SCRIPT_TYPE)
+            if self.profile_cache is not None:
+                await write_batch(self.writer, self.profile_cache.write, rows)
+            else:
+                await write_batch(self.writer, insert_twitter_profiles_to_db, rows)
+
+    async def _refresh_batch(self, author_ids):
+        async with self.semaphore:
+            users = await self._lookup(author_ids)
+        if users is None:
+            self.failed += len(author_ids)
+            PROFILES_REFRESHED.inc(len(author_ids), outcome="failed")
+            return
+
+        found = {int(user.id) for user in users}
+        missing = [author_id for author_id in author_ids if author_id not in found]
+        gone = []
+        if missing:
+            async with self.semaphore:
+                for author_id in missing:
+                    if not self._spend():
+                        break
+                    user, reason = await confirm_missing(self.api, author_id, self.scheduler)
+                    if user is not None:
+                        users.append(user)
+                    elif reason is not None:
+                        gone.append(author_id)
+        self.users.extend(users)
+        self.refreshed += len(users)
+        PROFILES_REFRESHED.inc(len(users), outcome="refreshed")
+        if missing:
+            unconfirmed = len(author_ids) - len(users) - len(gone)
+            if unconfirmed:
+                self.failed += unconfirmed
+                PROFILES_REFRESHED.inc(unconfirmed, outcome="failed")
+            if gone:
+                self.deactivated += len(gone)
+                PROFILES_REFRESHED.inc(len(gone), outcome="deactivated")
+                await write_batch(self.writer, deactivate_profiles, gone)
+        await self._flush()
+
+    async def refresh(self, author_ids):
+        """Refresh the given profiles, returns {"refreshed", "deactivated", "failed"}"""
+        batches = [author_ids[start:start + self.lookup_batch]
+                   for start in range(0, len(author_ids), self.lookup_batch)]
+        await asyncio.gather(*(self._refresh_batch(batch) for batch in batches))
+        await self._flush(force=True)
+        return {"refreshed": self.refreshed, "deactivated": self.deactivated, "failed": self.failed}
+
+
+async def refresh_stale_profiles(api, writer=None, scheduler=None, request_budget=None,
+                                 concurrency=PROFILE_REFRESH_CONCURRENCY):
+    """
+    Refresh as many overdue profiles as this run's share of the daily request budget covers
+    With users_by_ids every request covers PROFILE_LOOKUP_BATCH profiles, so
+    100k profiles a day take 1000 of the PROFILE_REFRESH_DAILY_REQUESTS
+    Returns the refresh counts
+    """
+    request_budget = request_budget or run_request_budget()
+    refresher = ProfileRefresher(api, writer=writer, scheduler=scheduler, concurrency=concurrency,
+                                 request_budget=request_budget)
+    # Leave part of the budget for confirming ids the lookups don't return
+    lookup_requests = max(1, request_budget - math.ceil(request_budget * PROFILE_CONFIRM_SHARE))
+    author_ids = await asyncio.to_thread(get_stale_profile_ids, lookup_requests * refresher.lookup_batch)
+    if not author_ids:
+        logger.info("✅ No profiles due for a refresh")
+        return {"refreshed": 0, "deactivated": 0, "failed": 0}
+
+    lookup = "users_by_ids" if refresher.lookup_batch > 1 else "user_by_id"
+    logger.info(f"✅ Refreshing {len(author_ids)} profiles with up to {request_budget} {lookup} requests")
+    counts = await refresher.refresh(author_ids)
+    logger.info(f"✅ Profile refresh done: {counts}")
+    return counts
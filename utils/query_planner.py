@@ -0,0 +1,166 @@
+"""
+Search query planner
+Packs many low-volume handles into one `from:a OR from:b` search so quota
+is spent per group instead of per handle, and gives high-volume handles
+their own queries
+"""
+
+import math
+import os
+
+SEARCH_QUERY_MAX_LENGTH = int(os.getenv('SEARCH_QUERY_MAX_LENGTH', '500'))
+QUERY_GROUP_MAX_HANDLES = int(os.getenv('QUERY_GROUP_MAX_HANDLES', '25'))
+# Handles averaging at least this many tweets per run are searched on their own
+QUERY_SOLO_MIN_TWEETS = float(os.getenv('QUERY_SOLO_MIN_TWEETS', '20'))
+# Expected tweets per run for handles without any observations yet
+QUERY_DEFAULT_HANDLE_TWEETS = float(os.getenv('QUERY_DEFAULT_HANDLE_TWEETS', '2'))
+# Characters kept free for the since/until or since_id operators and filters
+QUERY_SUFFIX_RESERVE = 60
+# Tweets returned per search page
+SEARCH_PAGE_SIZE = 20
+
+
+class QueryGroup:
+    """One search covering one or more handles"""
+
+    def __init__(self, handles, since_ids):
+        self.handles = list(handles)
+        self.keys = {handle.lower(): handle for handle in self.handles}
+        self.since_ids = dict(since_ids)  # lower-cased handle -> last stored tweet id
+        self.counts = {key: 0 for key in self.keys}
+        # Set by the last search: tweets fetched, the oldest one's date, and whether
+        # the limit cut the results off before the checkpoint or the window start
+        self.fetched = 0
+        self.oldest_time = None
+        self.saturated = False
+        # Checkpoint rows a saturated search held back until the gap below it is filled
+        self.pending_checkpoints = []
+
+    @property
+    def is_solo(self):
+        return len(self.handles) == 1
+
+    @property
+    def since_id(self):
+        """Oldest checkpoint in the group, None if any handle has no checkpoint"""
+        since_ids = [self.since_ids.get(key) for key in self.keys]
+        if not since_ids or any(since_id is None for since_id in since_ids):
+            return None
+        return min(since_ids)
+
+    @property
+    def oldest_checkpoint(self):
+        """Oldest checkpoint any handle in the group has, None if none has one"""
+        since_ids = [since_id for since_id in (self.since_ids.get(key) for key in self.keys) if since_id]
+        return min(since_ids) if since_ids else None
+
+    @property
+    def search_term(self):
+        """
+        Searches are restricted to their authors, solo handles included, so the
+        volume the planner observes is the handle's own tweets and not its mentions
+        """
+        if self.is_solo:
+            return f"from:{self.handles[0]}"
+        return "(" + " OR ".join(f"from:{handle}" for handle in self.handles) + ")"
+
+    def route(self, tweet):
+        """
+        Return the lower-cased handle a tweet belongs to, or None if it should be skipped
+        Tweets at or below that handle's own checkpoint are already stored
+        """
+        key = (tweet.user.username or "").lower()
+        if key not in self.keys:
+            return None
+
+        since_id = self.since_ids.get(key)
+        if since_id is not None and int(tweet.id) <= since_id:
+            return None
+
+        self.counts[key] += 1
+        return key
+
+
+class QueryPlanner:
+    """
+    Groups handles into searches and adapts group sizes from observed volume
+    Keeps an exponentially weighted tweets-per-run estimate per handle
+    """
+
+    def __init__(self, max_query_length=SEARCH_QUERY_MAX_LENGTH, max_group_handles=QUERY_GROUP_MAX_HANDLES,
+                 solo_min_tweets=QUERY_SOLO_MIN_TWEETS, default_handle_tweets=QUERY_DEFAULT_HANDLE_TWEETS,
+                 smoothing=0.3):
+        self.max_query_length = max_query_length
+        self.max_group_handles = max_group_handles
+        self.solo_min_tweets = solo_min_tweets
+        self.default_handle_tweets = default_handle_tweets
+        self.smoothing = smoothing
+        self.volumes = {}  # lower-cased handle -> expected tweets per run
+        self.search_requests = 0
+        self.handles_searched = 0
+
+    def expected_tweets(self, handle):
+        return self.volumes.get(handle.lower(), self.default_handle_tweets)
+
+    def plan(self, handles, checkpoints, limit):
+        """
+        Split handles into query groups
+        checkpoints maps lower-cased handle -> last stored tweet id (or None)
+        Each group's expected volume stays within `limit` tweets
+        """
+        solo = []
+        with_checkpoint = []
+        without_checkpoint = []
+        for handle in handles:
+            if self.expected_tweets(handle) >= self.solo_min_tweets:
+                solo.append(handle)
+            elif checkpoints.get(handle.lower()) is None:
+                without_checkpoint.append(handle)
+            else:
+                with_checkpoint.append(handle)
+
+        # Handles with close checkpoints share a group, so the group's since_id fetches little old data
+        with_checkpoint.sort(key=lambda handle: checkpoints[handle.lower()])
+
+        groups = [QueryGroup([handle], {handle.lower(): checkpoints.get(handle.lower())}) for handle in solo]
+        for bucket in (with_checkpoint, without_checkpoint):
+            for group_handles in self._pack(bucket, limit):
+                groups.append(QueryGroup(group_handles, {
+                    handle.lower(): checkpoints.get(handle.lower()) for handle in group_handles
+                }))
+        return groups
+
+    def _pack(self, handles, limit):
+        max_term_length = self.max_query_length - QUERY_SUFFIX_RESERVE
+        group, term_length, volume = [], 2, 0.0
+        for handle in handles:
+            handle_length = len(f"from:{handle}") + (4 if group else 0)  # " OR "
+            handle_volume = self.expected_tweets(handle)
+            if group and (
+                len(group) >= self.max_group_handles
+                or term_length + handle_length > max_term_length
+                or volume + handle_volume > limit
+            ):
+                yield group
+                group, term_length, volume = [], 2, 0.0
+                handle_length = len(f"from:{handle}")
+            group.append(handle)
+            term_length += handle_length
+            volume += handle_volume
+        if group:
+            yield group
+
+    def observe(self, group, total_tweets):
+        """Update per-handle volume estimates and request counters after a group's search"""
+        for key, count in group.counts.items():
+            previous = self.volumes.get(key)
+            self.volumes[key] = count if previous is None else (
+                self.smoothing * count + (1 - self.smoothing) * previous
+            )
+        self.search_requests += max(1, math.ceil(total_tweets / SEARCH_PAGE_SIZE))
+        self.handles_searched += len(group.handles)
+
+    def requests_per_1000_handles(self):
+        if not self.handles_searched:
+            return 0.0
+        return 1000 * self.search_requests / self.handles_searched
@@ -0,0 +1,156 @@
+"""
+Rate limit pacing for the scraper account pool
+twscrape picks the account for every request itself, so quota is tracked
+for the pool as a whole: each endpoint gets the combined per-account limit
+of the accounts in the pool per window, and requests wait for the next
+window once it is spent instead of running the pool into 429s
+"""
+
+import asyncio
+import logging
+import os
+import time
+from utils.metrics import ACCOUNT_POOL, RATE_LIMIT_WAIT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_WINDOW = int(os.getenv('RATE_LIMIT_WINDOW', '900'))
+
+# Requests per account per window for each endpoint we call
+ENDPOINT_LIMITS = {
+    "search": int(os.getenv('RATE_LIMIT_SEARCH', '50')),
+    "user_by_login": int(os.getenv('RATE_LIMIT_USER_BY_LOGIN', '95')),
+    "tweet_details": int(os.getenv('RATE_LIMIT_TWEET_DETAILS', '150')),
+    "users_by_ids": int(os.getenv('RATE_LIMIT_USERS_BY_IDS', '500')),
+    "user_by_id": int(os.getenv('RATE_LIMIT_USER_BY_ID', '500')),
+}
+
+
+class PoolQuota:
+    """Requests the pool spent on one endpoint in the current window"""
+
+    def __init__(self, limit, window):
+        self.limit = limit  # per account
+        self.window = window
+        self.used = 0
+        self.throttled = 0  # account shares held back after a 429
+        self.reset_at = None
+
+    def refresh(self, now):
+        if self.reset_at is not None and now >= self.reset_at:
+            self.used = 0
+            self.throttled = 0
+            self.reset_at = None
+
+    def remaining(self, accounts):
+        return max(0, accounts - self.throttled) * self.limit - self.used
+
+    def start_window(self, now):
+        if self.reset_at is None:
+            self.reset_at = now + self.window
+
+    def consume(self, cost, now):
+        self.start_window(now)
+        self.used += cost
+
+
+class RateLimitScheduler:
+    """
+    Pool-wide request pacer
+    acquire() waits until the pool has quota left on an endpoint; it never
+    names an account, because twscrape decides which one serves the request
+    """
+
+    def __init__(self, usernames=(), limits=None, window=RATE_LIMIT_WINDOW):
+        self.limits = dict(limits or ENDPOINT_LIMITS)
+        self.window = window
+        self.usernames = set()
+        self.quotas = {endpoint: PoolQuota(limit, window) for endpoint, limit in self.limits.items()}
+        self._lock = asyncio.Lock()
+        for username in usernames:
+            self.add_account(username)
+        ACCOUNT_POOL.set_function(self.pool_states)
+
+    def add_account(self, username):
+        self.usernames.add(username)
+
+    def remove_account(self, username):
+        self.usernames.discard(username)
+
+    def _quota(self, endpoint, now):
+        quota = self.quotas[endpoint]
+        quota.refresh(now)
+        return quota
+
+    async def acquire(self, endpoint, cost=1):
+        """
+        Reserve `cost` requests of the pool's quota on `endpoint`
+        Waits for the window to reset when the quota is spent
+        """
+        with RATE_LIMIT_WAIT_SECONDS.time(endpoint=endpoint):
+            await self._acquire(endpoint, cost)
+
+    async def _acquire(self, endpoint, cost):
+        while True:
+            async with self._lock:
+                if not self.usernames:
+                    raise RuntimeError("No accounts in rate limit scheduler")
+                now = time.time()
+                quota = self._quota(endpoint, now)
+                if quota.remaining(len(self.usernames)) >= cost:
+                    quota.consume(cost, now)
+                    return
+                available_at = quota.reset_at or now + self.window
+
+            delay = max(1.0, available_at - now)
+            logger.warning(f"⏳ Pool quota for {endpoint} is spent, waiting {delay:.0f} seconds...")
+            await asyncio.sleep(delay)
+
+    def throttle(self, endpoint):
+        """
+        A 429 got through twscrape's own account rotation: hold back one
+        account's share of the endpoint until the window resets
+        """
+        now = time.time()
+        quota = self._quota(endpoint, now)
+        quota.start_window(now)
+        quota.throttled = min(len(self.usernames), quota.throttled + 1)
+        logger.info(f"⏳ Throttled {endpoint} to {len(self.usernames) - quota.throttled} accounts' quota "
+                    f"until {time.ctime(quota.reset_at)}")
+
+    def capacity(self, endpoint, horizon=0):
+        """
+        Predicted number of requests the pool can serve on `endpoint` within
+        `horizon` seconds: remaining quota now plus every window that resets in time
+        """
+        now = time.time()
+        quota = self._quota(endpoint, now)
+        accounts = len(self.usernames)
+        total = quota.remaining(accounts)
+        refill_at = quota.reset_at or now + self.window
+        while refill_at <= now + horizon:
+            total += accounts * quota.limit
+            refill_at += self.window
+        return total
+
+    def stats(self):
+        """Return headroom per endpoint: accounts, throttled account shares and remaining requests"""
+        now = time.time()
+        accounts = len(self.usernames)
+        stats = {}
+        for endpoint in self.limits:
+            quota = self._quota(endpoint, now)
+            stats[endpoint] = {
+                "accounts": accounts,
+                "throttled": quota.throttled,
+                "remaining": quota.remaining(accounts),
+            }
+        return stats
+
+    def pool_states(self):
+        """(endpoint, state) -> number of accounts, for the account pool gauge"""
+        states = {}
+        for endpoint, stats in self.stats().items():
+            states[(endpoint, "active")] = stats["accounts"] - stats["throttled"]
+            states[(endpoint, "throttled")] = stats["throttled"]
+        return states
@@ -0,0 +1,206 @@
+"""
+Raw response archive
+Keeps every scraped tweet.dict() and user.dict() as zstd-compressed JSON
+lines with a tweet id index, so mapping changes are backfilled from disk by
+replay_archive.py instead of spending API quota on a re-scrape
+Needs zstandard (pip install zstandard), the archive stays off without it
+"""
+
+import io
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from datetime import datetime
+from types import SimpleNamespace
+
+try:
+    import zstandard  # pyright: ignore[reportMissingImports]
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+RAW_ARCHIVE_ENABLED = os.getenv('RAW_ARCHIVE_ENABLED', '0') == '1'
+RAW_ARCHIVE_PATH = os.getenv('RAW_ARCHIVE_PATH', 'archive')
+RAW_ARCHIVE_LEVEL = int(os.getenv('RAW_ARCHIVE_LEVEL', '3'))
+# A segment is closed and a new one started past either limit
+RAW_ARCHIVE_SEGMENT_BYTES = int(os.getenv('RAW_ARCHIVE_SEGMENT_BYTES', str(256 * 2 ** 20)))
+RAW_ARCHIVE_SEGMENT_SECONDS = int(os.getenv('RAW_ARCHIVE_SEGMENT_SECONDS', '3600'))
+
+SEGMENT_PATTERN = re.compile(r'^segment-(\d{14})-\d+-\d+\.jsonl\.zst$')
+INDEX_NAME = "index.db"
+# Fields twscrape models hold as datetimes, stored as their str()
+DATETIME_FIELDS = {"date", "created"}
+
+
+def archive_record(kind, obj, captured_at):
+    return {"kind": kind, "id": obj.id, "captured_at": captured_at, "data": obj.dict()}
+
+
+def restore(value, key=None):
+    """Turn an archived dict back into an object the mappers accept, attribute access and datetimes included"""
+    if isinstance(value, dict):
+        return SimpleNamespace(**{field: restore(item, field) for field, item in value.items()})
+    if isinstance(value, list):
+        return [restore(item) for item in value]
+    if key in DATETIME_FIELDS and isinstance(value, str):
+        return datetime.fromisoformat(value)
+    return value
+
+
+def list_segments(path=RAW_ARCHIVE_PATH, since=None, until=None):
+    """
+    Closed segments under path, oldest first
+    since/until (YYYYMMDD strings) filter by the time a segment was opened
+    """
+    if not os.path.isdir(path):
+        return []
+    segments = []
+    for name in sorted(os.listdir(path)):
+        match = SEGMENT_PATTERN.match(name)
+        if not match:
+            continue
+        day = match.group(1)[:8]
+        if (since and day < since) or (until and day > until):
+            continue
+        segments.append(os.path.join(path, name))
+    return segments
+
+
+def read_segment(segment_path):
+    """Yield the records of a segment, frame after frame"""
+    with open(segment_path, 'rb') as segment:
+        reader = zstandard.ZstdDecompressor().stream_reader(segment, read_across_frames=True)
+        for line in io.TextIOWrapper(reader, encoding='utf-8'):
+            if line.strip():
+                yield json.loads(line)
+
+
+class RawArchive:
+    """
+    Appends JSON lines to the current segment, one zstd frame per batch
+    Segments are written under a dot-prefixed name and renamed once closed,
+    so replays only ever see complete segments. The SQLite index maps each
+    tweet id to the frame of its latest capture, so single tweets are read
+    back without decompressing a whole segment
+    Thread-safe, batches arrive from the database writer thread
+    """
+
+    def __init__(self, path=RAW_ARCHIVE_PATH, enabled=RAW_ARCHIVE_ENABLED, level=RAW_ARCHIVE_LEVEL,
+                 segment_bytes=RAW_ARCHIVE_SEGMENT_BYTES, segment_seconds=RAW_ARCHIVE_SEGMENT_SECONDS):
+        if enabled and zstandard is None:
+            logger.warning("⚠️ RAW_ARCHIVE_ENABLED is set but zstandard is not installed, raw archive is off")
+            enabled = False
+        self.path = path
+        self.enabled = enabled
+        self.level = level
+        self.segment_bytes = segment_bytes
+        self.segment_seconds = segment_seconds
+        self._lock = threading.Lock()
+        self._compressor = None
+        self._index = None
+        self._segment = None
+        self._segment_name = None
+        self._opened_at = None
+        self.records = 0
+        self.segments = 0
+
+    def _connect_index(self):
+        conn = sqlite3.connect(os.path.join(self.path, INDEX_NAME), check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS tweet_index "
+            "(tweet_id INTEGER PRIMARY KEY, segment TEXT, frame_offset INTEGER, frame_length INTEGER)"
+        )
+        return conn
+
+    def _open_segment(self):
+        os.makedirs(self.path, exist_ok=True)
+        if self._index is None:
+            self._index = self._connect_index()
+            self._compressor = zstandard.ZstdCompressor(level=self.level)
+        self._segment_name = f"segment-{time.strftime('%Y%m%d%H%M%S')}-{os.getpid()}-{time.monotonic_ns()}.jsonl.zst"
+        self._segment = open(os.path.join(self.path, f".{self._segment_name}.inprogress"), 'ab')
+        self._opened_at = time.monotonic()
+
+    def _close_segment(self):
+        self._segment.close()
+        os.replace(os.path.join(self.path, f".{self._segment_name}.inprogress"),
+                   os.path.join(self.path, self._segment_name))
+        self._segment = None
+        self.segments += 1
+
+    def write(self, kind, objects):
+        """Archive twscrape objects of one kind ("tweet" or "user"), errors are logged and never raised"""
+        if not self.enabled or not objects:
+            return
+        captured_at = datetime.now().isoformat(timespec='seconds')
+        try:
+            records = [archive_record(kind, obj, captured_at) for obj in objects]
+            lines = "".join(json.dumps(record, default=str, ensure_ascii=False) + "\n" for record in records)
+            with self._lock:
+                if self._segment is None:
+                    self._open_segment()
+                frame = self._compressor.compress(lines.encode('utf-8'))
+                offset = self._segment.tell()
+                self._segment.write(frame)
+                self._segment.flush()
+                if kind == "tweet":
+                    with self._index:
+                        self._index.executemany(
+                            "INSERT OR REPLACE INTO tweet_index VALUES (?, ?, ?, ?)",
+                            [(int(record["id"]), self._segment_name, offset, len(frame)) for record in records]
+                        )
+                self.records += len(records)
+                if (offset + len(frame) >= self.segment_bytes
+                        or time.monotonic() - self._opened_at >= self.segment_seconds):
+                    self._close_segment()
+        except Exception as e:
+            logger.error(f"❌ Error archiving {len(objects)} raw {kind}s: {e}")
+
+    def write_tweets(self, tweets):
+        self.write("tweet", tweets)
+
+    def write_users(self, users):
+        self.write("user", users)
+
+    def get(self, tweet_id):
+        """Latest archived record of a tweet, None if it was never archived"""
+        with closing(self._connect_index()) as index:
+            entry = index.execute(
+                "SELECT segment, frame_offset, frame_length FROM tweet_index WHERE tweet_id = ?", (int(tweet_id),)
+            ).fetchone()
+        if entry is None:
+            return None
+        segment, offset, length = entry
+        segment_path = os.path.join(self.path, segment)
+        if not os.path.exists(segment_path):
+            segment_path = os.path.join(self.path, f".{segment}.inprogress")
+        with open(segment_path, 'rb') as segment_file:
+            segment_file.seek(offset)
+            frame = zstandard.ZstdDecompressor().decompressobj().decompress(segment_file.read(length))
+        for line in frame.decode('utf-8').splitlines():
+            record = json.loads(line)
+            if record["kind"] == "tweet" and int(record["id"]) == int(tweet_id):
+                return record
+        return None
+
+    def close(self):
+        """Close the current segment so it can be replayed"""
+        if not self.enabled:
+            return
+        with self._lock:
+            if self._segment is not None:
+                self._close_segment()
+            if self._index is not None:
+                self._index.close()
+                self._index = None
+        logger.info(f"✅ Raw archive wrote {self.records} records into {self.segments} segments under {self.path}")
+
+
+raw_archive = RawArchive()
@@ -0,0 +1,195 @@
+"""
+Row builders for twitter.enhanced_tweets and twitter.twitter_profiles
+Maps twscrape Tweet and User objects straight to tuples in the column order
+of the insert queries, with one timestamp per batch
+"""
+
+import logging
+from datetime import datetime
+from constants import ENHANCED_TWEETS_COLUMNS, TWITTER_PROFILES_COLUMNS
+from utils.entity_util import classify_crypto_batch, extract_tweet_entities_batch
+
+logger = logging.getLogger(__name__)
+
+# Column name -> position in a mapped row
+TWEET_COLUMN_INDEX = {column: index for index, column in enumerate(ENHANCED_TWEETS_COLUMNS)}
+PROFILE_COLUMN_INDEX = {column: index for index, column in enumerate(TWITTER_PROFILES_COLUMNS)}
+
+
+def extract_photo_urls(media):
+    """Extract photo URLs from tweet media"""
+    if not media:
+        return None
+
+    photo_urls = []
+
+    # Handle different media object structures
+    try:
+        # Check if media has photos attribute (like in your sample data)
+        if hasattr(media, 'photos') and media.photos:
+            for photo in media.photos:
+                if hasattr(photo, 'url'):
+                    photo_urls.append(photo.url)
+
+        # Check if media is a list/iterable
+        elif hasattr(media, '__iter__') and not isinstance(media, str):
+            for item in media:
+                if hasattr(item, 'type') and item.type == 'photo':
+                    if hasattr(item, 'url'):
+                        photo_urls.append(item.url)
+
+        # Check if media has url attribute directly
+        elif hasattr(media, 'url'):
+            photo_urls.append(media.url)
+
+    except Exception as e:
+        logger.warning(f"Error extracting photo URLs: {e}")
+        return None
+
+    return ','.join(photo_urls) if photo_urls else None
+
+
+def tweet_body(tweet):
+    """Stored body of a tweet, retweets store the original tweet's text"""
+    retweeted = tweet.retweetedTweet
+    return retweeted.rawContent if retweeted else tweet.rawContent
+
+
+def build_enhanced_tweet_row(tweet, now, script_type="test_scraper", entities=None):
+    """
+    Map a tweet to a tuple in ENHANCED_TWEETS_COLUMNS order
+    entities is the tweet's (number_of_contracts, main_cashtag), extracted
+    here when not precomputed for the whole batch
+    """
+    user = tweet.user
+    retweeted = tweet.retweetedTweet
+    quoted = tweet.quotedTweet
+    reply_to = tweet.inReplyToTweetId
+
+    # Retweets store the original tweet's body and author handle
+    if retweeted:
+        body = retweeted.rawContent
+        author_handle = retweeted.user.username
+        tweet_category = "retweet"
+    else:
+        body = tweet.rawContent
+        author_handle = user.username
+        tweet_category = "quote" if quoted else "reply" if reply_to else "original"
+
+    cashtags = tweet.cashtags
+    first_cashtag = cashtags[0] if cashtags else None
+    view_count = tweet.viewCount
+    number_of_contracts, main_cashtag = entities or extract_tweet_entities_batch([body], [cashtags])[0]
+
+    return (
+        tweet.id_str,                                 # tweet_id
+        user.id_str,                                  # author_id
+        body,                                         # body
+        author_handle,                                # author_handle
+        tweet.date,                                   # tweet_create_time
+        now,                                          # create_time
+        tweet.retweetCount,                           # retweet_count
+        tweet.likeCount,                              # like_count
+        tweet.replyCount,                             # reply_count
+        tweet.quoteCount,                             # quote_count
+        view_count,                                   # view_count
+        now,                                          # update_time
+        user.profileImageUrl,                         # profile_image_url
+        0,                                            # is_hidden
+        view_count,                                   # impressions
+        None,                                         # matching_values
+        0,                                            # is_mapped
+        None,                                         # sentiment
+        tweet.source,                                 # source
+        script_type,                                  # scraped_by
+        len(cashtags) if cashtags else 0,             # number_of_cashtags
+        tweet_category,                               # tweet_category
+        first_cashtag,                                # first_cashtag
+        main_cashtag,                                 # main_cashtag
+        len(tweet.hashtags) if tweet.hashtags else 0,  # number_of_hashtags
+        len(tweet.mentionedUsers) if tweet.mentionedUsers else 0,  # number_of_mentions
+        number_of_contracts,                          # number_of_contracts
+        len(tweet.links) if tweet.links else 0,       # number_of_links
+        1 if len(body) < 280 else 0,                  # is_full_body
+        None,                                         # sentiment_new
+        1 if reply_to else 0,                         # is_reply
+        str(reply_to) if reply_to else None,          # reply_to
+        1 if quoted else 0,                           # is_quote
+        quoted.id_str if quoted else None,            # quoted_to
+        extract_photo_urls(tweet.media),              # images
+    )
+
+
+def build_enhanced_tweet_rows(tweets, script_type="test_scraper", now=None):
+    """Map a batch of tweets to rows sharing one timestamp and one entity extraction pass"""
+    now = now or datetime.now()
+    entities = extract_tweet_entities_batch([tweet_body(tweet) for tweet in tweets],
+                                            [tweet.cashtags for tweet in tweets])
+    return [build_enhanced_tweet_row(tweet, now, script_type, tweet_entities)
+            for tweet, tweet_entities in zip(tweets, entities)]
+
+
+def build_profile_row(user, now, script_type="test_scraper", is_crypto_user=None):
+    """
+    Map a tweet user to a tuple in TWITTER_PROFILES_COLUMNS order
+    is_crypto_user is classified from the bio unless precomputed for the whole batch
+    """
+    url_in_bio = None
+    for link in user.descriptionLinks or ():
+        if hasattr(link, 'url'):
+            url_in_bio = link.url
+            break
+
+    bio = user.rawDescription
+    if is_crypto_user is None:
+        is_crypto_user = classify_crypto_batch([bio])[0]
+
+    return (
+        user.id_str,                                  # author_id
+        user.displayname,                             # name
+        user.username,                                # handle
+        bio,                                          # bio
+        url_in_bio,                                   # url_in_bio
+        user.profileImageUrl,                         # profile_image_url
+        user.profileBannerUrl,                        # profile_banner_url
+        user.followersCount,                          # followers_count
+        user.friendsCount,                            # followings_count
+        1 if user.verified else 0,                    # is_verified
+        user.created,                                 # account_created_at
+        None,                                         # tag
+        1,                                            # is_active
+        now,                                          # inserted_at
+        now,                                          # updated_at
+        0,                                            # ai_tag
+        0,                                            # is_processed_by_ai
+        script_type,                                  # scraped_by
+        None,                                         # professional_category
+        user.statusesCount,                           # lifetime_tweets
+        None,                                         # lifetime_views
+        None,                                         # processed_by
+        is_crypto_user,                               # is_crypto_user
+        None,                                         # smart_followers_count
+        None,                                         # confidence_score
+    )
+
+
+def build_profile_rows(users, script_type="test_scraper", now=None):
+    """Map a batch of users to rows sharing one timestamp and one bio classification pass"""
+    now = now or datetime.now()
+    crypto_flags = classify_crypto_batch([user.rawDescription for user in users])
+    return [build_profile_row(user, now, script_type, is_crypto_user)
+            for user, is_crypto_user in zip(users, crypto_flags)]
+
+
+def enhanced_tweet_values(tweet_data):
+    """Return a mapped tweet as a row, accepting either a row or a column dictionary"""
+    if isinstance(tweet_data, tuple):
+        return tweet_data
+    return tuple(tweet_data[column] for column in ENHANCED_TWEETS_COLUMNS)
+
+
+def profile_values(profile_data):
+    """Return a mapped profile as a row, accepting either a row or a column dictionary"""
+    if isinstance(profile_data, tuple):
+        return profile_data
+    return tuple(profile_data[column] for column in TWITTER_PROFILES_COLUMNS)
@@ -3,46 +3,40 @@ Scraper account management utilities
 Handles fetching and managing Twitter scraper accounts from database
 """
 
+import asyncio
+import atexit
+import logging
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime, timezone
+from twscrape import API  # pyright: ignore[reportMissingImports]
 from db_configs import db
 from constants import (
-    GET_RANDOM_TWITTER_SCRAPER_ACCOUNT_QUERY,
+    CLAIM_TWITTER_SCRAPER_ACCOUNTS_QUERY,
+    MARK_ACCOUNTS_AS_OCCUPIED_QUERY,
+    RENEW_ACCOUNTS_LOCK_QUERY,
+    MARK_ACCOUNTS_AS_AVAILABLE_QUERY,
     MARK_ACCOUNT_AS_OCCUPIED_QUERY,
     MARK_ACCOUNT_AS_AVAILABLE_QUERY,
-    MARK_ACCOUNT_AS_ERROR_QUERY
+    MARK_ACCOUNT_AS_ERROR_QUERY,
+    MARK_ACCOUNT_AS_COOLDOWN_QUERY,
+    MARK_ACCOUNT_AS_ACTIVE_QUERY
 )
+from utils.error_util import (
+    ACCOUNT_COOLDOWN_SECONDS,
+    ERROR_FATAL,
+    ERROR_RATE_LIMIT,
+    classify_error
+)
+from utils.metrics import ACCOUNT_STATUS_CHANGES, LEASED_ACCOUNTS
 
+logger = logging.getLogger(__name__)
 
-def get_random_twitter_scraper_account():
-    """
-    Fetch a random Twitter scraper account from configs.twitter_scrapers table
-    Returns a dictionary with username and cookie_string
-    """
-    try:
-        results = db.fetch_query(GET_RANDOM_TWITTER_SCRAPER_ACCOUNT_QUERY)
-        
-        if not results:
-            print("❌ No available Twitter scraper accounts found")
-            return None
-            
-        username, cookie, status, is_occupied, lock_time = results[0]
-        
-        if not cookie:
-            print(f"❌ No cookie found for username: {username}")
-            return None
-            
-        print(f"✅ Selected Twitter scraper account: {username}")
-        
-        return {
-            "username": username,
-            "cookie_string": cookie,
-            "status": status,
-            "is_occupied": is_occupied,
-            "lock_time": lock_time
-        }
-        
-    except Exception as e:
-        print(f"❌ Error fetching Twitter scraper account: {e}")
-        return None
+# Locks older than this are considered abandoned and can be claimed again
+ACCOUNT_LEASE_TIMEOUT = int(os.getenv('ACCOUNT_LEASE_TIMEOUT', '3600'))
+ACCOUNT_HEARTBEAT_INTERVAL = int(os.getenv('ACCOUNT_HEARTBEAT_INTERVAL', '60'))
 
 
 def mark_account_as_occupied(username):
@@ -51,10 +45,10 @@ def mark_account_as_occupied(username):
     """
     try:
         db.execute_query(MARK_ACCOUNT_AS_OCCUPIED_QUERY, (username,))
-        print(f"✅ Marked account {username} as occupied")
+        logger.info(f"✅ Marked account {username} as occupied")
         
     except Exception as e:
-        print(f"❌ Error marking account as occupied: {e}")
+        logger.error(f"❌ Error marking account as occupied: {e}")
 
 
 def mark_account_as_available(username):
@@ -63,10 +57,10 @@ def mark_account_as_available(username):
     """
     try:
         db.execute_query(MARK_ACCOUNT_AS_AVAILABLE_QUERY, (username,))
-        print(f"✅ Marked account {username} as available")
+        logger.info(f"✅ Marked account {username} as available")
         
     except Exception as e:
-        print(f"❌ Error marking account as available: {e}")
+        logger.error(f"❌ Error marking account as available: {e}")
 
 
 def mark_account_as_error(username, error_message):
@@ -78,9 +72,276 @@ def mark_account_as_error(username, error_message):
         truncated_error = str(error_message)[:250] if error_message else "Unknown error"
         
         db.execute_query(MARK_ACCOUNT_AS_ERROR_QUERY, (truncated_error, username))
-        print(f"❌ Marked account {username} as error: {truncated_error}")
+        ACCOUNT_STATUS_CHANGES.inc(status="error")
+        logger.warning(f"❌ Marked account {username} as error: {truncated_error}")
         
     except Exception as e:
-        print(f"❌ Error marking account as error: {e}")
+        logger.error(f"❌ Error marking account as error: {e}")
+
+
+def mark_account_as_cooldown(username, error_message, cooldown_seconds=ACCOUNT_COOLDOWN_SECONDS):
+    """
+    Mark a Twitter scraper account as cooling down until cooldown_seconds from now
+    """
+    try:
+        truncated_error = str(error_message)[:250] if error_message else "Rate limited"
+
+        db.execute_query(MARK_ACCOUNT_AS_COOLDOWN_QUERY, (cooldown_seconds, truncated_error, username))
+        ACCOUNT_STATUS_CHANGES.inc(status="cooldown")
+        logger.warning(f"⏳ Marked account {username} as cooldown for {cooldown_seconds} seconds: {truncated_error}")
+
+    except Exception as e:
+        logger.error(f"❌ Error marking account as cooldown: {e}")
+
+
+def mark_account_as_active(username):
+    """
+    Return a Twitter scraper account to active and clear its error state
+    """
+    try:
+        db.execute_query(MARK_ACCOUNT_AS_ACTIVE_QUERY, (username,))
+        ACCOUNT_STATUS_CHANGES.inc(status="active")
+        logger.info(f"✅ Marked account {username} as active")
+
+    except Exception as e:
+        logger.error(f"❌ Error marking account as active: {e}")
+
+
+def handle_account_error(username, error):
+    """
+    Record an account failure according to its classification
+    Fatal errors mark the account as error, rate limits put it in cooldown and
+    transient errors leave its status alone
+    Returns the error classification
+    """
+    kind = classify_error(error)
+    if kind == ERROR_FATAL:
+        mark_account_as_error(username, str(error))
+    elif kind == ERROR_RATE_LIMIT:
+        mark_account_as_cooldown(username, str(error))
+    return kind
+
+
+def create_api(**kwargs):
+    """
+    twscrape API with a pool file of its own, removed when the process exits
+    The default accounts.db is shared by every process on the host and keeps
+    the accounts of earlier runs, so twscrape could pick accounts that were
+    never leased to this process
+    """
+    pool_dir = tempfile.mkdtemp(prefix="twscrape-pool-")
+    atexit.register(shutil.rmtree, pool_dir, ignore_errors=True)
+    return API(os.path.join(pool_dir, "accounts.db"), **kwargs)
+
+
+def _in_clause_query(query, usernames):
+    """Format a bulk account query with one placeholder per username"""
+    return query.format(placeholders=", ".join(["%s"] * len(usernames)))
+
+
+class ScraperAccountLease:
+    """
+    Claims several scraper accounts at once and keeps them locked while in use
+    Accounts are claimed with SELECT ... FOR UPDATE SKIP LOCKED so concurrent
+    workers never receive the same account, and a heartbeat renews lock_time
+    until the lease is released. Accounts leaving the lease are deleted from
+    the twscrape pool before the database lets anyone else have them
+    """
+
+    def __init__(self, count, lease_timeout=ACCOUNT_LEASE_TIMEOUT,
+                 heartbeat_interval=ACCOUNT_HEARTBEAT_INTERVAL):
+        self.count = count
+        self.lease_timeout = lease_timeout
+        self.heartbeat_interval = heartbeat_interval
+        self.accounts = {}  # username -> cookie
+        self._api = None
+        self._heartbeat_task = None
+        LEASED_ACCOUNTS.set_function(lambda: len(self.accounts))
+
+    @property
+    def usernames(self):
+        return list(self.accounts)
+
+    def claim(self, max_retries=5):
+        """
+        Claim up to `count` available accounts in one transaction
+        Retries with exponential backoff when the database is unreachable
+        Returns the list of newly claimed account dictionaries
+        """
+        for attempt in range(max_retries):
+            try:
+                with db.transaction() as cursor:
+                    cursor.execute(CLAIM_TWITTER_SCRAPER_ACCOUNTS_QUERY, (self.lease_timeout, self.count))
+                    rows = cursor.fetchall()
+                    usernames = [username for username, _ in rows]
+                    if usernames:
+                        cursor.execute(_in_clause_query(MARK_ACCOUNTS_AS_OCCUPIED_QUERY, usernames), usernames)
+
+                claimed = [{"username": username, "cookie_string": cookie} for username, cookie in rows]
+                for account in claimed:
+                    self.accounts[account["username"]] = account["cookie_string"]
+
+                if claimed:
+                    logger.info(f"✅ Claimed {len(claimed)} Twitter scraper accounts (attempt {attempt + 1})")
+                else:
+                    logger.warning("❌ No available Twitter scraper accounts found")
+                return claimed
+
+            except Exception as e:
+                logger.error(f"❌ Error claiming accounts from database (attempt {attempt + 1}/{max_retries}): {e}")
+
+                # If this is not the last attempt, wait before retrying
+                if attempt < max_retries - 1:
+                    # Exponential backoff: 1s, 2s, 4s, 8s
+                    delay = 2 ** attempt
+                    logger.warning(f"⏳ Waiting {delay} seconds before retry...")
+                    time.sleep(delay)
+                else:
+                    logger.error(f"❌ Failed to claim accounts after {max_retries} attempts")
+
+        return []
+
+    def renew(self):
+        """Refresh lock_time of every leased account"""
+        usernames = self.usernames
+        if not usernames:
+            return
+        try:
+            db.execute_query(_in_clause_query(RENEW_ACCOUNTS_LOCK_QUERY, usernames), usernames)
+        except Exception as e:
+            logger.error(f"❌ Error renewing account locks: {e}")
+
+    async def _drop(self, usernames):
+        """Take accounts out of the lease and the twscrape pool, so twscrape stops picking them"""
+        for username in usernames:
+            self.accounts.pop(username, None)
+        if self._api is None or not usernames:
+            return
+        try:
+            await self._api.pool.delete_accounts(list(usernames))
+        except Exception as e:
+            logger.error(f"❌ Error removing {len(usernames)} accounts from the twscrape pool: {e}")
+
+    async def release(self, usernames=None):
+        """Mark leased accounts as available again and drop them from the lease"""
+        usernames = [username for username in (self.usernames if usernames is None else usernames)
+                     if username in self.accounts]
+        if not usernames:
+            return
+        await self._drop(usernames)
+        try:
+            await asyncio.to_thread(
+                db.execute_query, _in_clause_query(MARK_ACCOUNTS_AS_AVAILABLE_QUERY, usernames), usernames
+            )
+            logger.info(f"✅ Released {len(usernames)} Twitter scraper accounts")
+        except Exception as e:
+            logger.error(f"❌ Error releasing accounts: {e}")
+
+    async def mark_error(self, username, error_message):
+        """Mark a leased account as error, which also clears its lock"""
+        await self._drop([username])
+        await asyncio.to_thread(mark_account_as_error, username, error_message)
+
+    async def handle_error(self, username, error):
+        """
+        Classify a leased account's failure, fatal and rate limit errors move it
+        out of the lease into error or cooldown
+        Returns the error classification
+        """
+        if classify_error(error) in (ERROR_FATAL, ERROR_RATE_LIMIT):
+            await self._drop([username])
+        return await asyncio.to_thread(handle_account_error, username, error)
+
+    async def load_into_pool(self, api):
+        """
+        Add every leased account to the twscrape pool
+        Accounts that fail with an auth or rate limit error leave the lease as
+        error or cooldown, accounts that fail transiently are released
+        Returns the usernames that were added
+        """
+        self._api = api
+        loaded = []
+        for username, cookie in list(self.accounts.items()):
+            try:
+                # add_account ignores known usernames, so a stale entry would keep its old cookies and state
+                await api.pool.delete_accounts(username)
+                await api.pool.add_account(
+                    username=username,
+                    password="",  # Required but not used when cookies are provided
+                    email="",  # Required but not used when cookies are provided
+                    email_password="",  # Required but not used when cookies are provided
+                    cookies=cookie
+                )
+                loaded.append(username)
+            except Exception as e:
+                logger.error(f"Error adding account {username}: {e}")
+                if await self.handle_error(username, e) not in (ERROR_FATAL, ERROR_RATE_LIMIT):
+                    await self.release([username])
+        logger.info(f"✅ Added {len(loaded)} accounts to the pool")
+        return loaded
+
+    async def sync_pool_status(self):
+        """
+        Carry twscrape's view of the leased accounts over to the database
+        twscrape picks the account for every request, deactivates accounts that
+        fail authentication and locks rate limited ones per endpoint, so its
+        pool is the only place that knows which account a failure belonged to.
+        Deactivated accounts are marked as error, locked ones as cooldown until
+        their latest lock ends; both leave the lease
+        Returns the usernames that left the lease
+        """
+        if self._api is None or not self.accounts:
+            return []
+        try:
+            pool_accounts = await self._api.pool.get_all()
+        except Exception as e:
+            logger.error(f"❌ Error reading account states from the twscrape pool: {e}")
+            return []
+
+        now = datetime.now(timezone.utc)
+        removed = []
+        for account in pool_accounts:
+            username = account.username
+            if username not in self.accounts:
+                continue
+            if not account.active:
+                await self.mark_error(username, account.error_msg or "Deactivated by twscrape")
+                removed.append(username)
+                continue
+            locks = [until if until.tzinfo else until.replace(tzinfo=timezone.utc)
+                     for until in (account.locks or {}).values() if until is not None]
+            locked_until = max(locks, default=None)
+            if locked_until is not None and locked_until > now:
+                cooldown = int((locked_until - now).total_seconds()) + 1
+                await self._drop([username])
+                await asyncio.to_thread(mark_account_as_cooldown, username, "Rate limited in twscrape", cooldown)
+                removed.append(username)
+        return removed
+
+    async def _heartbeat(self):
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            await asyncio.to_thread(self.renew)
+
+    def start_heartbeat(self):
+        if self._heartbeat_task is None:
+            self._heartbeat_task = asyncio.create_task(self._heartbeat())
+
+    async def stop_heartbeat(self):
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+            try:
+                await self._heartbeat_task
+            except asyncio.CancelledError:
+                pass
+            self._heartbeat_task = None
 
+    async def __aenter__(self):
+        await asyncio.to_thread(self.claim)
+        self.start_heartbeat()
+        return self
 
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.stop_heartbeat()
+        await self.sync_pool_status()
+        await self.release()
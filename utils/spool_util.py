@@ -0,0 +1,364 @@
+"""
+Local write-ahead spool
+Mapped rows are appended to a SQLite WAL file first and a background drainer
+replays them into MySQL in large batches, so a slow or unavailable database
+no longer loses rows that already cost API quota
+"""
+
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from contextlib import closing
+import pymysql
+from db_configs import db
+from constants import (
+    INSERT_INTO_ENHANCED_TWEETS_QUERY,
+    INSERT_INTO_TWITTER_PROFILES_QUERY,
+    UPDATE_ENHANCED_TWEETS_ENGAGEMENT_QUERY,
+    INSERT_INTO_ENGAGEMENT_HISTORY_QUERY,
+    UPSERT_SCRAPE_CHECKPOINT_QUERY,
+    DEACTIVATE_TWITTER_PROFILE_QUERY,
+    ENHANCED_TWEETS_COLUMNS,
+    TWITTER_PROFILES_COLUMNS,
+    REMAP_ENHANCED_TWEETS_QUERY,
+    REMAP_TWITTER_PROFILES_QUERY,
+    ENHANCED_TWEETS_BULK_QUERIES,
+    TWITTER_PROFILES_BULK_QUERIES,
+    ENHANCED_TWEETS_REMAP_BULK_QUERIES,
+    TWITTER_PROFILES_REMAP_BULK_QUERIES
+)
+from utils.error_util import backoff_delay
+from utils.metrics import DB_BATCH_SECONDS, ROWS, SPOOL_APPEND_SECONDS, SPOOL_BACKLOG, SPOOL_DRAIN_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Set SPOOL_ENABLED=1 to write through the local spool instead of straight to MySQL
+SPOOL_ENABLED = os.getenv('SPOOL_ENABLED', '0') == '1'
+SPOOL_PATH = os.getenv('SPOOL_PATH', 'spool.db')
+# Rows replayed into MySQL per transaction
+SPOOL_DRAIN_BATCH = int(os.getenv('SPOOL_DRAIN_BATCH', '5000'))
+# Seconds the drainer waits for a full batch before draining what it has
+SPOOL_DRAIN_INTERVAL = float(os.getenv('SPOOL_DRAIN_INTERVAL', '1'))
+# Seconds close() keeps draining before leaving the backlog for the next run
+SPOOL_CLOSE_TIMEOUT = float(os.getenv('SPOOL_CLOSE_TIMEOUT', '30'))
+
+# Spooled entry kind -> idempotent statement it is replayed with
+SPOOL_QUERIES = {
+    "enhanced_tweets": INSERT_INTO_ENHANCED_TWEETS_QUERY,
+    "twitter_profiles": INSERT_INTO_TWITTER_PROFILES_QUERY,
+    "tweet_engagement": UPDATE_ENHANCED_TWEETS_ENGAGEMENT_QUERY,
+    "engagement_history": INSERT_INTO_ENGAGEMENT_HISTORY_QUERY,
+    "scrape_checkpoints": UPSERT_SCRAPE_CHECKPOINT_QUERY,
+    "deactivated_profiles": DEACTIVATE_TWITTER_PROFILE_QUERY,
+    "remapped_tweets": REMAP_ENHANCED_TWEETS_QUERY,
+    "remapped_profiles": REMAP_TWITTER_PROFILES_QUERY,
+}
+# Kinds that may be bulk loaded when a run of rows reaches BULK_LOAD_THRESHOLD
+SPOOL_BULK_QUERIES = {
+    "enhanced_tweets": ENHANCED_TWEETS_BULK_QUERIES,
+    "twitter_profiles": TWITTER_PROFILES_BULK_QUERIES,
+    "remapped_tweets": ENHANCED_TWEETS_REMAP_BULK_QUERIES,
+    "remapped_profiles": TWITTER_PROFILES_REMAP_BULK_QUERIES,
+}
+# Kind -> position of the primary key in its rows, for kinds a later row of the same key supersedes.
+# Checkpoints only move forward in SQL and history snapshots are INSERT IGNORE, so those keep every row
+SPOOL_KEY_INDEXES = {
+    "enhanced_tweets": ENHANCED_TWEETS_COLUMNS.index("tweet_id"),
+    "twitter_profiles": TWITTER_PROFILES_COLUMNS.index("author_id"),
+    "remapped_tweets": ENHANCED_TWEETS_COLUMNS.index("tweet_id"),
+    "remapped_profiles": TWITTER_PROFILES_COLUMNS.index("author_id"),
+    "tweet_engagement": -1,
+    "deactivated_profiles": -1,
+}
+# Kinds that write the same rows, entries of these keep their relative order
+ORDERED_KINDS = {
+    "enhanced_tweets": {"tweet_engagement"},
+    "tweet_engagement": {"enhanced_tweets"},
+}
+
+# Errors that mean MySQL is unreachable, the drainer backs off and retries
+UNAVAILABLE_ERRORS = (pymysql.err.OperationalError, pymysql.err.InterfaceError, TimeoutError, ConnectionError)
+
+
+def dedupe_rows(kind, rows):
+    """
+    Keep the last enqueued row per primary key, in first-seen order
+    A LOAD DATA staging upsert applies duplicate keys in no defined order
+    """
+    index = SPOOL_KEY_INDEXES.get(kind)
+    if index is None:
+        return rows
+    latest = {}
+    for row in rows:
+        latest[row[index]] = row
+    return rows if len(latest) == len(rows) else list(latest.values())
+
+
+class WriteSpool:
+    """
+    Append-only queue of (kind, rows) entries in SQLite
+    Entries are drained in append order, so a checkpoint is never written
+    before the tweets spooled ahead of it. Every replayed statement is an
+    upsert or an idempotent update, so entries replayed twice after a crash
+    between the MySQL commit and the spool delete are harmless
+    Entries MySQL rejects outright are moved to spool_failed instead of
+    blocking the queue
+    """
+
+    def __init__(self, path=SPOOL_PATH, drain_batch=SPOOL_DRAIN_BATCH, drain_interval=SPOOL_DRAIN_INTERVAL):
+        self.path = path
+        self.drain_batch = drain_batch
+        self.drain_interval = drain_interval
+        self._conn = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._backlog_rows = 0
+        self._appended_rows = 0
+        self._drained_rows = 0
+        self._failed_rows = 0
+        self._drain_seconds = 0.0
+        self._last_error = None
+        self._started_at = None
+
+    def open(self):
+        if self._conn is not None:
+            return
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS spool "
+            "(id INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT, row_count INTEGER, payload BLOB, created_at REAL)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS spool_failed "
+            "(id INTEGER PRIMARY KEY, kind TEXT, row_count INTEGER, payload BLOB, created_at REAL, error TEXT)"
+        )
+        conn.commit()
+        self._conn = conn
+        self._backlog_rows = conn.execute("SELECT COALESCE(SUM(row_count), 0) FROM spool").fetchone()[0]
+        if self._backlog_rows:
+            logger.info(f"✅ Spool {self.path} has {self._backlog_rows} rows left from a previous run")
+
+    def append(self, kind, rows):
+        """Durably queue rows for SPOOL_QUERIES[kind]"""
+        if kind not in SPOOL_QUERIES:
+            raise ValueError(f"Unknown spool kind: {kind}")
+        if not rows:
+            return
+        self.open()
+        with SPOOL_APPEND_SECONDS.time(kind=kind):
+            payload = pickle.dumps([tuple(row) for row in rows], protocol=pickle.HIGHEST_PROTOCOL)
+            with self._lock, self._conn:
+                self._conn.execute(
+                    "INSERT INTO spool (kind, row_count, payload, created_at) VALUES (?, ?, ?, ?)",
+                    (kind, len(rows), payload, time.time())
+                )
+                self._backlog_rows += len(rows)
+                self._appended_rows += len(rows)
+        if self._backlog_rows >= self.drain_batch:
+            self._wakeup.set()
+
+    def _read_batch(self):
+        """Oldest entries holding up to drain_batch rows, at least one entry"""
+        entries = []
+        rows = 0
+        with self._lock:
+            cursor = self._conn.execute("SELECT id, kind, row_count, payload, created_at FROM spool ORDER BY id")
+            for entry in cursor:
+                if entries and rows + entry[2] > self.drain_batch:
+                    break
+                entries.append(entry)
+                rows += entry[2]
+            cursor.close()
+        return entries
+
+    def _delete(self, entries):
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM spool WHERE id = ?", [(entry[0],) for entry in entries])
+            # Recounted rather than subtracted, another process may drain the same file
+            self._backlog_rows = self._conn.execute("SELECT COALESCE(SUM(row_count), 0) FROM spool").fetchone()[0]
+
+    def _replay(self, entries):
+        """
+        Write entries to MySQL in one transaction, one statement batch per run
+        An entry joins the latest run of its kind unless an entry writing the
+        same rows came after it, so a later engagement update is never
+        overwritten by an earlier full upsert of the same tweet. Each run keeps
+        only the last enqueued row per primary key
+        """
+        runs = []
+        for _, kind, _, payload, _ in entries:
+            target = None
+            for run_kind, run_rows in reversed(runs):
+                if run_kind == kind:
+                    target = run_rows
+                    break
+                if run_kind in ORDERED_KINDS.get(kind, ()):
+                    break
+            if target is None:
+                target = []
+                runs.append((kind, target))
+            target.extend(pickle.loads(payload))
+        runs = [(kind, dedupe_rows(kind, rows)) for kind, rows in runs]
+        with db.transaction() as cursor:
+            for kind, rows in runs:
+                started = time.perf_counter()
+                method = db.write_rows(cursor, SPOOL_QUERIES[kind], rows, SPOOL_BULK_QUERIES.get(kind))
+                DB_BATCH_SECONDS.observe(time.perf_counter() - started, kind=kind, method=method)
+        for kind, rows in runs:
+            ROWS.inc(len(rows), kind=kind, outcome="written")
+
+    def _quarantine(self, entries):
+        """
+        Replay entries one by one after a batch was rejected, moving the bad ones aside
+        Returns the number of rows moved
+        """
+        failed = 0
+        for entry in entries:
+            try:
+                self._replay([entry])
+            except UNAVAILABLE_ERRORS:
+                raise
+            except Exception as e:
+                with self._lock, self._conn:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO spool_failed (id, kind, row_count, payload, created_at, error) "
+                        "VALUES (?, ?, ?, ?, ?, ?)", (*entry, str(e))
+                    )
+                self._failed_rows += entry[2]
+                failed += entry[2]
+                ROWS.inc(entry[2], kind=entry[1], outcome="failed")
+                logger.error(f"❌ Moved {entry[2]} spooled {entry[1]} rows to spool_failed: {e}")
+            self._delete([entry])
+        return failed
+
+    def drain_once(self):
+        """
+        Replay one batch into MySQL
+        Returns the number of rows taken off the spool, raises when MySQL is unavailable
+        """
+        self.open()
+        entries = self._read_batch()
+        if not entries:
+            return 0
+
+        started = time.monotonic()
+        failed = 0
+        try:
+            self._replay(entries)
+            self._delete(entries)
+        except UNAVAILABLE_ERRORS:
+            raise
+        except Exception as e:
+            logger.error(f"❌ Spooled batch rejected, replaying entries one by one: {e}")
+            failed = self._quarantine(entries)
+
+        rows = sum(entry[2] for entry in entries)
+        elapsed = time.monotonic() - started
+        SPOOL_DRAIN_SECONDS.observe(elapsed)
+        self._drain_seconds += elapsed
+        self._drained_rows += rows - failed
+        self._last_error = None
+        return rows
+
+    def drain(self, deadline=None):
+        """Drain until the spool is empty, MySQL fails or the deadline passes"""
+        drained = 0
+        while deadline is None or time.monotonic() < deadline:
+            rows = self.drain_once()
+            if not rows:
+                break
+            drained += rows
+        return drained
+
+    def _run(self):
+        attempt = 0
+        while not self._stop.is_set():
+            try:
+                rows = self.drain_once()
+                attempt = 0
+                if rows:
+                    logger.info(f"✅ Drained {rows} spooled rows into MySQL ({self._backlog_rows} rows backlog)")
+                if self._backlog_rows < self.drain_batch:
+                    self._wakeup.wait(self.drain_interval)
+                    self._wakeup.clear()
+            except Exception as e:
+                self._last_error = str(e)
+                delay = backoff_delay(attempt)
+                attempt += 1
+                logger.error(f"❌ Error draining spool, retrying in {delay:.1f}s "
+                             f"({self._backlog_rows} rows backlog): {e}")
+                self._stop.wait(delay)
+
+    def start(self):
+        """Start the background drainer thread"""
+        if self._thread is not None:
+            return
+        self.open()
+        self._started_at = time.monotonic()
+        SPOOL_BACKLOG.set_function(lambda: self._backlog_rows)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="spool-drainer", daemon=True)
+        self._thread.start()
+
+    def close(self, timeout=SPOOL_CLOSE_TIMEOUT):
+        """
+        Stop the drainer and drain what is left for up to timeout seconds
+        Rows that could not be drained stay in the spool for the next run
+        """
+        if self._thread is not None:
+            self._stop.set()
+            self._wakeup.set()
+            self._thread.join()
+            self._thread = None
+        if self._conn is None:
+            return
+        try:
+            self.drain(deadline=time.monotonic() + timeout)
+        except Exception as e:
+            logger.error(f"❌ Error draining spool on close: {e}")
+        if self._backlog_rows:
+            logger.warning(f"⚠️ {self._backlog_rows} spooled rows left in {self.path} for the next run")
+        with closing(self._conn):
+            self._conn = None
+
+    def metrics(self):
+        """Backlog, throughput and failure counters"""
+        elapsed = time.monotonic() - self._started_at if self._started_at else 0
+        return {
+            'backlog_rows': self._backlog_rows,
+            'appended_rows': self._appended_rows,
+            'drained_rows': self._drained_rows,
+            'failed_rows': self._failed_rows,
+            'drain_rows_per_second': self._drained_rows / self._drain_seconds if self._drain_seconds else 0.0,
+            'average_drain_rate': self._drained_rows / elapsed if elapsed else 0.0,
+            'last_error': self._last_error,
+        }
+
+
+spool = WriteSpool()
+
+
+def write_rows(kind, rows):
+    """
+    Queue rows in the spool, or write them straight to MySQL when the spool is disabled
+    Large tweet and profile batches are bulk loaded, see Database.write_rows
+    Raises on failure, like db.executemany_query
+    """
+    if SPOOL_ENABLED:
+        spool.append(kind, rows)
+        return
+    started = time.perf_counter()
+    try:
+        method = db.upsert_rows(SPOOL_QUERIES[kind], rows, SPOOL_BULK_QUERIES.get(kind))
+    except Exception:
+        ROWS.inc(len(rows), kind=kind, outcome="failed")
+        raise
+    DB_BATCH_SECONDS.observe(time.perf_counter() - started, kind=kind, method=method)
+    ROWS.inc(len(rows), kind=kind, outcome="written")
@@ -0,0 +1,74 @@
+"""
+Scrape target utilities
+Loads the list of Twitter handles to scrape from a file or the database
+"""
+
+import logging
+from db_configs import db
+from constants import GET_ACTIVE_SCRAPE_TARGETS_QUERY
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_handle(handle):
+    """Strip whitespace and a leading @ from a handle, returns None for blanks"""
+    if not handle:
+        return None
+    handle = str(handle).strip().lstrip('@')
+    return handle or None
+
+
+def dedupe_handles(handles):
+    """Drop empty and duplicate handles (case-insensitive) while keeping order"""
+    seen = set()
+    unique_handles = []
+    for handle in handles:
+        handle = normalize_handle(handle)
+        if not handle or handle.lower() in seen:
+            continue
+        seen.add(handle.lower())
+        unique_handles.append(handle)
+    return unique_handles
+
+
+def load_targets_from_file(path):
+    """
+    Load handles from a text file, one handle per line
+    Blank lines and lines starting with # are ignored
+    """
+    handles = []
+    with open(path, encoding='utf-8') as targets_file:
+        for line in targets_file:
+            line = line.split('#', 1)[0].strip()
+            if line:
+                handles.append(line)
+    return dedupe_handles(handles)
+
+
+def load_targets_from_db():
+    """Load active handles from configs.twitter_scrape_targets table"""
+    try:
+        results = db.fetch_query(GET_ACTIVE_SCRAPE_TARGETS_QUERY)
+        return dedupe_handles(row[0] for row in results)
+    except Exception as e:
+        logger.error(f"❌ Error fetching scrape targets from database: {e}")
+        return []
+
+
+def load_targets(targets_file=None, fallback=None):
+    """
+    Load scrape targets from targets_file if given, otherwise from the database
+    Falls back to the given handles when no targets are found
+    """
+    if targets_file:
+        handles = load_targets_from_file(targets_file)
+        logger.info(f"✅ Loaded {len(handles)} targets from {targets_file}")
+    else:
+        handles = load_targets_from_db()
+        logger.info(f"✅ Loaded {len(handles)} targets from database")
+
+    if not handles and fallback:
+        logger.warning("⚠️ No scrape targets found, using fallback targets")
+        handles = dedupe_handles(fallback)
+
+    return handles
@@ -0,0 +1,286 @@
+"""
+Conversation expansion
+Follows the reply parents and quoted tweets of scraped tweets, and the
+replies under high-engagement tweets, breadth-first up to a depth and a
+request budget, so the threads that matter are stored in full without
+paying again for tweets that are already in enhanced_tweets
+"""
+
+import asyncio
+import logging
+import math
+import os
+import time
+from contextlib import aclosing
+from db_configs import db
+from constants import GET_EXISTING_TWEET_IDS_QUERY
+from utils.pipeline_util import TweetBatcher
+from utils.query_planner import SEARCH_PAGE_SIZE
+from utils.metrics import THREAD_TWEETS, observe_api_request
+
+logger = logging.getLogger(__name__)
+
+THREAD_EXPANSION_ENABLED = os.getenv('THREAD_EXPANSION_ENABLED', '0') == '1'
+# Edges followed away from the scraped tweets
+THREAD_MAX_DEPTH = int(os.getenv('THREAD_MAX_DEPTH', '3'))
+# API requests (lookups and search pages) one expansion may spend
+THREAD_REQUEST_BUDGET = int(os.getenv('THREAD_REQUEST_BUDGET', '200'))
+# Tweets with at least this many replies get their conversation fetched
+THREAD_MIN_REPLIES = int(os.getenv('THREAD_MIN_REPLIES', '50'))
+# Replies fetched per conversation
+THREAD_REPLIES_LIMIT = int(os.getenv('THREAD_REPLIES_LIMIT', '100'))
+# Conversations packed into one OR-search
+THREAD_CONVERSATIONS_PER_SEARCH = int(os.getenv('THREAD_CONVERSATIONS_PER_SEARCH', '10'))
+# Tweet ids checked against enhanced_tweets per query
+THREAD_LOOKUP_BATCH = int(os.getenv('THREAD_LOOKUP_BATCH', '500'))
+# Concurrent tweet_details lookups
+THREAD_LOOKUP_CONCURRENCY = int(os.getenv('THREAD_LOOKUP_CONCURRENCY', '8'))
+# Edges kept between expansions, later edges are dropped until the next expansion
+THREAD_SEED_LIMIT = int(os.getenv('THREAD_SEED_LIMIT', '50000'))
+
+
+class ThreadLevel:
+    """Edges found at one depth: parent ids to look up, embedded quoted tweets and conversation ids"""
+
+    def __init__(self):
+        self.parent_ids = set()
+        self.quoted = {}  # tweet id -> quoted tweet, already embedded in the quoting tweet
+        self.conversation_ids = set()
+
+    def __len__(self):
+        return len(self.parent_ids) + len(self.quoted) + len(self.conversation_ids)
+
+    def add_edges(self, tweet, min_replies=THREAD_MIN_REPLIES):
+        """Record a tweet's reply parent, quoted tweet and, when it drew enough replies, its conversation"""
+        if tweet.inReplyToTweetId:
+            self.parent_ids.add(int(tweet.inReplyToTweetId))
+        quoted = tweet.quotedTweet
+        if quoted is not None:
+            self.quoted[quoted.id] = quoted
+        if min_replies and (tweet.replyCount or 0) >= min_replies:
+            self.conversation_ids.add(int(tweet.conversationId or tweet.id))
+
+
+class ThreadSeeds:
+    """
+    Edges of the tweets scraped since the last expansion
+    Only touched on the event loop, scrape_query_group adds every routed tweet
+    """
+
+    def __init__(self, max_size=THREAD_SEED_LIMIT, min_replies=THREAD_MIN_REPLIES):
+        self.max_size = max_size
+        self.min_replies = min_replies
+        self.scraped_ids = set()
+        self.level = ThreadLevel()
+        self.dropped = 0
+
+    def add(self, tweet):
+        self.scraped_ids.add(tweet.id)
+        if len(self.level) >= self.max_size:
+            self.dropped += 1
+            return
+        self.level.add_edges(tweet, self.min_replies)
+
+    def take(self):
+        """Return (scraped ids, first level) and start collecting afresh"""
+        scraped_ids, level = self.scraped_ids, self.level
+        self.scraped_ids, self.level = set(), ThreadLevel()
+        if self.dropped:
+            logger.warning(f"⚠️ Dropped thread edges of {self.dropped} tweets over THREAD_SEED_LIMIT")
+            self.dropped = 0
+        return scraped_ids, level
+
+
+def get_existing_tweet_ids(tweet_ids, batch_size=THREAD_LOOKUP_BATCH):
+    """Subset of tweet_ids already stored in twitter.enhanced_tweets, checked in batches"""
+    tweet_ids = [str(tweet_id) for tweet_id in tweet_ids]
+    existing = set()
+    for start in range(0, len(tweet_ids), batch_size):
+        batch = tweet_ids[start:start + batch_size]
+        query = GET_EXISTING_TWEET_IDS_QUERY.format(placeholders=", ".join(["%s"] * len(batch)))
+        existing.update(int(tweet_id) for tweet_id, in db.fetch_query(query, batch))
+    return existing
+
+
+def build_conversation_query(conversation_ids):
+    return "(" + " OR ".join(f"conversation_id:{conversation_id}" for conversation_id in conversation_ids) + ")"
+
+
+class ThreadExpander:
+    """
+    Breadth-first walk over reply, quote and conversation edges
+    Every tweet id and conversation id is visited at most once per expansion,
+    tweets already stored are neither fetched nor followed, quoted tweets come
+    embedded in the quoting tweet and cost no request, and conversations are
+    packed into OR-searches like handles are
+    """
+
+    def __init__(self, api, writer=None, scheduler=None, max_depth=THREAD_MAX_DEPTH,
+                 budget=THREAD_REQUEST_BUDGET, min_replies=THREAD_MIN_REPLIES,
+                 replies_limit=THREAD_REPLIES_LIMIT, conversations_per_search=THREAD_CONVERSATIONS_PER_SEARCH,
+                 concurrency=THREAD_LOOKUP_CONCURRENCY):
+        self.api = api
+        self.scheduler = scheduler
+        self.max_depth = max_depth
+        self.budget = budget
+        self.min_replies = min_replies
+        self.replies_limit = replies_limit
+        self.conversations_per_search = max(1, conversations_per_search)
+        self.semaphore = asyncio.Semaphore(max(1, concurrency))
+        self.batcher = TweetBatcher(writer=writer)
+        self.visited = set()
+        self.visited_conversations = set()
+        self.requests = 0
+
+    @property
+    def exhausted(self):
+        return self.requests >= self.budget
+
+    async def _acquire(self, endpoint):
+        if self.scheduler is not None:
+            await self.scheduler.acquire(endpoint)
+
+    async def _lookup(self, tweet_id):
+        """One tweet by id, None when it is gone or the lookup failed"""
+        async with self.semaphore:
+            await self._acquire("tweet_details")
+            requested_at = time.perf_counter()
+            try:
+                tweet = await self.api.tweet_details(tweet_id)
+            except Exception as e:
+                observe_api_request("tweet_details", time.perf_counter() - requested_at, "error")
+                logger.warning(f"❌ Error looking up tweet {tweet_id}: {e}")
+                return None
+            observe_api_request("tweet_details", time.perf_counter() - requested_at)
+            return tweet
+
+    async def _search_conversations(self, conversation_ids):
+        """Replies of a group of conversations, stops early once the budget is spent"""
+        query = build_conversation_query(conversation_ids)
+        limit = self.replies_limit * len(conversation_ids)
+        replies = []
+        await self._acquire("search")
+        self.requests += 1
+        page_wait = 0.0
+        try:
+            async with aclosing(self.api.search(query, limit=limit)) as tweets:
+                while True:
+                    requested_at = time.perf_counter()
+                    try:
+                        tweet = await anext(tweets)
+                    except StopAsyncIteration:
+                        break
+                    finally:
+                        page_wait += time.perf_counter() - requested_at
+                    replies.append(tweet)
+                    if len(replies) % SEARCH_PAGE_SIZE == 0:
+                        observe_api_request("search", page_wait)
+                        page_wait = 0.0
+                        if self.exhausted:
+                            break
+                        await self._acquire("search")
+                        self.requests += 1
+        except Exception as e:
+            observe_api_request("search", page_wait, "error")
+            logger.warning(f"❌ Error fetching conversations {', '.join(map(str, conversation_ids))}: {e}")
+            return replies
+        if page_wait:
+            observe_api_request("search", page_wait)
+        return replies
+
+    async def _fetch_parents(self, parent_ids):
+        # Gathered in budget-sized slices, twscrape has no lookup of many tweets by id
+        parent_ids = sorted(parent_ids)[:max(0, self.budget - self.requests)]
+        self.requests += len(parent_ids)
+        tweets = await asyncio.gather(*(self._lookup(tweet_id) for tweet_id in parent_ids))
+        return [tweet for tweet in tweets if tweet is not None]
+
+    async def _fetch_conversations(self, conversation_ids):
+        conversation_ids = sorted(conversation_ids)
+        fetched = []
+        for start in range(0, len(conversation_ids), self.conversations_per_search):
+            if self.exhausted:
+                break
+            group = conversation_ids[start:start + self.conversations_per_search]
+            # A group costs at least one page per conversation's worth of replies
+            if self.requests + math.ceil(self.replies_limit * len(group) / SEARCH_PAGE_SIZE) > self.budget:
+                group = group[:max(1, (self.budget - self.requests) * SEARCH_PAGE_SIZE // self.replies_limit)]
+            fetched.extend(await self._search_conversations(group))
+        return fetched
+
+    async def _store(self, tweets, next_level, depth):
+        """Write new tweets and queue their edges for the next level"""
+        for tweet in tweets:
+            if tweet.id in self.visited:
+                continue
+            self.visited.add(tweet.id)
+            self.batcher.add(tweet)
+            if depth < self.max_depth:
+                next_level.add_edges(tweet, self.min_replies)
+            if self.batcher.is_due():
+                await self.batcher.flush()
+
+    async def expand(self, scraped_ids, level):
+        """
+        Walk the graph from the first level of edges
+        scraped_ids are the tweets the scrape itself returned, they are never refetched
+        Returns the number of tweets written
+        """
+        self.visited.update(scraped_ids)
+        depth = 1
+        while len(level) and depth <= self.max_depth and not self.exhausted:
+            next_level = ThreadLevel()
+            level.parent_ids -= self.visited
+            level.quoted = {tweet_id: tweet for tweet_id, tweet in level.quoted.items()
+                            if tweet_id not in self.visited}
+            level.conversation_ids -= self.visited_conversations
+            self.visited_conversations.update(level.conversation_ids)
+
+            # Parents and quoted tweets that are already stored are not followed any further
+            candidate_ids = level.parent_ids | level.quoted.keys()
+            existing = await asyncio.to_thread(get_existing_tweet_ids, candidate_ids) if candidate_ids else set()
+            self.visited.update(existing)
+            THREAD_TWEETS.inc(len(existing), outcome="stored")
+            quoted = [tweet for tweet_id, tweet in level.quoted.items() if tweet_id not in existing]
+            THREAD_TWEETS.inc(len(quoted), outcome="quoted")
+            await self._store(quoted, next_level, depth)
+
+            parents = await self._fetch_parents(level.parent_ids - existing)
+            replies = await self._fetch_conversations(level.conversation_ids)
+            THREAD_TWEETS.inc(len(parents) + len(replies), outcome="fetched")
+            # Replies already stored are skipped like parents and quotes, their edges were followed before
+            replies = [tweet for tweet in replies if tweet.id not in self.visited]
+            reply_ids = {tweet.id for tweet in replies}
+            stored_replies = await asyncio.to_thread(get_existing_tweet_ids, reply_ids) if reply_ids else set()
+            self.visited.update(stored_replies)
+            THREAD_TWEETS.inc(len(stored_replies), outcome="stored")
+            replies = [tweet for tweet in replies if tweet.id not in stored_replies]
+            await self._store(parents + replies, next_level, depth)
+
+            logger.info(f"✅ Thread depth {depth}: {len(quoted)} quoted, {len(parents)} parents, "
+                        f"{len(replies)} replies, {len(existing) + len(stored_replies)} already stored, "
+                        f"{self.requests}/{self.budget} requests")
+            level = next_level
+            depth += 1
+
+        await self.batcher.flush()
+        return self.batcher.total_tweets
+
+
+thread_seeds = ThreadSeeds()
+
+
+async def expand_threads(api, writer=None, scheduler=None, seeds=thread_seeds, **options):
+    """Expand the conversations of everything scraped since the last call, returns tweets written"""
+    scraped_ids, level = seeds.take()
+    if not len(level):
+        return 0
+    expander = ThreadExpander(api, writer=writer, scheduler=scheduler, **options)
+    try:
+        written = await expander.expand(scraped_ids, level)
+    except Exception as e:
+        logger.error(f"❌ Error expanding threads: {e}")
+        await expander.batcher.flush()
+        return expander.batcher.total_tweets
+    logger.info(f"✅ Expanded threads of {len(scraped_ids)} scraped tweets into {written} more tweets")
+    return written
@@ -0,0 +1,121 @@
+"""
+Search window planner
+A search returns at most `limit` tweets, newest first, so a busy window
+comes back with only its newest part. The planner keeps the covered part,
+splits the rest in two at an hour or minute boundary and hands both halves
+back to be searched concurrently, until every piece fits under the limit
+"""
+
+import logging
+import os
+from utils.metrics import WINDOW_SEARCHES
+
+logger = logging.getLogger(__name__)
+
+# Windows this short are not split further, a saturated one is searched as is
+WINDOW_MIN_SECONDS = int(os.getenv('WINDOW_MIN_SECONDS', '60'))
+# Searches one window scrape may spend, the pieces left over are logged as truncated
+WINDOW_MAX_SEARCHES = int(os.getenv('WINDOW_MAX_SEARCHES', '200'))
+# Engagement filters for window searches, 0 turns a filter off
+WINDOW_MIN_FAVES = int(os.getenv('WINDOW_MIN_FAVES', '0'))
+WINDOW_MIN_REPLIES = int(os.getenv('WINDOW_MIN_REPLIES', '0'))
+WINDOW_MIN_RETWEETS = int(os.getenv('WINDOW_MIN_RETWEETS', '0'))
+# Search the gap left behind when a checkpointed search hits its limit before reaching the checkpoint,
+# with it off such searches keep their checkpoint instead
+WINDOW_GAP_FILL_ENABLED = os.getenv('WINDOW_GAP_FILL_ENABLED', '1') == '1'
+
+# Tweet ids are snowflakes: milliseconds since this epoch, shifted left by 22 bits
+TWITTER_EPOCH_MS = 1288834974657
+
+
+def window_filters():
+    """min_faves/min_replies/min_retweets keyword arguments for build_search_query"""
+    return {
+        "min_faves": WINDOW_MIN_FAVES,
+        "min_replies": WINDOW_MIN_REPLIES,
+        "min_retweets": WINDOW_MIN_RETWEETS,
+    }
+
+
+def tweet_id_time(tweet_id):
+    """Unix seconds a tweet id was created at"""
+    return ((int(tweet_id) >> 22) + TWITTER_EPOCH_MS) // 1000
+
+
+def checkpoint_gap(since_id, oldest_time):
+    """
+    since_time/until_time window between a checkpoint and the oldest tweet a
+    saturated search returned, None if there is nothing in between
+    """
+    since_time = tweet_id_time(since_id)
+    until_time = int(oldest_time.timestamp()) + 1
+    if until_time <= since_time:
+        return None
+    return since_time, until_time
+
+
+def split_point(since_time, until_time):
+    """Middle of a window, rounded down to the hour for windows over two hours and to the minute below"""
+    middle = (since_time + until_time) // 2
+    granularity = 3600 if until_time - since_time >= 2 * 3600 else 60
+    point = middle - middle % granularity
+    return point if since_time < point < until_time else middle
+
+
+class WindowPlanner:
+    """
+    Splits the saturated searches of one window scrape and keeps its search budget
+    Windows are (since_time, until_time) unix seconds, since inclusive and
+    until exclusive like the search operators
+    """
+
+    def __init__(self, min_seconds=WINDOW_MIN_SECONDS, max_searches=WINDOW_MAX_SEARCHES):
+        self.min_seconds = min_seconds
+        self.max_searches = max_searches
+        self.searches = 0
+        self.splits = 0
+        self.truncated = []  # windows left incomplete
+
+    def reserve(self, since_time, until_time):
+        """Count a search against the budget, False once it is spent"""
+        if self.searches >= self.max_searches:
+            WINDOW_SEARCHES.inc(outcome="skipped")
+            self.truncated.append((since_time, until_time))
+            return False
+        self.searches += 1
+        return True
+
+    def split(self, since_time, until_time, group):
+        """
+        Windows still to search after a search of since_time/until_time for group
+        Empty when the search returned everything; otherwise the part older
+        than its oldest tweet, in two halves unless it is already at the
+        minimum width. The oldest second is searched again, since the limit
+        may have cut it off
+        """
+        if not group.saturated:
+            WINDOW_SEARCHES.inc(outcome="complete")
+            return []
+
+        covered_until = until_time
+        if group.oldest_time is not None:
+            covered_until = min(until_time, int(group.oldest_time.timestamp()) + 1)
+        width = covered_until - since_time
+        if width <= 0:
+            WINDOW_SEARCHES.inc(outcome="complete")
+            return []
+        if width <= self.min_seconds:
+            if covered_until >= until_time:
+                # A minimum-width window holding more than `limit` tweets in its oldest second
+                WINDOW_SEARCHES.inc(outcome="truncated")
+                self.truncated.append((since_time, until_time))
+                logger.warning(f"⚠️ Window {since_time}-{until_time} for {group.search_term} still hits the limit "
+                               f"at {self.min_seconds}s, keeping the {group.fetched} newest tweets")
+                return []
+            WINDOW_SEARCHES.inc(outcome="split")
+            return [(since_time, covered_until)]
+
+        WINDOW_SEARCHES.inc(outcome="split")
+        self.splits += 1
+        point = split_point(since_time, covered_until)
+        return [(since_time, point), (point, covered_until)]
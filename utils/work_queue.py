@@ -0,0 +1,176 @@
+"""
+Distributed scrape job queue
+Scrape jobs live in configs.scrape_jobs and are claimed with
+SELECT ... FOR UPDATE SKIP LOCKED, so any number of worker nodes can share
+the targets without two of them scraping the same job
+"""
+
+import asyncio
+import logging
+import os
+import socket
+from db_configs import db
+from constants import (
+    ENQUEUE_SCRAPE_JOB_QUERY,
+    DEAD_LETTER_EXPIRED_SCRAPE_JOBS_QUERY,
+    CLAIM_SCRAPE_JOBS_QUERY,
+    MARK_SCRAPE_JOBS_LEASED_QUERY,
+    RENEW_SCRAPE_JOB_LEASES_QUERY,
+    RELEASE_SCRAPE_JOBS_QUERY,
+    COMPLETE_SCRAPE_JOB_QUERY,
+    FAIL_SCRAPE_JOB_QUERY
+)
+from utils.error_util import backoff_delay
+
+logger = logging.getLogger(__name__)
+
+# Identifies this node's leases, defaults to host:pid
+WORKER_ID = os.getenv('WORKER_ID') or f"{socket.gethostname()}:{os.getpid()}"
+# Seconds a claimed job stays leased without a renewal
+SCRAPE_JOB_LEASE_TIMEOUT = int(os.getenv('SCRAPE_JOB_LEASE_TIMEOUT', '600'))
+SCRAPE_JOB_HEARTBEAT_INTERVAL = int(os.getenv('SCRAPE_JOB_HEARTBEAT_INTERVAL', '60'))
+# Attempts before a job is dead-lettered
+SCRAPE_JOB_MAX_ATTEMPTS = int(os.getenv('SCRAPE_JOB_MAX_ATTEMPTS', '5'))
+# Seconds between runs of a recurring per-handle job
+SCRAPE_JOB_REPEAT_INTERVAL = int(os.getenv('SCRAPE_JOB_REPEAT_INTERVAL', '3600'))
+# Failed jobs wait a jittered exponential backoff between these bounds (seconds)
+SCRAPE_JOB_RETRY_BASE_DELAY = float(os.getenv('SCRAPE_JOB_RETRY_BASE_DELAY', '60'))
+SCRAPE_JOB_RETRY_MAX_DELAY = float(os.getenv('SCRAPE_JOB_RETRY_MAX_DELAY', '3600'))
+
+
+def _in_clause_query(query, job_ids):
+    """Format a bulk job query with one placeholder per job id"""
+    return query.format(placeholders=", ".join(["%s"] * len(job_ids)))
+
+
+def scrape_job_key(handle, since_time=None, until_time=None):
+    """Recurring jobs are keyed by handle, window jobs by handle and window"""
+    if since_time is None and until_time is None:
+        return handle.lower()
+    return f"{handle.lower()}:{since_time or ''}:{until_time or ''}"
+
+
+def enqueue_scrape_jobs(handles, priority=0, since_time=None, until_time=None,
+                        repeat_interval=SCRAPE_JOB_REPEAT_INTERVAL, max_attempts=SCRAPE_JOB_MAX_ATTEMPTS):
+    """
+    Add a job per handle, jobs that already exist are left untouched
+    Jobs with a since_time/until_time window (unix seconds) run once
+    Returns the number of jobs created
+    """
+    if since_time is not None or until_time is not None:
+        repeat_interval = None
+    rows = [
+        (scrape_job_key(handle, since_time, until_time), handle, since_time, until_time,
+         priority, repeat_interval, max_attempts)
+        for handle in handles
+    ]
+    if not rows:
+        return 0
+    try:
+        created = db.executemany_query(ENQUEUE_SCRAPE_JOB_QUERY, rows).rowcount
+        logger.info(f"✅ Enqueued {created} new scrape jobs ({len(rows) - created} already queued)")
+        return created
+    except Exception as e:
+        logger.error(f"❌ Error enqueuing scrape jobs: {e}")
+        return 0
+
+
+class ScrapeJobLease:
+    """
+    Jobs claimed by this worker
+    A heartbeat renews the lease of every job still held; jobs whose worker
+    died become claimable again once their lease expires, and jobs that ran
+    out of attempts are dead-lettered with status = 'dead'
+    """
+
+    def __init__(self, owner=WORKER_ID, lease_timeout=SCRAPE_JOB_LEASE_TIMEOUT,
+                 heartbeat_interval=SCRAPE_JOB_HEARTBEAT_INTERVAL):
+        self.owner = owner
+        self.lease_timeout = lease_timeout
+        self.heartbeat_interval = heartbeat_interval
+        self.jobs = {}  # job id -> job dictionary
+        self._heartbeat_task = None
+
+    def claim(self, limit):
+        """Claim up to `limit` due jobs in one transaction, highest priority first"""
+        try:
+            with db.transaction() as cursor:
+                cursor.execute(DEAD_LETTER_EXPIRED_SCRAPE_JOBS_QUERY)
+                cursor.execute(CLAIM_SCRAPE_JOBS_QUERY, (limit,))
+                rows = cursor.fetchall()
+                job_ids = [row[0] for row in rows]
+                if job_ids:
+                    cursor.execute(_in_clause_query(MARK_SCRAPE_JOBS_LEASED_QUERY, job_ids),
+                                   (self.owner, self.lease_timeout, *job_ids))
+        except Exception as e:
+            logger.error(f"❌ Error claiming scrape jobs: {e}")
+            return []
+
+        claimed = [
+            {"id": job_id, "handle": handle, "since_time": since_time, "until_time": until_time,
+             "attempt": attempts + 1}
+            for job_id, handle, since_time, until_time, attempts in rows
+        ]
+        for job in claimed:
+            self.jobs[job["id"]] = job
+        if claimed:
+            logger.info(f"✅ Claimed {len(claimed)} scrape jobs")
+        return claimed
+
+    def renew(self):
+        """Extend the lease of every job still held"""
+        job_ids = list(self.jobs)
+        if not job_ids:
+            return
+        try:
+            db.execute_query(_in_clause_query(RENEW_SCRAPE_JOB_LEASES_QUERY, job_ids),
+                             (self.lease_timeout, self.owner, *job_ids))
+        except Exception as e:
+            logger.error(f"❌ Error renewing scrape job leases: {e}")
+
+    def complete(self, job):
+        """Mark a job as done, recurring jobs are rescheduled after their repeat interval"""
+        try:
+            db.execute_query(COMPLETE_SCRAPE_JOB_QUERY, (job["id"], self.owner))
+        except Exception as e:
+            logger.error(f"❌ Error completing scrape job {job['id']}: {e}")
+        self.jobs.pop(job["id"], None)
+
+    def fail(self, job, error):
+        """Put a failed job back with a backoff delay, or dead-letter it after its last attempt"""
+        delay = backoff_delay(job["attempt"] - 1, SCRAPE_JOB_RETRY_BASE_DELAY, SCRAPE_JOB_RETRY_MAX_DELAY)
+        try:
+            db.execute_query(FAIL_SCRAPE_JOB_QUERY, (int(delay), str(error)[:1000], job["id"], self.owner))
+            logger.error(f"❌ Scrape job {job['id']} ({job['handle']}) failed on attempt {job['attempt']}: {error}")
+        except Exception as e:
+            logger.error(f"❌ Error failing scrape job {job['id']}: {e}")
+        self.jobs.pop(job["id"], None)
+
+    def release(self):
+        """Hand every unfinished job back to the queue without counting the attempt"""
+        job_ids = list(self.jobs)
+        if not job_ids:
+            return
+        try:
+            db.execute_query(_in_clause_query(RELEASE_SCRAPE_JOBS_QUERY, job_ids), (self.owner, *job_ids))
+            logger.info(f"✅ Released {len(job_ids)} unfinished scrape jobs")
+        except Exception as e:
+            logger.error(f"❌ Error releasing scrape jobs: {e}")
+        self.jobs.clear()
+
+    async def _heartbeat(self):
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            await asyncio.to_thread(self.renew)
+
+    async def __aenter__(self):
+        self._heartbeat_task = asyncio.create_task(self._heartbeat())
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self._heartbeat_task.cancel()
+        try:
+            await self._heartbeat_task
+        except asyncio.CancelledError:
+            pass
+        await asyncio.to_thread(self.release)
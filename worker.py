@@ -0,0 +1,170 @@
+"""
+Scrape worker for multi-node deployments
+Every node runs this entry point against the shared configs.scrape_jobs
+queue; jobs are claimed with SKIP LOCKED, so adding nodes adds throughput
+without two nodes spending API quota on the same target
+"""
+
+import asyncio
+import logging
+import os
+import signal
+import time
+from daemon import TARGETS_REFRESH_INTERVAL, refill_accounts, run_until_stopped, wait_for_stop
+from scraper import (
+    DEFAULT_TARGETS,
+    DEFAULT_USERNAME,
+    SCRAPE_CONCURRENCY,
+    SCRAPE_LIMIT,
+    SCRAPER_ACCOUNT_COUNT,
+    TARGETS_FILE,
+    add_fallback_account,
+    scrape_targets,
+    scrape_window
+)
+from utils.account_health_util import run_revalidation_loop
+from utils.db_writer import AsyncDBWriter
+from utils.log_util import configure_logging
+from utils.map_pool import map_pool
+from utils.metrics import MetricsReporter
+from utils.parquet_sink import parquet_sink
+from utils.profile_cache import profile_cache
+from utils.query_planner import QueryPlanner
+from utils.rate_limit_util import RateLimitScheduler
+from utils.raw_archive import raw_archive
+from utils.scraper_account_util import ScraperAccountLease, create_api
+from utils.spool_util import SPOOL_ENABLED, spool
+from utils.target_util import load_targets
+from utils.thread_util import THREAD_EXPANSION_ENABLED, expand_threads
+from utils.window_planner import tweet_id_time
+from utils.work_queue import ScrapeJobLease, enqueue_scrape_jobs
+
+logger = logging.getLogger(__name__)
+
+# Jobs claimed per round, per leased account
+SCRAPE_JOB_CLAIM_BATCH = int(os.getenv('SCRAPE_JOB_CLAIM_BATCH', '25'))
+# Seconds a worker waits before looking for jobs again when none are due
+SCRAPE_JOB_IDLE_WAIT = float(os.getenv('SCRAPE_JOB_IDLE_WAIT', '30'))
+
+
+async def run_window_job(api, job, jobs, writer, scheduler, semaphore):
+    """
+    Scrape a one-off since_time/until_time window for a single handle
+    Windows that hit the limit are split and their pieces searched in parallel,
+    each piece is retried like a recurring search
+    """
+    # Open-ended windows get fixed ends to split at: the first snowflake id and now
+    since_time = job["since_time"] or tweet_id_time(0)
+    until_time = job["until_time"] or int(time.time())
+    try:
+        await scrape_window(api, [job["handle"]], since_time, until_time, writer=writer,
+                            limit=SCRAPE_LIMIT, scheduler=scheduler, semaphore=semaphore)
+    except Exception as e:
+        await asyncio.to_thread(jobs.fail, job, e)
+        return
+    await asyncio.to_thread(jobs.complete, job)
+
+
+async def run_jobs(api, claimed, jobs, concurrency, writer, planner, scheduler):
+    """
+    Run one round of claimed jobs
+    Recurring per-handle jobs are planned together into OR-queries from their
+    checkpoints, window jobs are searched on their own and split while they
+    hit the limit, all sharing one concurrency limit
+    """
+    recurring = [job for job in claimed if job["since_time"] is None and job["until_time"] is None]
+    windows = [job for job in claimed if job not in recurring]
+
+    if recurring:
+        try:
+            counts = await scrape_targets(api, [job["handle"] for job in recurring], concurrency=concurrency,
+                                          writer=writer, limit=SCRAPE_LIMIT, planner=planner,
+                                          scheduler=scheduler)
+        except Exception as e:
+            counts, error = {}, e
+        else:
+            error = "Search failed after retries"
+        for job in recurring:
+            if job["handle"].lower() in counts:
+                await asyncio.to_thread(jobs.complete, job)
+            else:
+                await asyncio.to_thread(jobs.fail, job, error)
+
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    await asyncio.gather(*(run_window_job(api, job, jobs, writer, scheduler, semaphore) for job in windows))
+
+    if THREAD_EXPANSION_ENABLED:
+        await expand_threads(api, writer=writer, scheduler=scheduler)
+
+
+async def run_worker(stop):
+    api = create_api()
+    planner = QueryPlanner()
+
+    async with ScraperAccountLease(SCRAPER_ACCOUNT_COUNT) as lease:
+        loaded = await lease.load_into_pool(api)
+        if not loaded and not await add_fallback_account(api):
+            logger.error("❌ No scraper accounts available, aborting")
+            return
+
+        concurrency = SCRAPE_CONCURRENCY * max(1, len(loaded))
+        scheduler = RateLimitScheduler(loaded or [DEFAULT_USERNAME])
+        revalidation = asyncio.create_task(run_revalidation_loop())
+        loop = asyncio.get_running_loop()
+        targets_enqueued_at = None
+
+        try:
+            async with AsyncDBWriter() as writer, ScrapeJobLease() as jobs:
+                while not stop.is_set():
+                    # Idempotent on every node, existing jobs are left as they are
+                    if targets_enqueued_at is None or loop.time() - targets_enqueued_at >= TARGETS_REFRESH_INTERVAL:
+                        targets = await asyncio.to_thread(load_targets, TARGETS_FILE, DEFAULT_TARGETS)
+                        await asyncio.to_thread(enqueue_scrape_jobs, targets)
+                        targets_enqueued_at = loop.time()
+
+                    if loaded:
+                        await refill_accounts(api, lease, scheduler)
+                    claimed = await asyncio.to_thread(
+                        jobs.claim, SCRAPE_JOB_CLAIM_BATCH * max(1, len(lease.usernames))
+                    )
+                    if not claimed:
+                        await wait_for_stop(stop, SCRAPE_JOB_IDLE_WAIT)
+                        continue
+                    await run_until_stopped(
+                        run_jobs(api, claimed, jobs, concurrency, writer, planner, scheduler), stop
+                    )
+        finally:
+            revalidation.cancel()
+            try:
+                await revalidation
+            except asyncio.CancelledError:
+                pass
+            await asyncio.to_thread(profile_cache.save)
+    logger.info("✅ Worker stopped, job leases and account locks released")
+
+
+async def main():
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    # The current round finishes (or is cancelled after DAEMON_SHUTDOWN_GRACE seconds),
+    # then unfinished jobs and account locks are handed back
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+
+    async with MetricsReporter():
+        if SPOOL_ENABLED:
+            spool.start()
+        try:
+            await run_worker(stop)
+        finally:
+            await asyncio.to_thread(map_pool.close)
+            await asyncio.to_thread(parquet_sink.close)
+            await asyncio.to_thread(raw_archive.close)
+            if SPOOL_ENABLED:
+                await asyncio.to_thread(spool.close)
+                logger.info(f"✅ Spool metrics: {spool.metrics()}")
+
+
+if __name__ == "__main__":
+    configure_logging()
+    asyncio.run(main())